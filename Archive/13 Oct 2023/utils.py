@@ -1,30 +1,55 @@
 import xml.etree.ElementTree as ET
+import hashlib
 import json
+import os
 
 """
 NOTE : utils.py is only needed to generate the JSON data file from XML
     and needs to ran only once to get the JSON files
+
+    python utils.py [--force]
+
+    Both XML files are read once, element by element (ET.iterparse), and the three
+    JSON files are written from that single pass. The sha256 of the XML files is kept
+    in XML_DIGESTS_FILE, so the JSON files are only rebuilt when an XML file changes.
 """
 
 """
 load-knowledge.xml file contains the hierarchical struture of the questionaire.
 Using this File we can extract the child question for each parent question
 """
-# reads the XML file "load-knowledge.xml"
-tree = ET.parse("load-knowledge.xml")
+KNOWLEDGE_FILE = "load-knowledge.xml"
+
+# flat list of the questions with their text and value type
+QUESTION_DATA_FILE = "question-data.xml"
+
+CHILD_QUESTION_MAPPER_FILE = "child_question_mapper.json"
+QUESTION_MAPPER_FILE = "question-data.json"
+
+# question text for every question, the existing texts are edited by hand and kept as they are
+QUESTIONS_MAPPING_FILE = "questions_mapping.json"
+
+# sha256 of the XML files the JSON files were built from
+XML_DIGESTS_FILE = "xml-digests.json"
+
+
+def get_question_name(code: str):
+    # get code attribute of a node and replace "-" with "_", adding "_mg" (column name)
+    return code.replace("-", "_") + "_mg"
+
 
 # converts the XML data into Dictionary
 def xml_to_dict(xml_string: str):
     """
     Summary
     Args:
-        xml_string (str): XML data in string Format 
+        xml_string (str): XML data in string Format
 
     Process:
-        Step 1) Reads XML String data as XML Element Tree
-        Step 2) Loop each child node from root node
-        Step 3) if there is no child node for the child then add child name into the result dictionary
-        Step 4) Else parse the child ET using Recursion
+        Step 1) Reads XML String data as XML Element Tree (only once)
+        Step 2) Walks the nodes with an explicit stack, parents before children
+        Step 3) if there is no child node for the node then its value is its name
+        Step 4) Else its value is the dictionary of its children
         Step 5) Gets the Dictionary as Tree Structure or Hierarchical Structure
     Returns:
         Dictionary (Tree Like struture)
@@ -34,57 +59,41 @@ def xml_to_dict(xml_string: str):
                 "column_2" : {
                     "column_3" : "column_3",
                     "column_4" : "column_4",
-                    "column_5" : "column_5",
-                },
-                "column_6" : {
-                    "column_7" : "column_7",
-                    "column_8" : "column_8",
-                },
-                "column_9" : {
-                    "column_10" : "column_10",
-                    "column_11" : "column_11",
-                    "column_12" : "column_12",
-                    "column_13" : "column_14",
-                    "column_14" : "column_15",
                 },
-            }
-            "column_21" : {
-                "column_22" : {
-                    "column_23" : "column_23",
-                    "column_24" : "column_24",
-                    "column_25" : "column_25",
-                }
+                "column_6" : "column_6",
             }
         }
     """
     # Reads XML String data as XML Element Tree
     root = ET.fromstring(xml_string)
     result = {}
-    # parse each child node from root node
-    for child in root:
-        # get name sttribute of the child node and replace "-" with "_"
-        name = child.attrib["code"].replace("-", "_")
-        if len(child) == 0:
-            # if there is no child node for this child then add it into result dictionary
-            result[name] = name
-        else:
-            # else Recursively parse the XML data into the dict
-            result[name] = xml_to_dict(ET.tostring(child))
+    stack = [(root, result)]
+    while stack:
+        element, result_dict = stack.pop()
+        for child in element:
+            # get name sttribute of the child node and replace "-" with "_"
+            name = child.attrib["code"].replace("-", "_")
+            if len(child) == 0:
+                # if there is no child node for this child then add it into result dictionary
+                result_dict[name] = name
+            else:
+                result_dict[name] = {}
+                stack.append((child, result_dict[name]))
     # final tree like dict structure
     return result
 
 
-def get_child_question_mapper(data: [dict, str], parent: str, parsed_data: dict = {}):
+def get_child_question_mapper(data: [dict, str], parent: str, parsed_data: dict = None):
     """_summary_
 
     Args:
-        data (dict, str]): data type can be dict or string
+        data (dict, str]): data type can be dict or string (output of xml_to_dict)
         parent (str): name of parent node
-        parsed_data (dict): passed with current state of the parsed_data. 
-            Defaults to {}.
+        parsed_data (dict): passed with current state of the parsed_data.
+            A new dictionary is used when None.
 
     Returns:
-        Dict : 
+        Dict :
         contains list of child question for a given question
         Data looks like this
         {
@@ -95,27 +104,53 @@ def get_child_question_mapper(data: [dict, str], parent: str, parsed_data: dict
 
         where None means there is no Child Question for "column_3"
     """
+    if parsed_data is None:
+        parsed_data = {}
 
-    # if type of data == dict
-    # then we need to parse through each child questions
-    if type(data) == dict:
-        # gets the list of names of the child questions
-        names = list(data.keys())
+    # explicit stack in place of recursion, keeps the same (depth first) order of the keys
+    stack = [(data, parent)]
+    while stack:
+        data, parent = stack.pop()
+        # if type of data == dict
+        # then we need to parse through each child questions
+        if type(data) == dict:
+            # adding question key with list of child questions as value
+            # adding "_mg" to parent and child questions names
+            parsed_data[parent + "_mg"] = [name + "_mg" for name in data]
+            stack.extend((data[name], name) for name in reversed(list(data)))
+        else:
+            # incase parent type == str then there is no child question
+            # so adding None to it
+            parsed_data[parent + "_mg"] = None
 
-        # adding question key with list of child questions as value
-        # adding "_mg" to parent and child questions names
-        parsed_data[parent + "_mg"] = [name + "_mg" for name in names]
+    # returning complete dictionary of parent and child questions data
+    return parsed_data
 
-        # adding key value pair for each child
-        for name in names:
-            # recursively adding data for child questions
-            parsed_data = get_child_question_mapper(data[name], name, parsed_data)
-    else:
-        # incase parent type == str then there is no child question
-        # so adding None to it
-        parsed_data[parent + "_mg"] = None
 
-    # returning complete dictionary of parent and child questions data
+def stream_child_question_mapper(filename: str, root_name: str = "root"):
+    """
+    Same output as get_child_question_mapper(xml_to_dict(<file content>), root_name)
+    in one pass over the file: every node is added when it starts (depth first order)
+    and gets its child questions when it ends, the finished elements are cleared
+    so the complete tree is never held in memory.
+
+    A question found in many places of the hierarchy keeps the position of its first
+    place and the child questions of its last place.
+    """
+    parsed_data = {}
+    # child questions of the nodes being read, the outermost node is the root
+    stack = []
+    for event, element in ET.iterparse(filename, events=("start", "end")):
+        if event == "start":
+            name = root_name + "_mg" if not stack else get_question_name(element.attrib["code"])
+            if stack:
+                stack[-1][1][name] = None
+            parsed_data.setdefault(name, None)
+            stack.append((name, {}))
+        else:
+            name, children = stack.pop()
+            parsed_data[name] = list(children) or None
+            element.clear()
     return parsed_data
 
 
@@ -136,59 +171,120 @@ def string_replacer(string):
     return string
 
 
-def get_question_mapper(filename):
-    # reads the XML file
-    with open(filename, "r") as xml_file:
-        xml_string = xml_file.read()
-
-    # converting XML string into ET (Element Tree)
-    root = ET.fromstring(xml_string)
-
-    # initialising with empty result dictionary
+def stream_question_mapper(filename: str):
+    """
+    reads the question nodes of "question-data.xml" one by one, returns
+    {"code_mg": {"question": question, "values": values}}
+    """
     result = {}
-    for child in root:
-        # getting code atrtibute from node
-        code = child.attrib["code"]
-        # getting question atrtibute from node
-        question = child.attrib["question"]
-        # getting values atrtibute from node
-        values = child.attrib["values"]
-
-        # replacing string values for code
-        code = string_replacer(code)
-        # replacing string values for question
-        question = string_replacer(question)
-        
+    # number of child nodes of every node being read, the first one is the root
+    num_of_children = []
+    for event, element in ET.iterparse(filename, events=("start", "end")):
+        if event == "start":
+            if num_of_children:
+                num_of_children[-1] += 1
+            num_of_children.append(0)
+            continue
+
         """
         NOTE: As the structure of "question-data.xml" is flat and not tree like
-            we are ignoring any recursive parsing
+            only the nodes right under the root (without child nodes) are questions
         """
-        if len(child) == 0:
-            # adding question and values for the Code
-            # adding "_mg" to code name (column name)
-            result[code + "_mg"] = {"question": question, "values": values}
+        if num_of_children.pop() == 0 and len(num_of_children) == 1:
+            # replacing string values for code and question
+            code = string_replacer(element.attrib["code"])
+            result[code + "_mg"] = {
+                "question": string_replacer(element.attrib["question"]),
+                "values": element.attrib["values"],
+            }
+        element.clear()
+    return result
 
+
+def get_question_mapper(filename):
+    """
+    mapping of the question code with its question and value type,
+    also exported next to the XML file as JSON ("question-data.xml" -> "question-data.json")
+    """
+    result = stream_question_mapper(filename)
     with open(filename.split(".")[0] + ".json", "w") as outfile:
         # exporting the Dictionary result into JSON file
         json.dump(result, outfile)
     return result
 
 
-if __name__ == "__main__":
+def get_questions_mapping(child_question_mapper: dict, question_mapper: dict, questions_mapping: dict = None):
+    """
+    question text of every question of the hierarchy
 
-    # opens and read "load-knowledge.xml" file as string data
-    with open("load-knowledge.xml", "r") as xml_file:
-        # xml_string contains string format of the XML file
-        xml_string = xml_file.read()
+    the texts already in questions_mapping are kept (they are edited by hand), the other
+    questions get their text from question-data.xml when it has one
+    """
+    questions_mapping = dict(questions_mapping or {})
+    for question in child_question_mapper:
+        if question not in questions_mapping and question in question_mapper:
+            questions_mapping[question] = question_mapper[question]["question"]
+    return questions_mapping
 
-    # mapping the column with actual question and the value type of that question
-    get_question_mapper("question-data.xml")
 
-    # getting tree structure in Dictionary Format
-    result = xml_to_dict("".join(xml_string))
+def get_file_sha256(filename):
+    sha256 = hashlib.sha256()
+    with open(filename, "rb") as file:
+        for block in iter(lambda: file.read(1024 * 1024), b""):
+            sha256.update(block)
+    return sha256.hexdigest()
+
+
+def build_json_files(
+    knowledge_file=KNOWLEDGE_FILE, question_data_file=QUESTION_DATA_FILE, output_directory="", force=False
+):
+    """
+    writes child_question_mapper.json, question-data.json and questions_mapping.json
+    into output_directory, unless the XML files did not change since they were last built
+
+    Returns True when the JSON files were (re)built
+    """
+    output_paths = [
+        os.path.join(output_directory, filename)
+        for filename in (CHILD_QUESTION_MAPPER_FILE, QUESTION_MAPPER_FILE, QUESTIONS_MAPPING_FILE)
+    ]
+    digests_path = os.path.join(output_directory, XML_DIGESTS_FILE)
+    digests = {
+        os.path.basename(knowledge_file): get_file_sha256(knowledge_file),
+        os.path.basename(question_data_file): get_file_sha256(question_data_file),
+    }
+    if not force and all(os.path.exists(path) for path in output_paths) and os.path.exists(digests_path):
+        with open(digests_path) as file:
+            if json.load(file) == digests:
+                return False
 
     # get the child questions for each question and None in case there is no child question
-    parsed = get_child_question_mapper(result, "root")
-    with open("child_question_mapper.json", "w") as outfile:
-        # exporting the Dictionary data into "child_question_mapper.json" JSON file
-        json.dump(parsed, outfile)
+    child_question_mapper = stream_child_question_mapper(knowledge_file)
+    # mapping the column with actual question and the value type of that question
+    question_mapper = stream_question_mapper(question_data_file)
+
+    questions_mapping = None
+    if os.path.exists(output_paths[2]):
+        with open(output_paths[2]) as file:
+            questions_mapping = json.load(file)
+    questions_mapping = get_questions_mapping(child_question_mapper, question_mapper, questions_mapping)
+
+    for path, data, indent in zip(
+        output_paths + [digests_path],
+        [child_question_mapper, question_mapper, questions_mapping, digests],
+        [None, None, 4, 4],
+    ):
+        # written under a temporary name first so a half written file is never read
+        with open(path + ".tmp", "w") as outfile:
+            json.dump(data, outfile, indent=indent)
+        os.replace(path + ".tmp", path)
+    return True
+
+
+if __name__ == "__main__":
+    import sys
+
+    if build_json_files(force="--force" in sys.argv[1:]):
+        print("JSON FILES ARE BUILT FROM THE XML FILES")
+    else:
+        print("XML FILES DID NOT CHANGE, JSON FILES ARE UP TO DATE")
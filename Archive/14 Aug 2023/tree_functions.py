@@ -1,3 +1,18 @@
+import os
+import sys
+
+# knowledge_index.py is in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from knowledge_index import KnowledgeIndex
+
+
+# prebuilt index of the tree (code -> node, pre-order positions and subtree ranges),
+# build it once and pass it to getnode, isdescendant .... instead of searching the tree every time
+def getknowledgeindex(tree):
+    return KnowledgeIndex.from_tree(tree)
+
+
 def codehyphenstounderscores(node):
     if "code" in node:
         node["code"] = node["code"].replace("-", "_")
@@ -21,13 +36,17 @@ def getconcepts_recursive(node, concepts):
             getconcepts_recursive(child, concepts)
 
 
-def getdescendantsallconcepts(node):
+def getdescendantsallconcepts(node, index=None):
+    # the descendants of every concept are one slice of the index, instead of a search
+    # for the concept node and a walk of its subtree for every concept
+    if index is None:
+        index = getknowledgeindex(node)
     conceptsanddescendants = {}
-    nodesubconcepts = getconcepts(node)
-    for pos in range(1, len(nodesubconcepts)):
-        nodecode = nodesubconcepts[pos]
-        conceptnode = getnode(node, nodecode)
-        conceptsanddescendants[nodecode] = getdescendants(conceptnode)
+    # concepts are the nodes with children, the root concept itself is left out
+    concepts = [position for position in range(len(index)) if index.subtree_ends[position] > position + 1]
+    for position in concepts[1:]:
+        nodecode = index.codes[position]
+        conceptsanddescendants[nodecode] = index.get_descendants(nodecode)
     return conceptsanddescendants
 
 
@@ -52,6 +71,9 @@ def getdescendants_recursive(node, descendants):
 
 
 def isdescendant(ancestor, nodename, catdescendants):
+    # catdescendants can also be a KnowledgeIndex (compares pre-order positions, the root concept counts too)
+    if isinstance(catdescendants, KnowledgeIndex):
+        return catdescendants.is_descendant(ancestor, nodename)
     if ancestor in catdescendants:
         return nodename in catdescendants[ancestor]
     return False
@@ -64,7 +86,9 @@ def getsibcodes(siblings):
     return sibnames
 
 
-def getnode(tree, nodecode):
+def getnode(tree, nodecode, index=None):
+    if index is not None:
+        return index.get_node(nodecode)
     if tree.get("code") == nodecode:
         return tree
     else:
@@ -102,7 +126,8 @@ def getnodecodes_recursive(node, riskcodes):
 
 
 def getquestioncodes(node, qt, nolayers):
-    nodecodes = getallnodecodes(node)
+    # set of the codes, so every question is checked in O(1)
+    nodecodes = set(getallnodecodes(node))
     qtnodes = qt.get("elements", [])
     questioncodes = []
     for qtnode in qtnodes:
@@ -0,0 +1,133 @@
+import numpy as np
+
+import instrumentation
+
+# number of rows stored in one word of a bitset
+WORD_SIZE = 64
+
+
+def pack_bitset(row_mask):
+    """
+        row_mask: boolean numpy array, one value per row
+
+        returns the rows packed as a bitset (numpy uint64 array),
+        row i is bit (i % 64) of word (i // 64), unused bits of the last word are 0
+    """
+    num_of_words = -(-len(row_mask) // WORD_SIZE)
+    packed = np.zeros(num_of_words * 8, dtype=np.uint8)
+    packed_bits = np.packbits(row_mask, bitorder="little")
+    packed[: len(packed_bits)] = packed_bits
+    return packed.view(np.uint64)
+
+
+if hasattr(np, "bitwise_count"):
+
+    def popcount(bitset):
+        """
+            number of bits set in the bitset
+        """
+        return int(np.bitwise_count(bitset).sum())
+
+else:
+    # numpy < 2.0 has no bitwise_count, counting the bits of every byte with a lookup table
+    BYTE_POPCOUNT = np.array([bin(byte).count("1") for byte in range(256)], dtype=np.uint8)
+
+    def popcount(bitset):
+        """
+            number of bits set in the bitset
+        """
+        return int(BYTE_POPCOUNT[bitset.view(np.uint8)].sum(dtype=np.int64))
+
+
+class AnswerIndex:
+    """
+        Prebuilt bitmap index over an encoding.EncodedDataset
+
+        bitsets -> Dictionary with question as key and a numpy uint64 array
+            (num of codes, num of words) as value, one packed bitset per (question, answer code)
+        class_bitsets -> numpy uint64 array (num of risk classes, num of words),
+            one packed bitset per risk class
+
+        The subset of a session is the running AND of the bitsets of its answers, so
+        narrowing the subset never copies any data and the subset size and risk class
+        counts are popcounts
+    """
+
+    def __init__(self, encoded, questions=None):
+        self.num_of_rows = encoded.num_of_rows
+        self.num_of_words = -(-self.num_of_rows // WORD_SIZE)
+        self.risk_classes = list(encoded.risk_classes)
+
+        self.bitsets = {}
+        for question in questions if questions is not None else encoded.columns:
+            column_codes = encoded.get_column_codes(question)
+            self.bitsets[question] = self.stack_bitsets(
+                [pack_bitset(column_codes == code) for code in range(len(encoded.get_code_table(question)))]
+            )
+        self.class_bitsets = self.stack_bitsets(
+            [pack_bitset(encoded.target == code) for code in range(len(self.risk_classes))]
+        )
+
+        # every row of the dataset, the starting subset of a session
+        self.all_rows = pack_bitset(np.ones(self.num_of_rows, dtype=bool))
+
+    def stack_bitsets(self, bitsets):
+        return np.array(bitsets, dtype=np.uint64).reshape(len(bitsets), self.num_of_words)
+
+    @property
+    def nbytes(self):
+        return sum(bitset.nbytes for bitset in self.bitsets.values()) + self.class_bitsets.nbytes
+
+    def get_bitset(self, question, code):
+        """
+            bitset of the rows where question == answer code
+            codes which are not in the code table (like MISSING_CODE) match no rows
+        """
+        question_bitsets = self.bitsets[question]
+        if 0 <= code < len(question_bitsets):
+            return question_bitsets[code]
+        return np.zeros(self.num_of_words, dtype=np.uint64)
+
+    def narrow(self, subset, question, code):
+        """
+            returns the subset bitset AND the bitset of (question, code)
+        """
+        if instrumentation.ENABLED:
+            instrumentation.count("dataframe_filters")
+        return subset & self.get_bitset(question, code)
+
+    def get_subset(self, answers):
+        """
+            answers: list of (question, answer code)
+
+            returns the bitset of the rows matching all the answers
+        """
+        subset = self.all_rows.copy()
+        num_of_answers = 0
+        for question, code in answers:
+            subset &= self.get_bitset(question, code)
+            num_of_answers += 1
+        if instrumentation.ENABLED:
+            instrumentation.count("dataframe_filters", num_of_answers)
+        return subset
+
+    def count(self, subset):
+        """
+            number of rows in the subset
+        """
+        return popcount(subset)
+
+    def get_class_counts(self, subset):
+        """
+            number of rows per risk class in the subset
+        """
+        return np.array([popcount(subset & class_bitset) for class_bitset in self.class_bitsets], dtype=np.int64)
+
+    def get_rows(self, subset):
+        """
+            positions of the rows in the subset, only the non empty words are unpacked
+        """
+        word_positions = np.flatnonzero(subset)
+        bits = np.unpackbits(subset[word_positions].view(np.uint8), bitorder="little").reshape(-1, WORD_SIZE)
+        word_index, bit_index = np.nonzero(bits)
+        return word_positions[word_index] * WORD_SIZE + bit_index
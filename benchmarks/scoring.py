@@ -0,0 +1,188 @@
+"""
+    Benchmark of the scoring pipeline on synthetic datasets (see synthetic.py)
+
+        python benchmarks/scoring.py [--sizes 10000 100000 1000000] [--repeat 3] [--output results.json]
+
+    For every dataset size a synthetic suic csv file is written into a temporary folder
+    (or --data-directory, kept between runs) and the time of every step is measured:
+        get_cleaned_data (cold without cache, warm from the cleaned data cache)
+        convert_scale_columns_to_classes
+        get_utility_score (the DataFrame way, on a sample of the questions)
+        encode_dataset and get_encoded_utility_scores (every question)
+        question tree (FlatQuestionTree.build) and question ordering
+        adaptive questionnaire engine and one session step (next question + answer)
+
+    Results are printed as json (seconds, the best of --repeat runs).
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+REPOSITORY_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPOSITORY_PATH)
+
+from encoding import encode_dataset, get_encoded_utility_scores
+from flat_tree import FlatQuestionTree, get_question_scores
+from node import iter_ordered_questions
+from pipeline import get_risk_domain, load_mappers
+from questionnaire import QuestionnaireEngine
+from synthetic import DEFAULT_MISSING_RATE, write_dataset
+from helper import (
+    convert_scale_columns_to_classes,
+    get_cleaned_data,
+    get_column_dtypes,
+    get_descendant_questions,
+    get_question_choices_data,
+    get_utility_score,
+)
+
+DEFAULT_SIZES = [10000, 100000, 1000000]
+DATASET_NAME = "suic_mg"
+
+# get_utility_score is slow on large datasets, it is timed on this many questions only
+NUM_OF_SAMPLED_QUESTIONS = 20
+
+
+def time_stage(function, repeat):
+    """
+        runs function repeat times, returns (best time in seconds, result of the last run)
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def benchmark_dataset(base_path, QUESTION_MAPPER, QUESTION_CHILD_MAPPER, repeat):
+    """
+        times every step of the scoring pipeline on the csv file of DATASET_NAME in base_path,
+        returns a dictionary of stage name and seconds
+    """
+    domain = get_risk_domain(DATASET_NAME, QUESTION_CHILD_MAPPER, QUESTION_MAPPER)
+    dtypes = get_column_dtypes(domain.columns, QUESTION_MAPPER)
+    timings = {}
+
+    def load(use_cache):
+        return get_cleaned_data(
+            base_path,
+            domain.target_column,
+            use_cache=use_cache,
+            columns=domain.columns,
+            dtypes=dtypes,
+            dataset_file_path=domain.dataset_file_path,
+        )
+
+    timings["get_cleaned_data_cold"], dataset = time_stage(lambda: load(False), repeat)
+    # the first cached load writes the cache
+    load(True)
+    timings["get_cleaned_data_warm"], dataset = time_stage(lambda: load(True), repeat)
+
+    timings["convert_scale_columns_to_classes"], converted = time_stage(
+        lambda: convert_scale_columns_to_classes(dataset, QUESTION_MAPPER), repeat
+    )
+    question_choices = get_question_choices_data(converted)
+    tree_questions = [
+        question
+        for question in get_descendant_questions(domain.root_questions, QUESTION_CHILD_MAPPER)
+        if question_choices.get(question)
+    ]
+    sampled_questions = tree_questions[:NUM_OF_SAMPLED_QUESTIONS]
+    sample_time, _ = time_stage(
+        lambda: [
+            get_utility_score(converted, question, question_choices[question], domain.target_column)
+            for question in sampled_questions
+        ],
+        repeat,
+    )
+    timings["get_utility_score_per_question"] = sample_time / max(len(sampled_questions), 1)
+    timings["get_utility_score_all_questions_estimate"] = timings["get_utility_score_per_question"] * len(
+        tree_questions
+    )
+
+    timings["encode_dataset"], encoded = time_stage(
+        lambda: encode_dataset(dataset, QUESTION_MAPPER, domain.target_column), repeat
+    )
+    timings["get_encoded_utility_scores"], utility_scores = time_stage(
+        lambda: get_encoded_utility_scores(encoded, tree_questions), repeat
+    )
+
+    scores = get_question_scores(
+        get_descendant_questions(domain.root_questions, QUESTION_CHILD_MAPPER),
+        encoded.get_question_choices_data(),
+        utility_scores,
+    )
+    timings["question_tree"], tree = time_stage(
+        lambda: FlatQuestionTree.build(domain.root_questions, QUESTION_CHILD_MAPPER, scores), repeat
+    )
+    timings["question_ordering"], _ = time_stage(
+        lambda: list(iter_ordered_questions(tree.get_root_nodes())), repeat
+    )
+
+    timings["questionnaire_engine"], engine = time_stage(
+        lambda: QuestionnaireEngine(encoded, QUESTION_CHILD_MAPPER, QUESTION_MAPPER, domain.root_questions), repeat
+    )
+
+    def session_step():
+        session = engine.start_session()
+        question = engine.next_question(session)
+        if question is not None:
+            engine.submit_answer(session, question, engine.choices[question][0])
+        return session
+
+    timings["session_step"], _ = time_stage(session_step, repeat)
+    return {
+        "num_of_rows": int(dataset.shape[0]),
+        "num_of_questions": len(tree_questions),
+        "seconds": {stage: round(seconds, 6) for stage, seconds in timings.items()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="scoring pipeline benchmark on synthetic datasets")
+    parser.add_argument("--sizes", nargs="+", type=int, default=DEFAULT_SIZES, help="number of rows of the datasets")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--missing-rate", type=float, default=DEFAULT_MISSING_RATE)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--data-directory", default=None, help="keep the generated datasets in this folder")
+    parser.add_argument("--output", default=None, help="json file to write the results to")
+    args = parser.parse_args()
+
+    QUESTION_MAPPER, QUESTION_CHILD_MAPPER = load_mappers(REPOSITORY_PATH + "/")
+    results = {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "cpu_count": os.cpu_count(),
+        "missing_rate": args.missing_rate,
+        "repeat": args.repeat,
+        "datasets": [],
+    }
+    with tempfile.TemporaryDirectory() as temporary_directory:
+        for num_of_rows in args.sizes:
+            base_path = os.path.join(args.data_directory or temporary_directory, f"rows-{num_of_rows}") + "/"
+            domain = get_risk_domain(DATASET_NAME, QUESTION_CHILD_MAPPER, QUESTION_MAPPER)
+            file_path = base_path + domain.dataset_file_path
+            if not os.path.exists(file_path):
+                write_dataset(file_path, num_of_rows, missing_rate=args.missing_rate, seed=args.seed)
+            result = benchmark_dataset(base_path, QUESTION_MAPPER, QUESTION_CHILD_MAPPER, args.repeat)
+            results["datasets"].append(result)
+            print(json.dumps(result, indent=2), file=sys.stderr)
+
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+    Startup time of the command line entry point
+
+        python benchmarks/startup.py [--repeat 10] [--output results.json]
+
+    Measures the wall time of new python processes running
+        cli.py --help
+        cli.py policy <answers> -> serving the next question of a compiled (cached) policy
+
+    The policy file is a small synthetic one written into a temporary folder, so no
+    dataset is needed. Results are printed as json (milliseconds).
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+REPOSITORY_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPOSITORY_PATH)
+
+from policy import LEAF, POLICY_FORMAT_VERSION, save_policy
+
+# startup budget of a command in milliseconds
+STARTUP_BUDGET_MS = 1000
+
+
+def get_synthetic_policy():
+    """
+        two questions deep policy, the first question has two answers
+    """
+    return {
+        "version": POLICY_FORMAT_VERSION,
+        "questions": ["suic_mg_q1", "suic_mg_q2"],
+        "code_tables": [[0.0, 1.0], ["low", "medium", "high"]],
+        "risk_classes": ["low", "medium", "high"],
+        "full_class_counts": [600, 300, 100],
+        "min_sample_threshold": 100,
+        "nodes": [
+            [0, [1, 2], [600, 300, 100]],
+            [LEAF, [], [400, 50, 10]],
+            [1, [3, 4, 5], [200, 250, 90]],
+            [LEAF, [], [150, 20, 5]],
+            [LEAF, [], [40, 200, 20]],
+            [LEAF, [], [10, 30, 65]],
+        ],
+    }
+
+
+def time_command(arguments, repeat):
+    """
+        runs cli.py with the arguments repeat times, returns the timings in milliseconds
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, os.path.join(REPOSITORY_PATH, "cli.py")] + arguments,
+            check=True,
+            stdout=subprocess.DEVNULL,
+            cwd=REPOSITORY_PATH,
+        )
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="cli.py startup time benchmark")
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--output", default=None, help="json file to write the results to")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        policy_file = os.path.join(directory, "policy.json.gz")
+        save_policy(get_synthetic_policy(), policy_file)
+        commands = {
+            "help": ["--help"],
+            "policy_next_question": ["policy", "--policy-file", policy_file, "1"],
+            "policy_risk": ["policy", "--policy-file", policy_file, "1", "high"],
+        }
+        # python itself, the lower bound of any command
+        timings = {"python_startup": []}
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            subprocess.run([sys.executable, "-c", "pass"], check=True)
+            timings["python_startup"].append((time.perf_counter() - start) * 1000)
+        for name, arguments in commands.items():
+            timings[name] = time_command(arguments, args.repeat)
+
+    results = {
+        name: {
+            "median_ms": round(statistics.median(values), 1),
+            "min_ms": round(min(values), 1),
+            "max_ms": round(max(values), 1),
+            "within_budget": statistics.median(values) < STARTUP_BUDGET_MS,
+        }
+        for name, values in timings.items()
+    }
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
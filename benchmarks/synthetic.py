@@ -0,0 +1,122 @@
+"""
+    Synthetic assessment data shaped like the Child/*.csv exports
+
+        python benchmarks/synthetic.py 100000 Child/child-adolescent-suic.csv [--missing-rate 0.3] [--seed 0]
+
+    Every question of question-data.json gets a column with values of its value type and the
+    skip logic of child_question_mapper.json is followed: the child questions of a question are
+    only answered when that question was answered with something else than 0 (like the
+    adaptive questionnaire adds child questions). The risk domain columns (suic_mg, sh_mg ....)
+    are scale values which depend on some of the answers, so the questions have different scores.
+"""
+
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+REPOSITORY_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPOSITORY_PATH)
+
+from helper import COLUMN_RENAMES, load_json_file, get_descendant_questions
+
+# possible answers of every value type of question-data.json
+VALUE_TYPE_ANSWERS = {
+    "scale": np.round(np.arange(0, 1.01, 0.1), 1),
+    "filter-q": np.array([0.0, 1.0]),
+    "layer": np.array([0.0, 1.0]),
+    "nominal": np.array([0.0, 0.5, 1.0]),
+    "integer": np.arange(0, 21, dtype=np.float64),
+    "date-day": np.arange(1, 32, dtype=np.float64),
+    "date-week": np.arange(0, 53, dtype=np.float64),
+    "date-month": np.arange(0, 25, dtype=np.float64),
+    "date-year": np.arange(0, 11, dtype=np.float64),
+}
+DEFAULT_VALUE_TYPE = "filter-q"
+
+# non question columns at the start of the csv files (dropped by helper.clean_data)
+ID_COLUMNS = ["assessment_id", "patient_id", "assessor_id", "assessment_date"]
+
+# number of answers each risk domain column depends on
+NUM_OF_RISK_FACTORS = 12
+
+DEFAULT_MISSING_RATE = 0.3
+
+
+def get_answers(value_type):
+    return VALUE_TYPE_ANSWERS.get(value_type, VALUE_TYPE_ANSWERS[DEFAULT_VALUE_TYPE])
+
+
+def generate_dataset(num_of_rows, QUESTION_MAPPER, QUESTION_CHILD_MAPPER, missing_rate=DEFAULT_MISSING_RATE, seed=0):
+    """
+        num_of_rows: Integer -> number of assessments
+        missing_rate: Float -> chance of a shown question being left unanswered
+
+        Output is a DataFrame with the csv column names, missing answers are NaN
+    """
+    random = np.random.default_rng(seed)
+    risk_domains = QUESTION_CHILD_MAPPER.get("root_mg", [])
+
+    columns = {}
+    # questions in depth first order, so a parent is always generated before its children
+    shown = {}
+    for domain in risk_domains:
+        for question in get_descendant_questions(QUESTION_CHILD_MAPPER.get(domain) or [], QUESTION_CHILD_MAPPER):
+            if question in columns or question not in QUESTION_MAPPER:
+                continue
+            answers = get_answers(QUESTION_MAPPER[question].get("values"))
+            values = answers[random.integers(0, len(answers), num_of_rows)]
+            is_shown = shown.get(question, np.ones(num_of_rows, dtype=bool))
+            values[~is_shown | (random.random(num_of_rows) < missing_rate)] = np.nan
+            columns[question] = values
+
+            # child questions are only asked when the answer is not 0 (or missing)
+            for child in QUESTION_CHILD_MAPPER.get(question) or []:
+                child_shown = ~np.isnan(values) & (values != 0)
+                shown[child] = shown[child] | child_shown if child in shown else child_shown
+
+    # risk domain columns depend on a few of the answers plus noise, binned later by the scale cut points
+    answered_columns = [question for question in columns if QUESTION_MAPPER[question].get("values") != "scale"]
+    for domain in risk_domains:
+        factors = random.choice(answered_columns, size=min(NUM_OF_RISK_FACTORS, len(answered_columns)), replace=False)
+        risk = random.normal(0.4, 0.15, num_of_rows)
+        for factor in factors:
+            largest_answer = max(get_answers(QUESTION_MAPPER[factor].get("values")).max(), 1)
+            risk += np.nan_to_num(columns[factor] / largest_answer, nan=0.0) * random.uniform(0.05, 0.2)
+        columns[domain] = np.round(np.clip(risk, 0, 1), 1)
+
+    # every question of question-data.json is a column, the ones outside the risk domains are left empty
+    csv_names = {question: csv_name for csv_name, question in COLUMN_RENAMES.items()}
+    data = {column: np.arange(num_of_rows) for column in ID_COLUMNS}
+    for question in QUESTION_MAPPER:
+        data[csv_names.get(question, question)] = columns.get(question, np.full(num_of_rows, np.nan))
+    return pd.DataFrame(data)
+
+
+def write_dataset(file_path, num_of_rows, base_path=REPOSITORY_PATH + "/", missing_rate=DEFAULT_MISSING_RATE, seed=0):
+    """
+        writes a synthetic csv file like the real exports ("\\N" for missing values)
+    """
+    QUESTION_MAPPER = load_json_file(base_path + "question-data.json")
+    QUESTION_CHILD_MAPPER = load_json_file(base_path + "child_question_mapper.json")
+    data = generate_dataset(num_of_rows, QUESTION_MAPPER, QUESTION_CHILD_MAPPER, missing_rate, seed)
+    os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+    data.to_csv(file_path, index=False, na_rep="\\N")
+    return file_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="synthetic assessment csv generator")
+    parser.add_argument("num_of_rows", type=int)
+    parser.add_argument("file_path")
+    parser.add_argument("--missing-rate", type=float, default=DEFAULT_MISSING_RATE)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    write_dataset(args.file_path, args.num_of_rows, missing_rate=args.missing_rate, seed=args.seed)
+    print(f"{args.num_of_rows} ROWS ARE SAVED INTO {args.file_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+"""
+    Command line entry point of the questionnaire tools
+
+        python cli.py tree        -> question trees and ordered questions of one risk domain
+        python cli.py domains     -> the same for every risk domain of root_mg in one run
+        python cli.py ask         -> interactive adaptive questionnaire
+        python cli.py compile     -> compiles the adaptive questionnaire into a decision policy file
+        python cli.py policy      -> next question (or risk) of a compiled policy for the given answers
+        python cli.py serve       -> HTTP/JSON questionnaire service
+
+    Only argparse and json are imported up front, every command imports the modules
+    it needs (numpy, pandas, graphviz ....) when it runs, so --help and the policy
+    command start quickly.
+"""
+
+import argparse
+import json
+import os
+import sys
+
+DEFAULT_DATASET_NAME = "suic_mg"
+# policy file of a risk domain, formatted with the dataset name
+DEFAULT_POLICY_FILE_TEMPLATE = "generated_output/{}-policy.json.gz"
+
+
+def parse_answer(answer):
+    """
+        answers typed on the command line are numbers when they can be
+    """
+    try:
+        # if answer is float then covert to float type
+        return float(answer)
+    except ValueError:
+        # otherwise the answer is a string type
+        return answer
+
+
+def run_tree(args):
+    from pipeline import OUTPUT_DIRECTORY, build_domain, load_mappers
+
+    QUESTION_MAPPER, QUESTION_CHILD_MAPPER = load_mappers(args.base_path)
+    domain = build_domain(
+        args.base_path,
+        args.dataset_name,
+        target_column=args.target_column,
+        streaming_chunk_size=args.streaming_chunk_size,
+        scoring_workers=args.scoring_workers,
+        QUESTION_MAPPER=QUESTION_MAPPER,
+        QUESTION_CHILD_MAPPER=QUESTION_CHILD_MAPPER,
+    )
+    if args.render:
+        from rendering import render_trees
+
+        output_directory = os.path.join(args.base_path, OUTPUT_DIRECTORY)
+        render_trees(
+            domain.tree.get_root_nodes(),
+            output_directory,
+            formats=args.formats,
+            max_workers=args.render_workers,
+            max_depth=args.max_depth,
+            top_k=args.top_k_children,
+        )
+        print(f"QUESTION TREES ARE SAVED INTO {output_directory} Folder")
+
+    print(f"Total Number of columns: {len(domain.ordered_questions)}\n")
+    print(f"Top {args.top} Questions in Order of Importance")
+    for i, question in enumerate(domain.ordered_questions[: args.top]):
+        print(f"{i+1}) {question} - {QUESTION_MAPPER.get(question, {}).get('question', 'Unavailable')}\n")
+
+
+def run_domains(args):
+    from pipeline import run_all_domains
+
+    run_all_domains(
+        args.base_path,
+        args.domains or None,
+        max_workers=args.max_workers,
+        render_trees=args.render,
+        render_formats=args.formats,
+        render_workers=args.render_workers,
+    )
+
+
+def load_engine(args):
+    from questionnaire import MIN_SAMPLE_THRESHOLD, load_questionnaire_engine
+
+    return load_questionnaire_engine(
+        args.base_path,
+        args.dataset_name,
+        args.target_column or args.dataset_name,
+        min_sample_threshold=MIN_SAMPLE_THRESHOLD if args.min_sample_threshold is None else args.min_sample_threshold,
+        prune_subtrees=args.prune_subtrees,
+    )
+
+
+def run_ask(args):
+    from helper import load_json_file
+    from questionnaire import run_interactive_session
+
+    run_interactive_session(
+        load_engine(args),
+        load_json_file(args.base_path + "question-data.json"),
+        load_json_file(args.base_path + "questions_mapping.json"),
+    )
+
+
+def run_compile(args):
+    from policy import save_policy
+    from policy_compiler import compile_policy
+
+    output = args.output or DEFAULT_POLICY_FILE_TEMPLATE.format(args.dataset_name)
+    policy = compile_policy(load_engine(args), max_workers=args.max_workers, max_depth=args.max_depth)
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    save_policy(policy, output)
+    print(f"{len(policy['nodes'])} POLICY NODES ARE SAVED INTO {output}")
+
+
+def run_policy(args):
+    from policy import DecisionPolicy, ROOT_NODE
+
+    policy = DecisionPolicy.load(args.policy_file or DEFAULT_POLICY_FILE_TEMPLATE.format(args.dataset_name))
+    node = ROOT_NODE
+    for answer in args.answers:
+        if policy.get_question(node) is None:
+            break
+        next_node = policy.next_node(node, parse_answer(answer))
+        if next_node is None:
+            print(json.dumps({"error": f"{answer} is not one of {policy.get_choices(node)}"}))
+            return 1
+        node = next_node
+
+    question = policy.get_question(node)
+    if question is None:
+        print(json.dumps({"finished": True, "risk": policy.get_risk_estimate(node)}))
+    else:
+        print(json.dumps({"finished": False, "question": question, "choices": policy.get_choices(node)}))
+    return 0
+
+
+def run_serve(args):
+    from service import main
+
+    main(args.service_args)
+
+
+def add_dataset_arguments(parser):
+    parser.add_argument("--base-path", default="", help="base path for the json and csv files")
+    parser.add_argument("--dataset-name", default=DEFAULT_DATASET_NAME, help="root question of the risk domain")
+    parser.add_argument("--target-column", default=None, help="target column of the csv file (the dataset name)")
+
+
+def add_render_arguments(parser):
+    parser.add_argument(
+        "--formats", nargs="+", default=["png"], choices=["png", "svg", "dot"], help="formats of the tree images"
+    )
+    parser.add_argument("--render-workers", type=int, default=None, help="dot processes running at the same time")
+
+
+def add_engine_arguments(parser):
+    # resolved in load_engine, so --help does not load numpy for questionnaire.MIN_SAMPLE_THRESHOLD
+    parser.add_argument(
+        "--min-sample-threshold",
+        type=int,
+        default=None,
+        help="the questionnaire ends at this many matching rows (questionnaire.MIN_SAMPLE_THRESHOLD)",
+    )
+    parser.add_argument(
+        "--prune-subtrees", action="store_true", help="a 0 answer drops all the descendants of the question"
+    )
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(description="Adaptive risk questionnaire tools")
+    parser.add_argument(
+        "--instrumentation-report",
+        default=None,
+        help="write stage timings and counters to this file (prometheus text when it ends with .prom, json otherwise)",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    tree = commands.add_parser("tree", help="question trees and ordered questions of one risk domain")
+    add_dataset_arguments(tree)
+    tree.add_argument("--streaming-chunk-size", type=int, default=None, help="stream the csv file in chunks")
+    tree.add_argument("--scoring-workers", type=int, default=1, help="processes used to score the questions")
+    tree.add_argument("--top", type=int, default=15, help="number of questions to print")
+    tree.add_argument("--no-render", dest="render", action="store_false", help="do not draw the trees")
+    add_render_arguments(tree)
+    tree.add_argument("--max-depth", type=int, default=None, help="deepest level of the drawn trees")
+    tree.add_argument("--top-k-children", type=int, default=None, help="draw only the best k children of a node")
+    tree.set_defaults(handler=run_tree)
+
+    domains = commands.add_parser("domains", help="question trees and ordered questions of every risk domain")
+    domains.add_argument("--base-path", default="", help="base path for the json and csv files")
+    domains.add_argument("--domains", nargs="*", help="risk domains to build (all the domains of root_mg)")
+    domains.add_argument("--max-workers", type=int, default=None, help="domains built at the same time")
+    domains.add_argument("--no-render", dest="render", action="store_false", help="do not draw the trees")
+    add_render_arguments(domains)
+    domains.set_defaults(handler=run_domains)
+
+    ask = commands.add_parser("ask", help="answer the adaptive questionnaire interactively")
+    add_dataset_arguments(ask)
+    add_engine_arguments(ask)
+    ask.set_defaults(handler=run_ask)
+
+    compile_policy = commands.add_parser("compile", help="compile the adaptive questionnaire into a policy file")
+    add_dataset_arguments(compile_policy)
+    add_engine_arguments(compile_policy)
+    compile_policy.add_argument(
+        "--output", default=None, help="policy file to write (generated_output/<dataset name>-policy.json.gz)"
+    )
+    compile_policy.add_argument("--max-workers", type=int, default=None, help="worker processes")
+    compile_policy.add_argument("--max-depth", type=int, default=None, help="largest number of questions asked")
+    compile_policy.set_defaults(handler=run_compile)
+
+    policy = commands.add_parser("policy", help="next question of a compiled policy for the given answers")
+    policy.add_argument("answers", nargs="*", help="answers already given, in order")
+    policy.add_argument("--dataset-name", default=DEFAULT_DATASET_NAME, help="risk domain of the policy file")
+    policy.add_argument(
+        "--policy-file", default=None, help="policy file to read (generated_output/<dataset name>-policy.json.gz)"
+    )
+    policy.set_defaults(handler=run_policy)
+
+    # every option after serve is given to service.py (see main)
+    serve = commands.add_parser(
+        "serve", help="HTTP/JSON questionnaire service (options of service.py --help)", add_help=False
+    )
+    serve.set_defaults(handler=run_serve)
+    return parser
+
+
+def main(argv=None):
+    parser = get_parser()
+    args, unknown_args = parser.parse_known_args(argv)
+    if args.command == "serve":
+        args.service_args = [argument for argument in unknown_args if argument != "--"]
+    elif unknown_args:
+        parser.error(f"unrecognized arguments: {' '.join(unknown_args)}")
+    if not args.instrumentation_report:
+        return args.handler(args) or 0
+
+    import instrumentation
+
+    instrumentation.enable()
+    try:
+        return args.handler(args) or 0
+    finally:
+        instrumentation.write_report(args.instrumentation_report)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
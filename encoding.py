@@ -0,0 +1,322 @@
+import numpy as np
+
+from instrumentation import timed_stage
+from helper import SCALE_CUT_POINTS, SCALE_LABELS, get_scale_codes, get_utility_scores_from_counts
+
+# code used for missing answers (the -1 constant used by get_cleaned_data)
+MISSING_CODE = -1
+
+# labels of the risk classes in code order (scale columns use the same labels)
+RISK_CLASSES = list(SCALE_LABELS)
+
+
+def get_value_type(column, QUESTION_MAPPER):
+    """
+        returns the value type ("scale", "filter-q", "nominal" ....) of a column
+        from question-data.json, columns which are not in QUESTION_MAPPER get ""
+    """
+    return QUESTION_MAPPER.get(column, {}).get("values", "")
+
+
+def sort_answers(answers):
+    """
+        sorts a list of answers which can contain numbers and strings
+        numbers come first, then strings
+    """
+    return sorted(answers, key=lambda answer: (isinstance(answer, str), answer))
+
+
+# builds one shared code table per question-data.json value type
+def build_code_tables(dataset, QUESTION_MAPPER, scale_labels=SCALE_LABELS):
+    """
+        dataset: DataFrame -> cleaned dataset (scale columns can be raw or converted)
+
+        All the columns with the same value type share one code table, which is the
+        sorted list of all answers found in these columns (the -1 missing value is
+        never part of a code table, it is stored as MISSING_CODE)
+
+        Scale columns always use scale_labels as their code table
+
+        Example Output
+        {
+            "scale" : ['low', 'medium', 'high'],
+            "filter-q" : [0.0, 1.0],
+            "nominal" : [0.0, 0.5, 1.0],
+        }
+    """
+    answers_by_type = {}
+    for column in dataset.columns:
+        value_type = get_value_type(column, QUESTION_MAPPER)
+        if value_type == "scale":
+            continue
+        unique_answers = answers_by_type.setdefault(value_type, set())
+        unique_answers.update(answer for answer in dataset[column].unique() if answer != -1)
+
+    code_tables = {"scale": list(scale_labels)}
+    for value_type, unique_answers in answers_by_type.items():
+        code_tables[value_type] = sort_answers(unique_answers)
+    return code_tables
+
+
+def merge_code_tables(all_code_tables):
+    """
+        all_code_tables: List of code tables (from build_code_tables) of different datasets
+
+        returns one code table per value type with the answers of all of them, encoding the
+        datasets with it gives the same code to the same answer in every dataset
+    """
+    merged_answers = {}
+    for code_tables in all_code_tables:
+        for value_type, code_table in code_tables.items():
+            merged_answers.setdefault(value_type, []).extend(code_table)
+
+    merged_code_tables = {}
+    for value_type, answers in merged_answers.items():
+        if value_type == "scale":
+            # every dataset uses the same scale labels
+            merged_code_tables[value_type] = list(dict.fromkeys(answers))
+        else:
+            merged_code_tables[value_type] = sort_answers(set(answers))
+    return merged_code_tables
+
+
+def get_code_dtype(code_tables):
+    """
+        smallest signed integer type that can hold every code (and MISSING_CODE)
+    """
+    largest_table = max([len(code_table) for code_table in code_tables.values()], default=0)
+    for dtype in (np.int8, np.int16):
+        if largest_table <= np.iinfo(dtype).max:
+            return dtype
+    # free text or date like answers can have many more distinct values
+    return np.int32
+
+
+class EncodedDataset:
+    """
+        Compact integer coded version of the cleaned dataset
+
+        codes -> numpy array (num of columns, num of rows), one row of codes per question column
+            where each code is the position of the answer in the code table of the column value type
+            and MISSING_CODE means the question was not answered
+        target -> numpy int8 array (num of rows) with the position of the risk class in risk_classes
+    """
+
+    def __init__(self, columns, codes, target, value_types, code_tables, risk_classes):
+        self.columns = list(columns)
+        self.codes = codes
+        self.target = target
+        self.value_types = value_types
+        self.code_tables = code_tables
+        self.risk_classes = list(risk_classes)
+
+        # position of each column inside codes
+        self.column_index = {column: position for position, column in enumerate(self.columns)}
+
+    @property
+    def num_of_rows(self):
+        return self.target.shape[0]
+
+    @property
+    def nbytes(self):
+        """
+            memory used by codes and target in bytes
+        """
+        return self.codes.nbytes + self.target.nbytes
+
+    def get_column_codes(self, column):
+        return self.codes[self.column_index[column]]
+
+    def get_code_table(self, column):
+        return self.code_tables[self.value_types[column]]
+
+    def get_code(self, column, answer):
+        """
+            converts an answer into the code of the given column
+            returns MISSING_CODE when the answer is not in the code table
+        """
+        code_table = self.get_code_table(column)
+        if answer in code_table:
+            return code_table.index(answer)
+        return MISSING_CODE
+
+    def get_answer(self, column, code):
+        """
+            converts a code of the given column back to the answer
+        """
+        if code == MISSING_CODE:
+            return -1
+        return self.get_code_table(column)[code]
+
+    def get_answer_mask(self, column, answer):
+        """
+            boolean numpy array where column == answer (integer comparison)
+            answers which are not in the code table match no rows
+        """
+        code = self.get_code(column, answer)
+        if code == MISSING_CODE:
+            return np.zeros(self.num_of_rows, dtype=bool)
+        return self.get_column_codes(column) == code
+
+    def get_answer_counts(self, column):
+        """
+            number of rows for each code of the column code table (missing rows are ignored)
+        """
+        column_codes = self.get_column_codes(column)
+        return np.bincount(column_codes[column_codes >= 0], minlength=len(self.get_code_table(column)))
+
+    def get_question_choices_data(self):
+        """
+            same output as helper.get_question_choices_data but read from the code tables,
+            only the answers which appear in the column are choices
+        """
+        question_choices_data = {}
+        for column in self.columns:
+            code_table = self.get_code_table(column)
+            answer_counts = self.get_answer_counts(column)
+            question_choices_data[column] = [code_table[code] for code in np.flatnonzero(answer_counts)]
+        return question_choices_data
+
+    def take(self, rows):
+        """
+            rows: boolean mask or array of row positions
+
+            returns a new EncodedDataset with only the selected rows
+            (code tables are shared, not copied)
+        """
+        return EncodedDataset(
+            self.columns,
+            self.codes[:, rows],
+            self.target[rows],
+            self.value_types,
+            self.code_tables,
+            self.risk_classes,
+        )
+
+
+# converts the cleaned dataset into an EncodedDataset
+@timed_stage("encode_dataset")
+def encode_dataset(
+    dataset, QUESTION_MAPPER, TARGET_COLUMN, code_tables=None, cut_points=SCALE_CUT_POINTS, scale_labels=SCALE_LABELS
+):
+    """
+        dataset: DataFrame -> cleaned dataset
+        TARGET_COLUMN: String -> contains the name of the target column in dataset
+        code_tables: Dictionary -> optional code tables (from build_code_tables) to share
+            the same encoding between datasets
+        cut_points, scale_labels: used to bin the scale columns (see helper.get_scale_codes)
+
+        Numeric scale columns (and a numeric scale target) are binned straight into
+        class codes with one vectorized call, so convert_scale_columns_to_classes is
+        not needed before encoding. Already converted scale columns are also accepted.
+
+        Every column except TARGET_COLUMN becomes a row of integer codes
+    """
+    import pandas as pd
+
+    if len(scale_labels) != len(cut_points) + 1:
+        raise ValueError("scale_labels must have one more item than cut_points")
+    if code_tables is None:
+        code_tables = build_code_tables(dataset, QUESTION_MAPPER, scale_labels)
+    dtype = get_code_dtype(code_tables)
+
+    columns = [column for column in dataset.columns if column != TARGET_COLUMN]
+    value_types = {column: get_value_type(column, QUESTION_MAPPER) for column in columns}
+
+    # binning all the numeric scale columns at once
+    binned_columns = [
+        column
+        for column in columns + [TARGET_COLUMN]
+        if get_value_type(column, QUESTION_MAPPER) == "scale" and pd.api.types.is_numeric_dtype(dataset[column])
+    ]
+    binned_codes = {}
+    if binned_columns:
+        scale_codes = get_scale_codes(dataset[binned_columns].to_numpy(dtype=np.float64).T, cut_points)
+        binned_codes = dict(zip(binned_columns, scale_codes))
+
+    codes = np.empty((len(columns), dataset.shape[0]), dtype=dtype)
+    for position, column in enumerate(columns):
+        if column in binned_codes:
+            codes[position] = binned_codes[column]
+        else:
+            codes[position] = pd.Categorical(dataset[column], categories=code_tables[value_types[column]]).codes
+
+    if TARGET_COLUMN in binned_codes:
+        target = binned_codes[TARGET_COLUMN]
+    else:
+        target = pd.Categorical(dataset[TARGET_COLUMN], categories=scale_labels).codes.astype(np.int8)
+    return EncodedDataset(columns, codes, target, value_types, code_tables, scale_labels)
+
+
+# Gini impurity from risk class counts instead of a list of labels
+def gini_from_counts(class_counts):
+    """
+        class_counts: numpy array of number of rows per risk class
+        same result as helper.gini_measure_of_impurity for the matching labels
+    """
+    total_count = class_counts.sum()
+    if total_count == 0:
+        return 0
+    label_prob = class_counts / total_count
+    return 1 - float((label_prob**2).sum())
+
+
+def get_encoded_contingency_tensor(encoded, questions, max_block_size=2**24):
+    """
+        encoded: EncodedDataset
+        questions: List of String -> columns of encoded to count
+
+        builds the (question x answer code x risk class) counts with np.bincount over
+        the integer codes (one call unless the dataset needs more than max_block_size
+        indexes), missing answers are not counted
+
+        OUTPUT:
+        numpy array of shape (num of questions, largest code table, num of risk classes)
+    """
+    num_of_classes = len(encoded.risk_classes)
+    max_codes = max([len(encoded.get_code_table(question)) for question in questions], default=0)
+    cell_size = max(max_codes, 1) * num_of_classes
+    target = encoded.target.astype(np.int64)
+
+    counts = np.zeros((len(questions), max(max_codes, 1), num_of_classes), dtype=np.int64)
+    block_length = max(1, max_block_size // max(encoded.num_of_rows, 1))
+    for start in range(0, len(questions), block_length):
+        positions = [encoded.column_index[question] for question in questions[start : start + block_length]]
+        question_codes = encoded.codes[positions].astype(np.int64)
+        answered = (question_codes >= 0) & (target >= 0)
+        flat_indexes = (
+            np.arange(len(positions), dtype=np.int64)[:, None] * cell_size + question_codes * num_of_classes + target
+        )
+        block_counts = np.bincount(flat_indexes[answered], minlength=len(positions) * cell_size)
+        counts[start : start + len(positions)] = block_counts.reshape(len(positions), -1, num_of_classes)
+    return counts
+
+
+def get_utility_scores_from_tensor(questions, counts, num_of_rows):
+    """
+        questions: List of String -> questions of the first axis of counts
+        counts: numpy array built by get_encoded_contingency_tensor for the questions
+
+        returns the scores of the questions which have choices (codes with rows)
+    """
+    num_of_choices = (counts.sum(axis=2) > 0).sum(axis=1)
+    scores = get_utility_scores_from_counts(counts, num_of_choices, num_of_rows)
+    return {
+        question: float(score) for question, score, choices in zip(questions, scores, num_of_choices) if choices
+    }
+
+
+@timed_stage("get_encoded_utility_scores")
+def get_encoded_utility_scores(encoded, questions):
+    """
+        encoded: EncodedDataset
+        questions: List of String -> questions to score
+
+        same scores as helper.get_all_utility_scores, where the choices of a question
+        are the codes which appear in its column, questions without choices are skipped
+    """
+    questions = [question for question in questions if question in encoded.column_index]
+    if not questions:
+        return {}
+    counts = get_encoded_contingency_tensor(encoded, questions)
+    return get_utility_scores_from_tensor(questions, counts, encoded.num_of_rows)
@@ -0,0 +1,262 @@
+import heapq
+
+import numpy as np
+
+import instrumentation
+from instrumentation import timed_stage
+from node import NODE
+from helper import get_child_questions
+
+# parent of the root level nodes
+NO_PARENT = -1
+
+# score given to questions which have no choices in the dataset (worst score)
+WORST_SCORE = 1
+
+
+def get_question_scores(questions, question_choices, utility_scores):
+    """
+        questions: List of String -> questions of the tree
+        question_choices: Dictionary -> question as key and list of choices as value (like CHOICES_DATASET)
+        utility_scores: Dictionary -> question as key and utility score as value
+
+        returns the node score of every question, rounded like the tree output.
+        Questions without choices (complete N/A columns or no column at all) can't be
+        scored, they get the worst score -> WORST_SCORE
+    """
+    return {
+        question: round(utility_scores[question], 3) if question_choices.get(question) else WORST_SCORE
+        for question in questions
+    }
+
+
+def get_score_value(score):
+    """
+        scores are stored as float64, WORST_SCORE is given back as the integer used
+        by the NODE trees so the node labels stay the same (question___1)
+    """
+    score = float(score)
+    return WORST_SCORE if score == WORST_SCORE else score
+
+
+class FlatQuestionTree:
+    """
+        Question tree stored in flat arrays instead of NODE objects
+
+        nodes are numbered in depth first (pre-order) order, so a parent always comes before its children
+
+        questions -> List of String, question of every node
+        parents -> numpy int32 array, parent node of every node (NO_PARENT for the root level nodes)
+        child_offsets, child_nodes -> CSR style children, the children of node i are
+            child_nodes[child_offsets[i] : child_offsets[i + 1]] (in the order of QUESTION_CHILD_MAPPER)
+        scores -> numpy float64 array, score of every node
+        best -> numpy float64 array, best (lowest) score of the node and all its descendants
+        subtree_ends -> numpy int32 array, the subtree of node i is the node range [i, subtree_ends[i])
+        dirty -> numpy bool array, nodes whose score changed since their best was last updated
+
+        Building and traversing only use explicit stacks or array passes (no recursion), and
+        the whole tree is a handful of arrays, see nbytes.
+        get_node returns a NodeView which can be used like a NODE by the existing code.
+    """
+
+    def __init__(self, questions, parents, scores):
+        self.questions = questions
+        self.parents = np.asarray(parents, dtype=np.int32)
+        self.scores = np.asarray(scores, dtype=np.float64)
+        self.num_of_nodes = len(questions)
+
+        has_parent = self.parents != NO_PARENT
+        self.roots = np.flatnonzero(~has_parent).astype(np.int32)
+
+        # a stable sort on the parent keeps the children in pre-order (mapper) order
+        self.child_nodes = np.flatnonzero(has_parent)[np.argsort(self.parents[has_parent], kind="stable")]
+        self.child_nodes = self.child_nodes.astype(np.int32)
+        self.child_offsets = np.zeros(self.num_of_nodes + 1, dtype=np.int32)
+        np.cumsum(np.bincount(self.parents[has_parent], minlength=self.num_of_nodes), out=self.child_offsets[1:])
+
+        # children always come after their parent, so one reversed pass sees a whole subtree before its root
+        subtree_ends = list(range(1, self.num_of_nodes + 1))
+        for node, parent in zip(range(self.num_of_nodes - 1, -1, -1), reversed(self.parents.tolist())):
+            if parent != NO_PARENT and subtree_ends[node] > subtree_ends[parent]:
+                subtree_ends[parent] = subtree_ends[node]
+        self.subtree_ends = np.array(subtree_ends, dtype=np.int32)
+
+        # nodes of every question, a question can be the child of more than one question
+        self.question_nodes = {}
+        for node, question in enumerate(questions):
+            self.question_nodes.setdefault(question, []).append(node)
+
+        self.best = np.empty(self.num_of_nodes, dtype=np.float64)
+        self.dirty = np.zeros(self.num_of_nodes, dtype=bool)
+        self.update_best_scores()
+
+    @classmethod
+    @timed_stage("question_tree")
+    def build(cls, root_questions, QUESTION_CHILD_MAPPER, scores):
+        """
+            root_questions: List of String -> root level questions
+            scores: Dictionary with question as key and its score as value,
+                questions which are not in scores get WORST_SCORE
+
+            follows QUESTION_CHILD_MAPPER from the root questions with an explicit stack
+        """
+        questions = []
+        parents = []
+        stack = [(question, NO_PARENT) for question in reversed(root_questions)]
+        while stack:
+            question, parent = stack.pop()
+            node = len(questions)
+            questions.append(question)
+            parents.append(parent)
+            child_questions = get_child_questions(question, QUESTION_CHILD_MAPPER)
+            if child_questions:
+                stack.extend((child_question, node) for child_question in reversed(child_questions))
+        if instrumentation.ENABLED:
+            instrumentation.count("nodes_built", len(questions))
+        return cls(questions, parents, [scores.get(question, WORST_SCORE) for question in questions])
+
+    @property
+    def nbytes(self):
+        return sum(
+            array.nbytes
+            for array in (
+                self.parents,
+                self.roots,
+                self.child_nodes,
+                self.child_offsets,
+                self.subtree_ends,
+                self.scores,
+                self.best,
+                self.dirty,
+            )
+        )
+
+    def get_children(self, node):
+        return self.child_nodes[self.child_offsets[node] : self.child_offsets[node + 1]]
+
+    def update_best_scores(self):
+        """
+            best score of every node from its own score and the best of its children
+            in one reversed pre-order pass
+        """
+        best = self.scores.tolist()
+        for node, parent in zip(range(self.num_of_nodes - 1, -1, -1), reversed(self.parents.tolist())):
+            if parent != NO_PARENT and best[node] < best[parent]:
+                best[parent] = best[node]
+        self.best[:] = best
+        self.dirty[:] = False
+
+    def set_score(self, node, score):
+        """
+            changes the score of a node and marks it dirty, the best scores are
+            updated by the next update_dirty_best_scores call
+        """
+        if self.scores[node] != score:
+            self.scores[node] = score
+            self.dirty[node] = True
+
+    def set_scores(self, scores):
+        """
+            scores: Dictionary with question as key and its new score as value
+            (for example rescored on a narrowed subset or after a new chunk of data)
+
+            only the nodes whose score changes are marked dirty
+        """
+        for question, score in scores.items():
+            for node in self.question_nodes.get(question, []):
+                self.set_score(node, score)
+
+    def update_dirty_best_scores(self):
+        """
+            recomputes the best score of the dirty nodes and of their ancestors only,
+            deepest positions first so the children of a node are done before it.
+            A node whose best score does not change stops the update of its ancestors.
+
+            returns the number of recomputed nodes
+        """
+        # max heap of the pending nodes (negated positions)
+        pending = [-node for node in np.flatnonzero(self.dirty).tolist()]
+        heapq.heapify(pending)
+        num_of_updates = 0
+        while pending:
+            node = -heapq.heappop(pending)
+            self.dirty[node] = False
+            num_of_updates += 1
+
+            best = self.scores[node]
+            children = self.get_children(node)
+            if len(children):
+                best = min(best, self.best[children].min())
+            if best == self.best[node]:
+                continue
+            self.best[node] = best
+
+            parent = self.parents[node]
+            if parent != NO_PARENT and not self.dirty[parent]:
+                self.dirty[parent] = True
+                heapq.heappush(pending, -int(parent))
+        return num_of_updates
+
+    def iter_preorder(self, node=None):
+        """
+            iterates over the nodes of the subtree of node (of the whole tree when node is None) in pre-order
+        """
+        if node is None:
+            return iter(range(self.num_of_nodes))
+        return iter(range(node, self.subtree_ends[node]))
+
+    def get_node(self, node):
+        return NodeView(self, node)
+
+    def get_root_nodes(self):
+        """
+            root level nodes as NodeView, like the list returned by question_tree
+        """
+        return [NodeView(self, root) for root in self.roots]
+
+
+class NodeView(NODE):
+    """
+        Thin NODE compatible view of one node of a FlatQuestionTree,
+        holds only the tree and the node position, everything else is read from the arrays
+    """
+
+    def __init__(self, tree, node):
+        self.tree = tree
+        self.node = int(node)
+
+    @property
+    def question(self):
+        return self.tree.questions[self.node]
+
+    @property
+    def score(self):
+        return get_score_value(self.tree.scores[self.node])
+
+    @score.setter
+    def score(self, score):
+        self.tree.set_score(self.node, score)
+
+    @property
+    def best(self):
+        return get_score_value(self.tree.best[self.node])
+
+    @property
+    def children(self):
+        return [NodeView(self.tree, child) for child in self.tree.get_children(self.node)]
+
+    def add_child_node(self, child_node):
+        raise TypeError("the shape of a FlatQuestionTree is fixed, build a new tree to add questions")
+
+    def update_best_scores(self):
+        """
+            only the nodes changed since the last update (and their ancestors) are recomputed
+        """
+        self.tree.update_dirty_best_scores()
+        return self.best
+
+    def __eq__(self, other):
+        return isinstance(other, NodeView) and self.tree is other.tree and self.node == other.node
+
+    def __hash__(self):
+        return hash((id(self.tree), self.node))
@@ -1,5 +1,16 @@
-import pandas as pd
+import hashlib
 import json
+import os
+import shutil
+import threading
+
+import numpy as np
+
+import instrumentation
+from instrumentation import timed_stage
+
+# pandas is imported inside the functions which read or build DataFrames (lazily),
+# so modules which only score or walk trees do not pay for importing it
 
 
 # reading the question mapping data from json file
@@ -9,21 +20,302 @@ def load_json_file(filename):
     return data
 
 
-def get_cleaned_data(base_path, target_column):
+# csv file (inside base_path) with the assessment data
+DATASET_FILE_PATH = "Child/child-adolescent-suic.csv"
+
+# csv file (inside base_path) of every risk domain, formatted with the domain name without "_mg"
+DATASET_FILE_PATH_TEMPLATE = "Child/child-adolescent-{}.csv"
+
+# folder (inside base_path) where the cleaned dataset is cached as one .npy file per column
+CACHE_DIRECTORY = ".cache/cleaned-data/"
+
+# part of the cache key of the cleaned dataset, bump it whenever the cleaning changes the data
+# (COLUMN_RENAMES, clean_data, read_cleaned_csv) so the datasets cached before are not read again
+CLEANED_DATA_FORMAT_VERSION = 2
+
+
+# digests files are shared by the datasets loaded at the same time (see pipeline.py)
+DIGESTS_LOCK = threading.Lock()
+
+
+def get_dataset_file_path(dataset_name):
     """
-        base_path: String -> base path for code and csv files
+        dataset_name: String -> root question of the risk domain, example "hto_mg"
+        returns the csv file of the risk domain, example "Child/child-adolescent-hto.csv"
+    """
+    return DATASET_FILE_PATH_TEMPLATE.format(dataset_name.removesuffix("_mg"))
+
+
+@timed_stage("get_file_digest")
+def get_file_digest(file_path, digests_path=None):
+    """
+        file_path: String -> path of the file to hash
+        digests_path: String -> optional json file used to remember digests
+
+        returns the sha256 hex digest of the file content
+
+        when digests_path is given the digest is stored there along with the file size
+        and modification time, so an unchanged file is not hashed again on the next run
+    """
+    stat = os.stat(file_path)
+    file_key = os.path.abspath(file_path)
+    if digests_path:
+        with DIGESTS_LOCK:
+            known = load_json_file(digests_path).get(file_key) if os.path.exists(digests_path) else None
+        if known and known["size"] == stat.st_size and known["mtime_ns"] == stat.st_mtime_ns:
+            return known["digest"]
+
+    sha256 = hashlib.sha256()
+    with open(file_path, "rb") as file:
+        for block in iter(lambda: file.read(1024 * 1024), b""):
+            sha256.update(block)
+    digest = sha256.hexdigest()
+
+    if digests_path:
+        with DIGESTS_LOCK:
+            digests = load_json_file(digests_path) if os.path.exists(digests_path) else {}
+            digests[file_key] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "digest": digest}
+            # written under a temporary name first so a half written file is never read
+            temporary_path = digests_path + f".tmp-{os.getpid()}-{threading.get_ident()}"
+            with open(temporary_path, "w") as file:
+                json.dump(digests, file)
+            os.replace(temporary_path, digests_path)
+    return digest
+
+
+def save_cached_data(data, cache_path, manifest):
+    """
+        writes every column of data as a .npy file into cache_path along with
+        a manifest.json file, the folder is written under a temporary name first
+        so a half written cache is never read
+    """
+    temporary_path = cache_path.rstrip("/") + f".tmp-{os.getpid()}-{threading.get_ident()}"
+    os.makedirs(temporary_path, exist_ok=True)
+    columns = []
+    # columns with python objects (like text answers) can only be saved pickled
+    object_columns = []
+    for position, column in enumerate(data.columns):
+        values = data[column].to_numpy()
+        np.save(os.path.join(temporary_path, f"{position}.npy"), values, allow_pickle=values.dtype == object)
+        columns.append(column)
+        if values.dtype == object:
+            object_columns.append(column)
+    np.save(os.path.join(temporary_path, "index.npy"), data.index.to_numpy(), allow_pickle=False)
+
+    with open(os.path.join(temporary_path, "manifest.json"), "w") as file:
+        json.dump(dict(manifest, columns=columns, object_columns=object_columns, attrs=data.attrs), file)
+    shutil.rmtree(cache_path, ignore_errors=True)
+    os.replace(temporary_path, cache_path)
+
+
+def load_cached_data(cache_path):
+    """
+        reads a dataset written by save_cached_data
+        returns None when there is no (complete) cache in cache_path
+
+        only the object columns listed in the manifest are unpickled, loading any other
+        file which holds pickled data raises ValueError
+    """
+    import pandas as pd
+
+    manifest_path = os.path.join(cache_path, "manifest.json")
+    if not os.path.exists(manifest_path):
+        return None
+    manifest = load_json_file(manifest_path)
+    object_columns = set(manifest.get("object_columns", []))
+    columns = {}
+    for position, column in enumerate(manifest["columns"]):
+        columns[column] = np.load(os.path.join(cache_path, f"{position}.npy"), allow_pickle=column in object_columns)
+    index = np.load(os.path.join(cache_path, "index.npy"), allow_pickle=False)
+    data = pd.DataFrame(columns, index=index, columns=manifest["columns"])
+    data.attrs.update(manifest.get("attrs", {}))
+    return data
+
+
+def remove_stale_cache(cache_directory, source, digest):
+    """
+        deletes the cached datasets of the same source file which were built
+        from an older version of the file (a different digest) or by an older
+        version of the cleaning (CLEANED_DATA_FORMAT_VERSION)
+    """
+    for name in os.listdir(cache_directory):
+        if ".tmp-" in name:
+            # being written right now by another load
+            continue
+        manifest_path = os.path.join(cache_directory, name, "manifest.json")
+        if not os.path.exists(manifest_path):
+            continue
+        manifest = load_json_file(manifest_path)
+        format_version = manifest.get("parameters", {}).get("format_version")
+        if manifest.get("source") == source and (
+            manifest.get("digest") != digest or format_version != CLEANED_DATA_FORMAT_VERSION
+        ):
+            shutil.rmtree(os.path.join(cache_directory, name), ignore_errors=True)
+
+
+# columns which have a different name in the csv files, csv name -> question name
+COLUMN_RENAMES = {"friends_peers_mg": "friends_colleagues_mg"}
+
+# dtypes used when reading the csv, by question-data.json value type
+# the answers stay float64 so they compare exactly with the scale cut points and with the
+# answers typed by the user, and large integer (id or date coded) answers are never merged
+VALUE_TYPE_DTYPES = {"scale": "float64", "nominal": "float64"}
+DEFAULT_COLUMN_DTYPE = "float64"
+
+
+def get_required_columns(dataset_name, QUESTION_CHILD_MAPPER, QUESTION_MAPPER, target_column, knowledge_index=None):
+    """
+        dataset_name: String -> root question of the risk domain, example "suic_mg"
         target_column: String -> contains the name of the target column in csv dataset
+        knowledge_index: knowledge_index.KnowledgeIndex -> optional prebuilt index of QUESTION_CHILD_MAPPER
+
+        returns the target column followed by every question reachable from
+        dataset_name in QUESTION_CHILD_MAPPER which is defined in QUESTION_MAPPER
+        (question-data.json), these are the only columns the question tree of the
+        risk domain can use. Grouping nodes which are not in QUESTION_MAPPER have no
+        column in the csv file.
+    """
+    root_questions = get_child_questions(dataset_name, QUESTION_CHILD_MAPPER) or []
+    if knowledge_index is None:
+        tree_questions = get_descendant_questions(root_questions, QUESTION_CHILD_MAPPER)
+    else:
+        tree_questions = knowledge_index.get_descendant_questions(root_questions)
+    required_columns = [target_column] + [question for question in tree_questions if question in QUESTION_MAPPER]
+    # removing duplicates but keeping the order
+    return list(dict.fromkeys(required_columns))
 
-        output is cleaned DataFrame where NA is replace with -1 value
 
+def get_column_dtypes(columns, QUESTION_MAPPER):
     """
-    file_path = "Child/child-adolescent-suic.csv"
-    # reading the csv file where we defined "\\N" as Missing Data
-    data = pd.read_csv(base_path + file_path, na_values="\\N")
+        returns the dtype to read each column with, based on its value type in QUESTION_MAPPER
+    """
+    return {
+        column: VALUE_TYPE_DTYPES.get(QUESTION_MAPPER.get(column, {}).get("values"), DEFAULT_COLUMN_DTYPE)
+        for column in columns
+    }
+
+
+def get_csv_read_options(file_path, columns, dtypes=None):
+    """
+        file_path: String -> path of the csv file
+        columns: List of String -> requested columns (question names)
+        dtypes: Dictionary -> optional dtype for each of the columns
+
+        reads only the header of the csv file and returns
+            usecols -> csv names of the requested columns which are in the file
+            csv_dtypes -> dtypes keyed by csv column name
+            missing_columns -> requested columns which are not in the file
+    """
+    import pandas as pd
+
+    csv_columns = {COLUMN_RENAMES.get(column, column): column for column in pd.read_csv(file_path, nrows=0).columns}
+    missing_columns = [column for column in columns if column not in csv_columns]
+    usecols = [csv_columns[column] for column in columns if column in csv_columns]
+    csv_dtypes = {csv_columns[column]: dtype for column, dtype in (dtypes or {}).items() if column in csv_columns}
+    return usecols, csv_dtypes, missing_columns
+
+
+def get_mixed_answers(values):
+    """
+        values: Series -> answers of a column which has text answers among the numbers
+
+        the numbers (also when read as text) become floats like in the other columns,
+        the other answers stay strings
+    """
+    import pandas as pd
+
+    numbers = pd.to_numeric(values, errors="coerce").astype(np.float64)
+    return values.astype(object).where(numbers.isna(), numbers)
+
+
+def set_column_dtypes(data, csv_dtypes):
+    """
+        data: DataFrame -> rows read with the default dtypes
+        csv_dtypes: Dictionary -> dtypes keyed by csv column name
+
+        converts the columns of data one by one, returns the columns which have values
+        that do not fit their dtype, these are converted with get_mixed_answers instead
+    """
+    mistyped_columns = []
+    for column, dtype in csv_dtypes.items():
+        if column not in data.columns:
+            continue
+        try:
+            data[column] = data[column].astype(dtype)
+        except (ValueError, TypeError):
+            data[column] = get_mixed_answers(data[column])
+            mistyped_columns.append(column)
+    return mistyped_columns
+
+
+def read_csv_chunks(file_path, usecols, csv_dtypes, chunksize=None, mistyped_columns=None):
+    """
+        file_path: String -> path of the csv file
+        usecols, csv_dtypes: see get_csv_read_options
+        chunksize: Integer -> number of rows read at once, the whole file is one chunk when None
+        mistyped_columns: List -> the csv names of the columns which have values that do not
+            fit their dtype are appended to it
+
+        yields the rows of the csv file as DataFrames, "\\N" is read as a missing value
+
+        pandas raises ValueError when a value does not fit the dtype of its column (like a
+        text answer in a numeric column), then the rows of the failed chunk are read again
+        with the default dtypes and only the columns which do not fit are read as mixed
+        answers (see set_column_dtypes), in that chunk and all the next ones
+    """
+    import pandas as pd
+
+    dtypes = dict(csv_dtypes)
+    mistyped_columns = [] if mistyped_columns is None else mistyped_columns
+    num_of_read_rows = 0
+
+    def get_read_options():
+        return {
+            "na_values": "\\N",
+            "usecols": usecols,
+            # the header is kept, the rows which were already read are skipped
+            "skiprows": range(1, num_of_read_rows + 1) if num_of_read_rows else None,
+        }
 
-    data.rename(columns={"friends_peers_mg": "friends_colleagues_mg"}, inplace=True)
-    # Getting Required Columns from dataset
-    data = data.iloc[:, 4:]
+    while True:
+        try:
+            reader = pd.read_csv(file_path, dtype=dtypes, chunksize=chunksize, **get_read_options())
+            for chunk in [reader] if chunksize is None else reader:
+                for column in mistyped_columns:
+                    chunk[column] = get_mixed_answers(chunk[column])
+                num_of_read_rows += chunk.shape[0]
+                yield chunk
+            return
+        except ValueError:
+            chunk = pd.read_csv(file_path, nrows=chunksize, **get_read_options())
+            new_mistyped_columns = set_column_dtypes(chunk, dtypes)
+            if not new_mistyped_columns:
+                raise
+            for column in mistyped_columns:
+                chunk[column] = get_mixed_answers(chunk[column])
+            for column in new_mistyped_columns:
+                del dtypes[column]
+                mistyped_columns.append(column)
+            num_of_read_rows += chunk.shape[0]
+            yield chunk
+
+
+def clean_data(data, target_column, columns=None):
+    """
+        data: DataFrame -> data as read from the csv file (or a chunk of it)
+        target_column: String -> contains the name of the target column in csv dataset
+        columns: List of String -> requested columns, when None the first four
+            (non question) columns are dropped instead
+
+        output is cleaned DataFrame where NA is replace with -1 value
+    """
+    data = data.rename(columns=COLUMN_RENAMES)
+    if columns is None:
+        # Getting Required Columns from dataset
+        data = data.iloc[:, 4:]
+    else:
+        # keeping the requested column order
+        data = data[[column for column in columns if column in data.columns]]
 
     # droping all rows which has missing class (Risk Score)
     data = data.dropna(subset=[target_column])
@@ -37,7 +329,112 @@ def get_cleaned_data(base_path, target_column):
     return data
 
 
+@timed_stage("read_csv")
+def read_cleaned_csv(file_path, target_column, columns=None, dtypes=None):
+    """
+        file_path: String -> path of the csv file
+        target_column: String -> contains the name of the target column in csv dataset
+        columns: List of String -> optional, only these columns are read from the csv
+        dtypes: Dictionary -> optional dtype for each of the columns
+
+        output is cleaned DataFrame where NA is replace with -1 value
+
+        When columns is given, the columns which are not in the csv file are listed in
+        data.attrs["missing_columns"] and the columns with values which do not fit their
+        dtype (see read_csv_chunks) in data.attrs["mistyped_columns"]
+    """
+    import pandas as pd
+
+    missing_columns = []
+    mistyped_columns = []
+    if columns is None:
+        # reading the csv file where we defined "\\N" as Missing Data
+        data = pd.read_csv(file_path, na_values="\\N")
+    else:
+        # reading only the header to find which of the requested columns are available
+        usecols, csv_dtypes, missing_columns = get_csv_read_options(file_path, columns, dtypes)
+        data = next(read_csv_chunks(file_path, usecols, csv_dtypes, mistyped_columns=mistyped_columns))
+
+    data = clean_data(data, target_column, columns)
+    data.attrs["missing_columns"] = missing_columns
+    data.attrs["mistyped_columns"] = [COLUMN_RENAMES.get(column, column) for column in mistyped_columns]
+    return data
+
+
+@timed_stage("get_cleaned_data")
+def get_cleaned_data(
+    base_path, target_column, use_cache=True, columns=None, dtypes=None, dataset_file_path=DATASET_FILE_PATH
+):
+    """
+        base_path: String -> base path for code and csv files
+        target_column: String -> contains the name of the target column in csv dataset
+        use_cache: Boolean -> read/write the cleaned data from/to CACHE_DIRECTORY
+        columns: List of String -> optional, only these columns are loaded (see get_required_columns)
+        dtypes: Dictionary -> optional dtype for each of the columns (see get_column_dtypes)
+        dataset_file_path: String -> csv file inside base_path (see get_dataset_file_path)
+
+        output is cleaned DataFrame where NA is replace with -1 value
+
+        The cleaned data is cached as one .npy file per column, keyed on the sha256 of the
+        csv file, the cleaning parameters and CLEANED_DATA_FORMAT_VERSION. When the csv file
+        (or the cleaning) changes the key changes, so the old cache is never read again
+        (and is deleted when a new one is written).
+        Warm starts skip the csv parsing completely.
+
+        Requested columns which are not in the csv file are printed and listed in
+        data.attrs["missing_columns"], so are the columns with answers which do not fit
+        their dtype in data.attrs["mistyped_columns"]
+    """
+    file_path = base_path + dataset_file_path
+    if not use_cache:
+        data = read_cleaned_csv(file_path, target_column, columns, dtypes)
+    else:
+        cache_directory = base_path + CACHE_DIRECTORY
+        os.makedirs(cache_directory, exist_ok=True)
+
+        manifest = {
+            "source": os.path.abspath(file_path),
+            "digest": get_file_digest(file_path, cache_directory + "digests.json"),
+            "parameters": {
+                "format_version": CLEANED_DATA_FORMAT_VERSION,
+                "target_column": target_column,
+                "columns": columns,
+                "dtypes": dtypes,
+            },
+        }
+        cache_key = hashlib.sha256(
+            json.dumps([manifest["digest"], manifest["parameters"]], sort_keys=True).encode()
+        ).hexdigest()[:32]
+        cache_path = cache_directory + cache_key
+
+        data = load_cached_data(cache_path)
+        if data is None:
+            data = read_cleaned_csv(file_path, target_column, columns, dtypes)
+            save_cached_data(data, cache_path, manifest)
+            remove_stale_cache(cache_directory, manifest["source"], manifest["digest"])
+
+    if data.attrs.get("missing_columns"):
+        print(f"{len(data.attrs['missing_columns'])} requested columns are missing from {file_path}:")
+        print(", ".join(data.attrs["missing_columns"]))
+    if data.attrs.get("mistyped_columns"):
+        print(f"{len(data.attrs['mistyped_columns'])} columns of {file_path} have answers which are not numbers:")
+        print(", ".join(data.attrs["mistyped_columns"]))
+    return data
+
+
 ### UTIL FUNCTIONS ###
+def to_json_value(answer):
+    """
+        converts numpy scalars (float32, float64 ....) into plain python values
+    """
+    return answer.item() if hasattr(answer, "item") else answer
+
+
+# cut points between the "low", "medium" and "high" classes of scale values
+SCALE_CUT_POINTS = (0.4, 0.7)
+SCALE_LABELS = ("low", "medium", "high")
+
+
 # converts the scale data into classes "low", "medium", "high"
 def convert_to_low_medium_and_high_risk(label):
     """
@@ -53,19 +450,55 @@ def convert_to_low_medium_and_high_risk(label):
         return "high"
 
 
+def get_scale_columns(columns, QUESTION_MAPPER):
+    """
+        returns the columns which have "scale" values in QUESTION_MAPPER
+    """
+    return [
+        column for column in columns if QUESTION_MAPPER.get(column) and QUESTION_MAPPER[column]["values"] == "scale"
+    ]
+
+
+# bins scale values into class codes with a single vectorized call
+def get_scale_codes(values, cut_points=SCALE_CUT_POINTS):
+    """
+        values: numpy array of scale values (any shape)
+        cut_points: increasing list of class boundaries
+
+        returns the class code of each value, for the default cut points
+            code 0 ("low") -> value < 0.4
+            code 1 ("medium") -> 0.4 <= value < 0.7
+            code 2 ("high") -> value >= 0.7
+        exactly like convert_to_low_medium_and_high_risk
+    """
+    return np.digitize(values, cut_points).astype(np.int8)
+
+
 # converts all scale columns to class data
-def convert_scale_columns_to_classes(data, QUESTION_MAPPER):
+@timed_stage("convert_scale_columns_to_classes")
+def convert_scale_columns_to_classes(data, QUESTION_MAPPER, cut_points=SCALE_CUT_POINTS, labels=SCALE_LABELS):
     """
         Scale values columns (columns which contains values 0, 0.1, 0.2, 0.3 ........ 0.9, 1.0)
         are converted to 'low', 'medium' and 'high' accordingly
+
+        All the scale columns are binned at once with get_scale_codes.
+        labels must have one more item than cut_points.
+
+        Returns a new DataFrame, the given data is not modified
     """
-    for column in data.columns:
-        if QUESTION_MAPPER.get(column) and QUESTION_MAPPER[column]["values"] == "scale":
-            data[column] = data[column].apply(convert_to_low_medium_and_high_risk)
+    if len(labels) != len(cut_points) + 1:
+        raise ValueError("labels must have one more item than cut_points")
+
+    data = data.copy()
+    scale_columns = get_scale_columns(data.columns, QUESTION_MAPPER)
+    if scale_columns:
+        scale_codes = get_scale_codes(data[scale_columns].to_numpy(dtype=np.float64), cut_points)
+        data[scale_columns] = np.asarray(labels, dtype=object)[scale_codes]
     return data
 
 
 # gets the choices for each column name for the user to answer
+@timed_stage("get_question_choices_data")
 def get_question_choices_data(dataset):
     """
         generates the possible choices for given column names
@@ -79,7 +512,13 @@ def get_question_choices_data(dataset):
             "question 3" : [0 , 1],
             "question 4" : ['low, 'medium', 'high']
         }
+
+        dataset can also be an encoding.EncodedDataset, then the choices are
+        read straight from its code tables
     """
+    if hasattr(dataset, "code_tables"):
+        return dataset.get_question_choices_data()
+
     question_choices_data = {}
     for column in dataset.columns:
         # gets the unique answers list
@@ -105,6 +544,8 @@ def gini_measure_of_impurity(labels):
         gini impurity score. this score ranges from 0 to 1.
         Where 0 represent the best score and 1 represents the worst score
     """
+    if instrumentation.ENABLED:
+        instrumentation.count("gini_evaluations")
     total_count = len(labels)
     if total_count == 0:
         return 0
@@ -121,6 +562,7 @@ def gini_measure_of_impurity(labels):
 
 
 # Aggregating the Gini Scores for a Given Question
+@timed_stage("get_utility_score")
 def get_utility_score(dataset, question, unique_answers, TARGET_COLUMN):
     """
         Initializes Utility Score with 0
@@ -135,6 +577,10 @@ def get_utility_score(dataset, question, unique_answers, TARGET_COLUMN):
 
         returning average_utility_score
     """
+    if instrumentation.ENABLED:
+        instrumentation.count("utility_scores")
+        instrumentation.count("dataframe_filters", len(unique_answers))
+
     # initializing total_utility_score = 0
     total_utility_score = 0
 
@@ -172,6 +618,128 @@ def get_utility_score(dataset, question, unique_answers, TARGET_COLUMN):
     return average_score
 
 
+# Builds the (question x answer x risk class) contingency tensor in one pass
+def get_contingency_tensor(dataset, question_choices, TARGET_COLUMN, max_block_size=2**24):
+    """
+        dataset: DataFrame -> cleaned dataset (scale columns already converted)
+        question_choices: Dictionary -> question as key and list of choices as value
+            (same structure as get_question_choices_data output)
+        TARGET_COLUMN: String -> name of the risk class column
+
+        Each question column is coded against its own choices list (values which are
+        not a choice, like the -1 missing value, get code -1 and are not counted)
+        then all (question, answer, risk class) cells are counted with a single
+        np.bincount call instead of filtering the DataFrame once per answer.
+
+        max_block_size limits the size of the temporary index array, so very large
+        datasets are counted in a few blocks of questions instead of one.
+
+        OUTPUT:
+        counts -> numpy array of shape (num of questions, max num of choices, num of risk classes)
+        risk_classes -> list of risk class labels in the order of the last axis
+    """
+    import pandas as pd
+
+    questions = list(question_choices)
+    target_codes, risk_classes = pd.factorize(dataset[TARGET_COLUMN], sort=True)
+    num_of_classes = len(risk_classes)
+    max_choices = max([len(question_choices[question]) for question in questions], default=0)
+    cell_size = max(max_choices, 1) * num_of_classes
+
+    counts = np.zeros((len(questions), max(max_choices, 1), num_of_classes), dtype=np.int64)
+    block_length = max(1, max_block_size // max(dataset.shape[0], 1))
+    for start in range(0, len(questions), block_length):
+        block = questions[start : start + block_length]
+        flat_indexes = []
+        for position, question in enumerate(block):
+            answer_codes = pd.Categorical(dataset[question], categories=question_choices[question]).codes
+            answered = answer_codes >= 0
+            flat_indexes.append(
+                position * cell_size + answer_codes[answered].astype(np.int64) * num_of_classes + target_codes[answered]
+            )
+        if not flat_indexes:
+            continue
+        block_counts = np.bincount(np.concatenate(flat_indexes), minlength=len(block) * cell_size)
+        counts[start : start + len(block)] = block_counts.reshape(len(block), -1, num_of_classes)
+
+    return counts, list(risk_classes)
+
+
+# Vectorized version of get_utility_score working on answer/risk class counts
+def get_utility_scores_from_counts(counts, num_of_choices, num_of_rows):
+    """
+        counts: numpy array (num of questions, num of answers, num of risk classes)
+        num_of_choices: numpy array (num of questions) -> len(unique_answers) for each question
+        num_of_rows: Integer -> number of rows in the scored dataset
+
+        Applies the same formula as get_utility_score for every question at once:
+            average over answers of gini_impurity * (1 - probability)
+
+        Answers with no rows (including padding) have gini 0 so they only
+        count in the num_of_choices denominator, exactly like get_utility_score
+
+        OUTPUT:
+        numpy array of utility scores, one per question
+    """
+    counts = np.asarray(counts, dtype=np.float64)
+    if instrumentation.ENABLED:
+        instrumentation.count("utility_scores", len(num_of_choices))
+        instrumentation.count("gini_evaluations", int(np.sum(num_of_choices)))
+    answer_totals = counts.sum(axis=2)
+    safe_totals = np.where(answer_totals > 0, answer_totals, 1)
+    label_prob = counts / safe_totals[:, :, None]
+    gini_impurity = np.where(answer_totals > 0, 1 - (label_prob**2).sum(axis=2), 0)
+    probability = answer_totals / num_of_rows if num_of_rows else np.zeros_like(answer_totals)
+    total_utility_score = (gini_impurity * (1 - probability)).sum(axis=1)
+    return total_utility_score / np.maximum(np.asarray(num_of_choices, dtype=np.float64), 1)
+
+
+# Calculates the utility score of all the given questions in one pass
+@timed_stage("get_all_utility_scores")
+def get_all_utility_scores(dataset, question_choices, TARGET_COLUMN):
+    """
+        dataset: DataFrame -> cleaned dataset (scale columns already converted)
+        question_choices: Dictionary -> question as key and list of choices as value
+        TARGET_COLUMN: String -> name of the risk class column
+
+        Gives the same numbers as calling get_utility_score for every question but
+        the dataset is only scanned once (see get_contingency_tensor)
+
+        Questions with empty choices are skipped as get_utility_score can't score them
+
+        Example Output
+        {
+            "question 1" : 0.231,
+            "question 2" : 0.412,
+        }
+    """
+    question_choices = {question: choices for question, choices in question_choices.items() if choices}
+    if not question_choices:
+        return {}
+    counts, _ = get_contingency_tensor(dataset, question_choices, TARGET_COLUMN)
+    num_of_choices = [len(choices) for choices in question_choices.values()]
+    scores = get_utility_scores_from_counts(counts, num_of_choices, dataset.shape[0])
+    return {question: float(score) for question, score in zip(question_choices, scores)}
+
+
+def get_descendant_questions(questions, QUESTION_CHILD_MAPPER):
+    """
+        questions: List of String -> starting questions
+
+        returns the given questions and all their descendant questions
+        (in depth first order) using the QUESTION_CHILD_MAPPER
+    """
+    descendants = []
+    stack = list(reversed(questions))
+    while stack:
+        question = stack.pop()
+        descendants.append(question)
+        child_questions = get_child_questions(question, QUESTION_CHILD_MAPPER)
+        if child_questions:
+            stack.extend(reversed(child_questions))
+    return descendants
+
+
 def has_child(question, QUESTION_CHILD_MAPPER):
     """
         checks if a given question has child or not
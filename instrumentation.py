@@ -0,0 +1,179 @@
+"""
+    Stage timers and hot path counters of the pipeline
+
+        import instrumentation
+        instrumentation.enable()
+        ... run the pipeline ...
+        instrumentation.write_report("report.json")   # or "report.prom" for prometheus text format
+
+    Disabled by default. While disabled a decorated stage costs one flag check and the
+    counters are guarded at the call site with `if instrumentation.ENABLED:`, so the
+    hot loops (get_utility_score, gini_measure_of_impurity, NODE) pay nothing more.
+
+    Stages may run inside other stages (like read_csv inside get_cleaned_data), the
+    time of a stage includes the time of the stages it runs. Work done in other
+    processes (parallel_scoring workers) is only timed as the stage which started it.
+"""
+
+import functools
+import json
+import threading
+import time
+
+ENABLED = False
+
+# prefix of the prometheus metric names
+METRIC_PREFIX = "questionnaire"
+
+# descriptions of the counters, other counter names are also accepted
+COUNTER_DESCRIPTIONS = {
+    "dataframe_filters": "row subsets made, DataFrame filters of get_utility_score and AnswerIndex narrowing",
+    "utility_scores": "questions scored (get_utility_score or one row of a contingency tensor)",
+    "gini_evaluations": "gini impurities calculated (per answer of a question)",
+    "nodes_built": "question tree nodes built",
+    "renders": "tree image files rendered",
+}
+
+LOCK = threading.Lock()
+
+# stage name -> [number of calls, total seconds]
+STAGES = {}
+
+# counter name -> value
+COUNTERS = {}
+
+
+def enable():
+    global ENABLED
+    ENABLED = True
+
+
+def disable():
+    global ENABLED
+    ENABLED = False
+
+
+def reset():
+    """
+        forgets all the recorded stages and counters
+    """
+    with LOCK:
+        STAGES.clear()
+        COUNTERS.clear()
+
+
+def count(name, amount=1):
+    """
+        adds amount to the counter, callers in hot paths check ENABLED first
+    """
+    with LOCK:
+        COUNTERS[name] = COUNTERS.get(name, 0) + amount
+
+
+def record_stage(name, seconds):
+    with LOCK:
+        calls_and_seconds = STAGES.setdefault(name, [0, 0.0])
+        calls_and_seconds[0] += 1
+        calls_and_seconds[1] += seconds
+
+
+class stage:
+    """
+        context manager timing a block as the stage name (nothing is recorded while disabled)
+
+            with stage("load_mappers"):
+                ...
+    """
+
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+        self.start = None
+
+    def __enter__(self):
+        if ENABLED:
+            self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.start is not None:
+            record_stage(self.name, time.perf_counter() - self.start)
+        return False
+
+
+def timed_stage(name):
+    """
+        decorator timing every call of the function as the stage name
+    """
+
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return function(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                record_stage(name, time.perf_counter() - start)
+
+        return wrapper
+
+    return decorator
+
+
+def get_report():
+    """
+        Example Output
+        {
+            "stages": {"get_cleaned_data": {"calls": 1, "seconds": 0.412}, ....},
+            "counters": {"dataframe_filters": 180, "gini_evaluations": 180, ....}
+        }
+    """
+    with LOCK:
+        return {
+            "stages": {name: {"calls": calls, "seconds": seconds} for name, (calls, seconds) in STAGES.items()},
+            "counters": dict(COUNTERS),
+        }
+
+
+def quote_label(value):
+    return '"' + str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+
+
+def to_prometheus(report=None):
+    """
+        report (get_report output when None) in the prometheus text exposition format
+    """
+    report = report or get_report()
+    lines = []
+    for metric, description, field in (
+        ("stage_seconds_total", "time spent in the pipeline stage", "seconds"),
+        ("stage_calls_total", "number of runs of the pipeline stage", "calls"),
+    ):
+        name = f"{METRIC_PREFIX}_{metric}"
+        lines.append(f"# HELP {name} {description}")
+        lines.append(f"# TYPE {name} counter")
+        for stage_name, values in report["stages"].items():
+            lines.append(f"{name}{{stage={quote_label(stage_name)}}} {values[field]}")
+
+    for counter_name, value in report["counters"].items():
+        name = f"{METRIC_PREFIX}_{counter_name}_total"
+        lines.append(f"# HELP {name} {COUNTER_DESCRIPTIONS.get(counter_name, counter_name.replace('_', ' '))}")
+        lines.append(f"# TYPE {name} counter")
+        lines.append(f"{name} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def write_report(file_path):
+    """
+        writes the report as prometheus text when file_path ends with .prom, as json otherwise
+    """
+    report = get_report()
+    with open(file_path, "w") as file:
+        if file_path.endswith(".prom"):
+            file.write(to_prometheus(report))
+        else:
+            json.dump(report, file, indent=2)
+    return file_path
@@ -0,0 +1,173 @@
+from bisect import bisect_right
+
+# parent of the root node
+NO_PARENT = -1
+
+
+class KnowledgeIndex:
+    """
+        Prebuilt index of a knowledge (question) hierarchy
+
+        Every node of the hierarchy gets its depth first (pre-order) position, a question found in
+        many places of the hierarchy (like the gen_* questions shared by the risk domains) has one
+        position per place. The subtree of the node at position p is the positions
+        p .... subtree_ends[p] - 1 (its Euler tour entry and exit numbers), so
+
+            code -> node                 is a dictionary lookup
+            is_descendant                compares positions (a binary search when the code has many places)
+            descendants of a question    is a slice of codes, O(subtree)
+
+        Built from the QUESTION_CHILD_MAPPER json (from_mapper) or from the dictionary
+        trees of the knowledge xml with "code" and "elements" keys (from_tree)
+    """
+
+    def __init__(self, codes, parents, nodes=None):
+        """
+            codes: List of String -> code of every node in pre-order
+            parents: List of Integer -> position of the parent of every node (NO_PARENT for the roots)
+            nodes: optional List -> the node object of every position (returned by get_node)
+        """
+        self.codes = codes
+        self.parents = parents
+        self.nodes = nodes
+        self.num_of_nodes = len(codes)
+
+        # positions of every code in increasing order, the first one is where a depth first search finds it
+        self.positions = {}
+        for position, code in enumerate(codes):
+            self.positions.setdefault(code, []).append(position)
+
+        # one past the last position of every subtree, children come after their parent in pre-order
+        # so the reversed pass sees every subtree before its parent
+        self.subtree_ends = list(range(1, self.num_of_nodes + 1))
+        for position in range(self.num_of_nodes - 1, -1, -1):
+            parent = parents[position]
+            if parent != NO_PARENT and self.subtree_ends[position] > self.subtree_ends[parent]:
+                self.subtree_ends[parent] = self.subtree_ends[position]
+
+    @classmethod
+    def from_mapper(cls, QUESTION_CHILD_MAPPER, root_questions=None):
+        """
+            root_questions: List of String -> starting questions, defaults to the questions of
+                QUESTION_CHILD_MAPPER which are not the child of any question (like "root_mg")
+        """
+        if root_questions is None:
+            child_questions = {child for children in QUESTION_CHILD_MAPPER.values() if children for child in children}
+            root_questions = [question for question in QUESTION_CHILD_MAPPER if question not in child_questions]
+
+        codes = []
+        parents = []
+        stack = [(question, NO_PARENT) for question in reversed(root_questions)]
+        while stack:
+            question, parent = stack.pop()
+            position = len(codes)
+            codes.append(question)
+            parents.append(parent)
+            stack.extend((child, position) for child in reversed(QUESTION_CHILD_MAPPER.get(question) or []))
+        return cls(codes, parents)
+
+    @classmethod
+    def from_tree(cls, root, children_key="elements", code_key="code"):
+        """
+            root: Dictionary -> node with code_key and a list of child nodes in children_key
+                (nodes without a code get None)
+        """
+        codes = []
+        parents = []
+        nodes = []
+        stack = [(root, NO_PARENT)]
+        while stack:
+            node, parent = stack.pop()
+            position = len(codes)
+            codes.append(node.get(code_key))
+            parents.append(parent)
+            nodes.append(node)
+            stack.extend((child, position) for child in reversed(node.get(children_key, [])))
+        return cls(codes, parents, nodes)
+
+    def __len__(self):
+        return self.num_of_nodes
+
+    def __contains__(self, code):
+        return code in self.positions
+
+    def get_position(self, code):
+        """
+            first (pre-order) position of the code, None when it is not in the hierarchy
+        """
+        positions = self.positions.get(code)
+        return positions[0] if positions else None
+
+    def get_node(self, code):
+        """
+            node of the code (the first one found by a depth first search), None when it is not found
+        """
+        position = self.get_position(code)
+        return None if position is None or self.nodes is None else self.nodes[position]
+
+    def get_subtree(self, code):
+        """
+            positions of the subtree of the code (the code included) as a range
+        """
+        position = self.get_position(code)
+        if position is None:
+            return range(0)
+        return range(position, self.subtree_ends[position])
+
+    def get_subtree_codes(self, code):
+        """
+            the code followed by all its descendants in depth first order
+        """
+        subtree = self.get_subtree(code)
+        return self.codes[subtree.start : subtree.stop]
+
+    def get_descendants(self, code):
+        """
+            set of the codes of all the descendants of the code
+        """
+        subtree = self.get_subtree(code)
+        return set(self.codes[subtree.start + 1 : subtree.stop])
+
+    def get_children(self, code):
+        """
+            codes of the child nodes of the code
+        """
+        subtree = self.get_subtree(code)
+        children = []
+        position = subtree.start + 1
+        while position < subtree.stop:
+            children.append(self.codes[position])
+            position = self.subtree_ends[position]
+        return children
+
+    def is_descendant(self, ancestor, code):
+        """
+            True when code is found below ancestor (below its first place in the hierarchy)
+        """
+        subtree = self.get_subtree(ancestor)
+        positions = self.positions.get(code)
+        if not subtree or not positions:
+            return False
+        # first place of code after the ancestor position
+        index = bisect_right(positions, subtree.start)
+        return index < len(positions) and positions[index] < subtree.stop
+
+    def get_descendant_questions(self, questions):
+        """
+            same output as helper.get_descendant_questions: the given questions and all their
+            descendant questions in depth first order, every subtree is one slice
+        """
+        descendants = []
+        for question in questions:
+            if question in self.positions:
+                descendants.extend(self.get_subtree_codes(question))
+            else:
+                descendants.append(question)
+        return descendants
+
+    def get_codes_below(self, code, candidate_codes):
+        """
+            candidate_codes (in their own order) which are the code itself or one of its descendants
+        """
+        subtree_codes = set(self.get_subtree_codes(code))
+        return [candidate for candidate in candidate_codes if candidate in subtree_codes]
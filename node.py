@@ -1,4 +1,8 @@
-from graphviz import Digraph
+import heapq
+from itertools import count, islice
+
+import instrumentation
+from instrumentation import timed_stage
 
 
 class NODE:
@@ -15,6 +19,9 @@ class NODE:
         # stores the best scores from all child and root Node
         self.best = None
 
+        if instrumentation.ENABLED:
+            instrumentation.count("nodes_built")
+
     def add_child_node(self, child_node):
         """
             input:
@@ -35,21 +42,32 @@ class NODE:
         else:
             self.children.append(child_node)
 
+    @timed_stage("update_best_scores")
     def update_best_scores(self):
         """
             Process:
                 stores the current Node Score, then looks deep into all child node
                 to get the best score among all root node or child nodes.
+
+                Done in a single post-order pass with an explicit stack, every
+                node of the subtree is updated once (children before their parent)
         """
-        self.best = self.score
-        if self.children:
-            for child in self.children:
-                child_best = child.update_best_scores()
+        # collecting the subtree in pre-order, reversed it has every child before its parent
+        subtree = []
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            subtree.append(node)
+            stack.extend(node.children)
+
+        for node in reversed(subtree):
+            node.best = node.score
+            for child in node.children:
                 """
                     Checking for lower score(best Score)
                 """
-                if child_best < self.best:
-                    self.best = child_best
+                if child.best < node.best:
+                    node.best = child.best
         return self.best
 
     def __repr__(self):
@@ -58,21 +76,97 @@ class NODE:
         """
         return f"{self.question}___{self.best}"
 
-    def to_graphviz(self, parent=None, graph=None):
-        if graph is None:
-            graph = Digraph(format='png')
-            graph.node(self.__repr__())
-
-        if parent is not None:
-            graph.edge(parent.__repr__(), self.__repr__())
-
-        for child in self.children:
-            child.to_graphviz(self, graph)
-
+    @timed_stage("to_graphviz")
+    def to_graphviz(self, max_depth=None, top_k=None):
+        """
+            graphviz Digraph of the tree, every node gets a unique id (its position in
+            iter_tree_nodes) and __repr__ is only used as its label, so nodes sharing a
+            question and best score are never merged
+        """
+        # graphviz is only needed to draw the trees
+        from graphviz import Digraph
+
+        graph = Digraph(format='png')
+        for node_id, parent_id, node, num_of_hidden_children in iter_tree_nodes(self, max_depth, top_k):
+            graph.node(f"n{node_id}", label=node.__repr__())
+            if parent_id is not None:
+                graph.edge(f"n{parent_id}", f"n{node_id}")
+            if num_of_hidden_children:
+                graph.node(f"n{node_id}_more", label=f"{num_of_hidden_children} more", shape="plaintext")
+                graph.edge(f"n{node_id}", f"n{node_id}_more", style="dashed")
         return graph
 
-    def visualize_tree(self):
-        graph = self.to_graphviz()
-
-        # Render the graph to a file
-        graph.render(filename="generated_output/" + self.question, format='png', cleanup=True)
+    @timed_stage("visualize_tree")
+    def visualize_tree(self, output_directory="generated_output/", formats=("png",), max_depth=None, top_k=None):
+        """
+            Renders the tree to output_directory/question.png (or the other formats),
+            skipped when the tree did not change since the last render (see rendering.render_trees)
+        """
+        from rendering import render_trees
+
+        render_trees([self], output_directory, formats, max_depth=max_depth, top_k=top_k)
+
+
+def get_shown_children(children, top_k=None):
+    """
+        children: List of NODE
+        returns the children, only the top_k with the best (lowest) best score when top_k is given
+        (ties and the result keep the child order)
+    """
+    if top_k is None or len(children) <= top_k:
+        return children
+    best_children = sorted(enumerate(children), key=lambda child: (child[1].best, child[0]))[:top_k]
+    return [child for _, child in sorted(best_children, key=lambda child: child[0])]
+
+
+def iter_tree_nodes(root_node, max_depth=None, top_k=None):
+    """
+        root_node: NODE
+        max_depth: Integer -> optional, children deeper than max_depth (root is depth 0) are left out
+        top_k: Integer -> optional, only the top_k children by best score of every node are kept
+
+        yields (node id, parent id or None, node, number of left out children) in depth first
+        order with an explicit stack, node ids are unique and stable (pre-order positions)
+    """
+    num_of_nodes = 0
+    stack = [(root_node, None, 0)]
+    while stack:
+        node, parent_id, depth = stack.pop()
+        node_id = num_of_nodes
+        num_of_nodes += 1
+
+        children = node.children
+        shown_children = [] if max_depth is not None and depth >= max_depth else get_shown_children(children, top_k)
+        yield node_id, parent_id, node, len(children) - len(shown_children)
+        stack.extend((child, node_id, depth + 1) for child in reversed(shown_children))
+
+
+def iter_ordered_questions(root_nodes):
+    """
+        root_nodes: List of NODE -> Root Level Question Nodes (like the output of question_tree)
+
+        yields the questions in order of importance: the queued node with the best (lowest)
+        best score comes first, then its children join the queue.
+
+        The queue is a heap of (best, insertion number, node), ties go to the node which was
+        queued first (like the linear scan over the queue list did). Questions are only
+        ordered when they are asked for, so taking the first k questions costs O(k log n)
+    """
+    insertion_numbers = count()
+    question_queue = [(node.best, next(insertion_numbers), node) for node in root_nodes]
+    heapq.heapify(question_queue)
+    while question_queue:
+        _, _, best_question_node = heapq.heappop(question_queue)
+        yield best_question_node.question
+
+        # If best question node has children then add them into question_queue
+        for child in best_question_node.children:
+            heapq.heappush(question_queue, (child.best, next(insertion_numbers), child))
+
+
+@timed_stage("question_ordering")
+def top_k(root_nodes, k):
+    """
+        returns the k most important questions (see iter_ordered_questions)
+    """
+    return list(islice(iter_ordered_questions(root_nodes), k))
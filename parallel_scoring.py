@@ -0,0 +1,141 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from instrumentation import timed_stage
+from encoding import EncodedDataset, get_encoded_contingency_tensor, get_utility_scores_from_tensor
+
+# number of question chunks per worker, more chunks even out subtrees of different sizes
+CHUNKS_PER_WORKER = 4
+
+# dataset used by the worker processes, attached once per process by init_worker
+WORKER_DATASET = None
+
+# shared memory blocks of WORKER_DATASET, kept open while the worker is alive
+WORKER_SHARED_MEMORY = []
+
+
+class SharedEncodedDataset:
+    """
+        Copies the codes and target arrays of an encoding.EncodedDataset into
+        multiprocessing.shared_memory blocks, so worker processes can attach to them
+        instead of receiving a pickled copy of the data.
+
+        Used as a context manager, the blocks are released on exit
+
+            with SharedEncodedDataset(encoded) as shared:
+                ... ProcessPoolExecutor(initializer=init_worker, initargs=(shared.description,))
+    """
+
+    def __init__(self, encoded):
+        self.blocks = []
+        arrays = {}
+        for name, array in (("codes", encoded.codes), ("target", encoded.target)):
+            block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            self.blocks.append(block)
+            np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+            arrays[name] = (block.name, array.shape, array.dtype.str)
+
+        # everything the workers need to rebuild the EncodedDataset, only small python objects
+        self.description = {
+            "arrays": arrays,
+            "columns": encoded.columns,
+            "value_types": encoded.value_types,
+            "code_tables": encoded.code_tables,
+            "risk_classes": encoded.risk_classes,
+        }
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+    def release(self):
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+        self.blocks = []
+
+
+def attach_encoded_dataset(description):
+    """
+        description: SharedEncodedDataset.description
+
+        returns (EncodedDataset reading the shared memory blocks without copying them, list of the blocks)
+    """
+    blocks = []
+    arrays = {}
+    for name, (block_name, shape, dtype) in description["arrays"].items():
+        block = shared_memory.SharedMemory(name=block_name)
+        blocks.append(block)
+        arrays[name] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+    encoded = EncodedDataset(
+        description["columns"],
+        arrays["codes"],
+        arrays["target"],
+        description["value_types"],
+        description["code_tables"],
+        description["risk_classes"],
+    )
+    return encoded, blocks
+
+
+def init_worker(description):
+    global WORKER_DATASET, WORKER_SHARED_MEMORY
+    WORKER_DATASET, WORKER_SHARED_MEMORY = attach_encoded_dataset(description)
+
+
+def count_questions(questions):
+    """
+        runs in a worker process, contingency counts of a chunk of questions
+    """
+    return get_encoded_contingency_tensor(WORKER_DATASET, questions)
+
+
+def get_question_chunks(questions, num_of_chunks):
+    """
+        splits the questions into contiguous chunks, questions in depth first order
+        keep most of a subtree inside the same chunk
+    """
+    chunk_length = max(1, -(-len(questions) // num_of_chunks))
+    return [questions[start : start + chunk_length] for start in range(0, len(questions), chunk_length)]
+
+
+# Calculates the utility scores with a pool of worker processes
+@timed_stage("score_questions")
+def get_parallel_utility_scores(encoded, questions, max_workers=None):
+    """
+        encoded: encoding.EncodedDataset
+        questions: List of String -> questions to score (like TREE_QUESTIONS)
+        max_workers: Integer -> number of worker processes (defaults to the number of cpus),
+            1 scores in this process
+
+        The dataset is put in shared memory once and the workers count chunks of questions
+        (root subtrees when the questions are in depth first order). The integer counts are
+        put back together and scored here with the same code as
+        encoding.get_encoded_utility_scores, so the scores are identical to the serial ones.
+    """
+    questions = [question for question in questions if question in encoded.column_index]
+    if not questions:
+        return {}
+    max_workers = max_workers or os.cpu_count() or 1
+    if max_workers == 1:
+        counts = get_encoded_contingency_tensor(encoded, questions)
+        return get_utility_scores_from_tensor(questions, counts, encoded.num_of_rows)
+
+    chunks = get_question_chunks(questions, max_workers * CHUNKS_PER_WORKER)
+    with SharedEncodedDataset(encoded) as shared:
+        with ProcessPoolExecutor(max_workers, initializer=init_worker, initargs=(shared.description,)) as executor:
+            chunk_counts = list(executor.map(count_questions, chunks))
+
+    # same shape as the serial contingency tensor, chunks can have smaller code tables
+    max_codes = max(chunk.shape[1] for chunk in chunk_counts)
+    counts = np.zeros((len(questions), max_codes, len(encoded.risk_classes)), dtype=np.int64)
+    start = 0
+    for chunk in chunk_counts:
+        counts[start : start + len(chunk), : chunk.shape[1]] = chunk
+        start += len(chunk)
+    return get_utility_scores_from_tensor(questions, counts, encoded.num_of_rows)
@@ -0,0 +1,295 @@
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from encoding import build_code_tables, encode_dataset, merge_code_tables
+from instrumentation import stage, timed_stage
+from flat_tree import FlatQuestionTree, get_question_scores
+from knowledge_index import KnowledgeIndex
+from node import iter_ordered_questions
+from parallel_scoring import get_parallel_utility_scores
+from rendering import render_trees as render_question_trees
+from streaming import stream_contingency_counts
+from helper import (
+    load_json_file,
+    get_cleaned_data,
+    get_dataset_file_path,
+    get_required_columns,
+    get_column_dtypes,
+    SCALE_CUT_POINTS,
+)
+
+# question of QUESTION_CHILD_MAPPER which holds all the risk domains
+ROOT_DATASET_NAME = "root_mg"
+
+# folder (inside base_path) where the trees and ordered questions are written
+OUTPUT_DIRECTORY = "generated_output/"
+
+
+class RiskDomain:
+    """
+        Question tree and ordered questions of one risk domain (like "suic_mg")
+
+        the target column of a domain is its own name and its csv file comes from
+        helper.get_dataset_file_path unless they are given
+    """
+
+    def __init__(
+        self, dataset_name, root_questions, columns, target_column=None, dataset_file_path=None, tree_questions=None
+    ):
+        self.dataset_name = dataset_name
+        self.target_column = target_column or dataset_name
+        self.dataset_file_path = dataset_file_path or get_dataset_file_path(dataset_name)
+        self.root_questions = root_questions
+        self.columns = columns
+        # root questions and all their descendants in depth first order (like TREE_QUESTIONS)
+        self.tree_questions = tree_questions
+        self.dataset = None
+        self.encoded = None
+        self.tree = None
+        self.ordered_questions = None
+
+
+def load_mappers(base_path=""):
+    """
+        returns (QUESTION_MAPPER, QUESTION_CHILD_MAPPER) read from the json files in base_path
+    """
+    return load_json_file(base_path + "question-data.json"), load_json_file(base_path + "child_question_mapper.json")
+
+
+def get_risk_domain(dataset_name, QUESTION_CHILD_MAPPER, QUESTION_MAPPER, target_column=None, knowledge_index=None):
+    """
+        dataset_name: String -> root question of the risk domain, example "suic_mg"
+        knowledge_index: KnowledgeIndex -> index of QUESTION_CHILD_MAPPER, built here when None
+
+        only the root questions which are available in QUESTION_MAPPER are used
+    """
+    target_column = target_column or dataset_name
+    if knowledge_index is None:
+        knowledge_index = KnowledgeIndex.from_mapper(QUESTION_CHILD_MAPPER)
+    root_questions = [question for question in QUESTION_CHILD_MAPPER[dataset_name] if question in QUESTION_MAPPER]
+    return RiskDomain(
+        dataset_name,
+        root_questions,
+        get_required_columns(dataset_name, QUESTION_CHILD_MAPPER, QUESTION_MAPPER, target_column, knowledge_index),
+        target_column=target_column,
+        tree_questions=knowledge_index.get_descendant_questions(root_questions),
+    )
+
+
+def get_risk_domains(QUESTION_CHILD_MAPPER, QUESTION_MAPPER, dataset_names=None):
+    """
+        dataset_names: List of String -> risk domains to build, every domain of ROOT_DATASET_NAME when None
+    """
+    if dataset_names is None:
+        dataset_names = QUESTION_CHILD_MAPPER[ROOT_DATASET_NAME]
+    # one index serves all the domains
+    knowledge_index = KnowledgeIndex.from_mapper(QUESTION_CHILD_MAPPER)
+    return [
+        get_risk_domain(dataset_name, QUESTION_CHILD_MAPPER, QUESTION_MAPPER, knowledge_index=knowledge_index)
+        for dataset_name in dataset_names
+    ]
+
+
+def load_domain_dataset(domain, base_path, QUESTION_MAPPER):
+    domain.dataset = get_cleaned_data(
+        base_path,
+        domain.target_column,
+        columns=domain.columns,
+        dtypes=get_column_dtypes(domain.columns, QUESTION_MAPPER),
+        dataset_file_path=domain.dataset_file_path,
+    )
+    return domain
+
+
+def order_domain_questions(domain, QUESTION_CHILD_MAPPER, question_choices, utility_scores):
+    """
+        question_choices: Dictionary -> question as key and list of choices as value
+        utility_scores: Dictionary -> question as key and utility score as value
+
+        builds the question tree of the domain and its questions in order of importance
+    """
+    scores = get_question_scores(domain.tree_questions, question_choices, utility_scores)
+    domain.tree = FlatQuestionTree.build(domain.root_questions, QUESTION_CHILD_MAPPER, scores)
+    with stage("question_ordering"):
+        domain.ordered_questions = list(iter_ordered_questions(domain.tree.get_root_nodes()))
+    return domain
+
+
+def build_domain_tree(domain, QUESTION_CHILD_MAPPER, QUESTION_MAPPER, code_tables=None, scoring_workers=1):
+    """
+        encodes the domain dataset (with the shared code tables when given), scores every
+        question of the domain and builds its question tree and ordered question list
+
+        scoring_workers: Integer -> number of processes used to score the questions
+            (see parallel_scoring.get_parallel_utility_scores)
+    """
+    domain.encoded = encode_dataset(
+        domain.dataset, QUESTION_MAPPER, domain.target_column, code_tables=code_tables, cut_points=SCALE_CUT_POINTS
+    )
+    # the DataFrame is not needed once it is encoded
+    domain.dataset = None
+
+    utility_scores = get_parallel_utility_scores(domain.encoded, domain.tree_questions, max_workers=scoring_workers)
+    return order_domain_questions(
+        domain, QUESTION_CHILD_MAPPER, domain.encoded.get_question_choices_data(), utility_scores
+    )
+
+
+def stream_domain_tree(domain, base_path, QUESTION_CHILD_MAPPER, QUESTION_MAPPER, chunksize):
+    """
+        Streaming mode: the csv file is read in chunks of chunksize rows and only the per
+        question answer/risk class counts are kept, so the complete dataset is never held in memory
+    """
+    counts = stream_contingency_counts(
+        base_path + domain.dataset_file_path,
+        domain.target_column,
+        domain.columns,
+        QUESTION_MAPPER,
+        dtypes=get_column_dtypes(domain.columns, QUESTION_MAPPER),
+        chunksize=chunksize,
+        cut_points=SCALE_CUT_POINTS,
+    )
+    return order_domain_questions(
+        domain,
+        QUESTION_CHILD_MAPPER,
+        counts.get_question_choices_data(),
+        counts.get_utility_scores(domain.tree_questions),
+    )
+
+
+# builds the question tree and ordered questions of one risk domain
+@timed_stage("build_domain")
+def build_domain(
+    base_path="",
+    dataset_name="suic_mg",
+    target_column=None,
+    streaming_chunk_size=None,
+    scoring_workers=1,
+    QUESTION_MAPPER=None,
+    QUESTION_CHILD_MAPPER=None,
+):
+    """
+        base_path: String -> base path for code and csv files
+        dataset_name: String -> root question of the risk domain, example "suic_mg"
+        target_column: String -> target column of the csv file, dataset_name when None
+        streaming_chunk_size: Integer -> when set, the csv file is streamed in chunks of this many rows
+        scoring_workers: Integer -> number of processes used to score the questions
+        QUESTION_MAPPER, QUESTION_CHILD_MAPPER: already loaded mappers, read from base_path when None
+
+        Output is the RiskDomain with its tree (domain.tree.get_root_nodes() are the root level
+        question nodes) and ordered_questions
+    """
+    if QUESTION_MAPPER is None or QUESTION_CHILD_MAPPER is None:
+        QUESTION_MAPPER, QUESTION_CHILD_MAPPER = load_mappers(base_path)
+    domain = get_risk_domain(dataset_name, QUESTION_CHILD_MAPPER, QUESTION_MAPPER, target_column)
+    if streaming_chunk_size:
+        return stream_domain_tree(domain, base_path, QUESTION_CHILD_MAPPER, QUESTION_MAPPER, streaming_chunk_size)
+    load_domain_dataset(domain, base_path, QUESTION_MAPPER)
+    return build_domain_tree(domain, QUESTION_CHILD_MAPPER, QUESTION_MAPPER, scoring_workers=scoring_workers)
+
+
+@timed_stage("write_domain_outputs")
+def write_domain_outputs(
+    domain, output_directory, QUESTION_MAPPER, render_trees=True, render_formats=("png",), render_workers=None
+):
+    """
+        writes the ordered questions of the domain as json and renders its question trees
+        into output_directory/dataset_name/ (see rendering.render_trees, unchanged trees are not
+        rendered again). Root questions like adv_life_event_mg are shared by many domains with
+        different scores, so every domain gets its own folder and render cache.
+
+        render_workers: Integer -> largest number of dot processes at the same time (number of cpus when None)
+    """
+    with open(os.path.join(output_directory, f"{domain.dataset_name}-ordered-questions.json"), "w") as file:
+        json.dump(
+            [
+                {"question": question, "text": QUESTION_MAPPER.get(question, {}).get("question", "Unavailable")}
+                for question in domain.ordered_questions
+            ],
+            file,
+            indent=2,
+        )
+    if render_trees:
+        render_question_trees(
+            domain.tree.get_root_nodes(),
+            os.path.join(output_directory, domain.dataset_name),
+            render_formats,
+            max_workers=render_workers,
+        )
+
+
+# builds the question trees and ordered questions of all the risk domains in one run
+@timed_stage("run_all_domains")
+def run_all_domains(
+    base_path="", dataset_names=None, max_workers=None, render_trees=True, render_formats=("png",), render_workers=None
+):
+    """
+        base_path: String -> base path for code and csv files
+        dataset_names: List of String -> risk domains to build, all the domains of root_mg when None
+        max_workers: Integer -> number of domains handled at the same time (threads)
+        render_trees: Boolean -> render the tree images with graphviz
+        render_formats: List of String -> formats of the tree images (png, svg or dot)
+        render_workers: Integer -> largest number of dot processes at the same time (number of cpus when None)
+
+        1. the json mappers are loaded once for all the domains
+        2. the csv file of every domain is loaded once, all of them at the same time
+        3. the code tables of all the datasets are merged, so the columns the domains have
+           in common are encoded the same way
+        4. the domains are encoded, scored and ordered at the same time
+        5. the domains are written to OUTPUT_DIRECTORY one after the other (the tree images of a
+           domain go into OUTPUT_DIRECTORY/dataset_name/), so at most render_workers dot processes
+           run at once for all the domains together
+
+        Domains whose csv file does not exist are skipped.
+        Output is the list of built RiskDomain objects
+    """
+    QUESTION_MAPPER, QUESTION_CHILD_MAPPER = load_mappers(base_path)
+    domains = get_risk_domains(QUESTION_CHILD_MAPPER, QUESTION_MAPPER, dataset_names)
+
+    available_domains = []
+    for domain in domains:
+        if os.path.exists(base_path + domain.dataset_file_path):
+            available_domains.append(domain)
+        else:
+            print(f"SKIPPING {domain.dataset_name}: {domain.dataset_file_path} NOT FOUND")
+
+    output_directory = base_path + OUTPUT_DIRECTORY
+    os.makedirs(output_directory, exist_ok=True)
+
+    with ThreadPoolExecutor(max_workers or len(available_domains) or 1) as executor:
+        list(executor.map(lambda domain: load_domain_dataset(domain, base_path, QUESTION_MAPPER), available_domains))
+
+        code_tables = merge_code_tables(
+            [build_code_tables(domain.dataset, QUESTION_MAPPER) for domain in available_domains]
+        )
+        list(
+            executor.map(
+                lambda domain: build_domain_tree(domain, QUESTION_CHILD_MAPPER, QUESTION_MAPPER, code_tables),
+                available_domains,
+            )
+        )
+
+    # rendering already runs render_workers dot processes, more domains at once would only oversubscribe the cpus
+    for domain in available_domains:
+        write_domain_outputs(domain, output_directory, QUESTION_MAPPER, render_trees, render_formats, render_workers)
+
+    with open(output_directory + "domains-summary.json", "w") as file:
+        json.dump(
+            {
+                domain.dataset_name: {
+                    "num_of_rows": domain.encoded.num_of_rows,
+                    "num_of_questions": len(domain.ordered_questions),
+                    "top_questions": domain.ordered_questions[:15],
+                }
+                for domain in available_domains
+            },
+            file,
+            indent=2,
+        )
+    print(f"QUESTION TREES AND ORDERED QUESTIONS OF {len(available_domains)} DOMAINS ARE SAVED INTO {output_directory}")
+    return available_domains
+
+
+if __name__ == "__main__":
+    run_all_domains()
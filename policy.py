@@ -0,0 +1,95 @@
+import gzip
+import json
+
+from risk import get_risk_estimate
+
+# version of the compiled policy file format
+POLICY_FORMAT_VERSION = 1
+
+# node position of the first question
+ROOT_NODE = 0
+
+# question position of the nodes where the questionnaire ends
+LEAF = -1
+
+
+def save_policy(policy, filename):
+    """
+        writes a policy built by policy_compiler.compile_policy as gzip compressed json
+    """
+    with gzip.open(filename, "wt", encoding="utf-8") as file:
+        json.dump(policy, file, separators=(",", ":"))
+
+
+class DecisionPolicy:
+    """
+        Runtime side of the compiled adaptive questionnaire (see policy_compiler.py)
+
+        The policy file holds
+            questions -> question names
+            code_tables -> choices of every question (the answers found in the dataset, in code order)
+            risk_classes, full_class_counts -> used for the risk estimate
+            nodes -> list of [question position or LEAF, child node per choice, risk class counts]
+
+        The state of a session is just a node position, serving a session is a few
+        list lookups. Only json and gzip are needed, not numpy or pandas.
+    """
+
+    def __init__(self, policy):
+        if policy.get("version") != POLICY_FORMAT_VERSION:
+            raise ValueError(f"unsupported policy file version {policy.get('version')}")
+        self.questions = policy["questions"]
+        self.code_tables = policy["code_tables"]
+        self.risk_classes = policy["risk_classes"]
+        self.full_class_counts = policy["full_class_counts"]
+        self.nodes = policy["nodes"]
+
+    @classmethod
+    def load(cls, filename):
+        with gzip.open(filename, "rt", encoding="utf-8") as file:
+            return cls(json.load(file))
+
+    def get_question(self, node):
+        """
+            question to ask at this node, None when the questionnaire has ended
+        """
+        question_position = self.nodes[node][0]
+        if question_position == LEAF:
+            return None
+        return self.questions[question_position]
+
+    def get_choices(self, node):
+        question_position = self.nodes[node][0]
+        if question_position == LEAF:
+            return []
+        return self.code_tables[question_position]
+
+    def get_answer_code(self, node, answer):
+        """
+            position of the answer in the choices of the node question,
+            string answers can also be given partially (returns None when not found)
+        """
+        choices = self.get_choices(node)
+        if answer in choices:
+            return choices.index(answer)
+        if isinstance(answer, str):
+            matches = [position for position, choice in enumerate(choices) if answer in str(choice)]
+            if len(matches) == 1:
+                return matches[0]
+        return None
+
+    def next_node(self, node, answer):
+        """
+            node reached after answering the question of the given node,
+            None when the answer is not one of the choices
+        """
+        code = self.get_answer_code(node, answer)
+        if code is None:
+            return None
+        return self.nodes[node][1][code]
+
+    def get_class_counts(self, node):
+        return self.nodes[node][2]
+
+    def get_risk_estimate(self, node):
+        return get_risk_estimate(self.get_class_counts(node), self.full_class_counts, self.risk_classes)
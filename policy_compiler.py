@@ -0,0 +1,157 @@
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from helper import to_json_value
+from policy import LEAF, POLICY_FORMAT_VERSION, ROOT_NODE
+
+# engine used by the worker processes, set once per process by init_worker
+WORKER_ENGINE = None
+
+
+def expand_policy_nodes(engine, session, max_depth=None):
+    """
+        engine: questionnaire.QuestionnaireEngine
+        session: QuestionnaireSession to start from
+
+        expands every answer path reachable from the session into a list of nodes
+            [question id or LEAF, child node position per choice (engine.choices), risk class counts]
+        node 0 is the given session. Uses an explicit stack instead of recursion.
+
+        max_depth: Integer -> optional limit on the number of questions asked from the session
+    """
+    nodes = [None]
+    pending = [(session, 0, 0)]
+    while pending:
+        session, node_position, depth = pending.pop()
+        class_counts = engine.answer_index.get_class_counts(session.subset).tolist()
+
+        question = None
+        if max_depth is None or depth < max_depth:
+            question = engine.next_question(session)
+        if question is None:
+            nodes[node_position] = [LEAF, [], class_counts]
+            continue
+
+        children = []
+        for answer in engine.choices[question]:
+            child_session = engine.copy_session(session)
+            engine.submit_answer(child_session, question, answer)
+            children.append(len(nodes))
+            nodes.append(None)
+            pending.append((child_session, children[-1], depth + 1))
+        nodes[node_position] = [engine.question_ids[question], children, class_counts]
+    return nodes
+
+
+def init_worker(engine):
+    global WORKER_ENGINE
+    WORKER_ENGINE = engine
+
+
+def expand_branch(history, max_depth):
+    """
+        runs in a worker process, expands the branch reached by the given
+        (question, answer) history
+    """
+    session = WORKER_ENGINE.start_session()
+    for question, answer in history:
+        WORKER_ENGINE.submit_answer(session, question, answer)
+    return expand_policy_nodes(WORKER_ENGINE, session, None if max_depth is None else max_depth - len(history))
+
+
+def add_nodes(nodes, branch_nodes):
+    """
+        appends the nodes of a branch to nodes, shifting their child positions,
+        returns the position of the first branch node
+    """
+    offset = len(nodes)
+    for question_id, children, class_counts in branch_nodes:
+        nodes.append([question_id, [child + offset for child in children], class_counts])
+    return offset
+
+
+def get_depth_first_nodes(nodes, root=ROOT_NODE):
+    """
+        the nodes below root renumbered in depth first order (children in choice order),
+        so the policy does not depend on where the branches were expanded
+    """
+    new_positions = [None] * len(nodes)
+    order = []
+    stack = [root]
+    while stack:
+        position = stack.pop()
+        new_positions[position] = len(order)
+        order.append(position)
+        stack.extend(reversed(nodes[position][1]))
+    return [
+        [nodes[position][0], [new_positions[child] for child in nodes[position][1]], nodes[position][2]]
+        for position in order
+    ]
+
+
+# compiles the whole adaptive questionnaire into a decision policy
+def compile_policy(engine, max_workers=None, max_depth=None):
+    """
+        engine: questionnaire.QuestionnaireEngine
+        max_workers: Integer -> number of worker processes, 1 compiles in this process
+        max_depth: Integer -> optional limit on the number of questions of a path
+
+        The questionnaire is deterministic for a given dataset, so every reachable answer
+        path is expanded once here: the first questions are expanded breadth first in this
+        process until there is a pending branch for every worker, the branches are expanded
+        in parallel and stitched together under their parent nodes.
+
+        Output is the policy dictionary (see policy.DecisionPolicy, policy.save_policy)
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+
+    # pending branches as (session, (question, answer) history, parent node position, choice position)
+    nodes = []
+    pending = deque([(engine.start_session(), [], None, None)])
+    while pending and len(pending) < max_workers:
+        session, history, parent, choice_position = pending.popleft()
+        position = len(nodes)
+        if parent is not None:
+            nodes[parent][1][choice_position] = position
+
+        question = None
+        if max_depth is None or len(history) < max_depth:
+            question = engine.next_question(session)
+        class_counts = engine.answer_index.get_class_counts(session.subset).tolist()
+        if question is None:
+            nodes.append([LEAF, [], class_counts])
+            continue
+
+        choices = engine.choices[question]
+        nodes.append([engine.question_ids[question], [None] * len(choices), class_counts])
+        for choice_position, answer in enumerate(choices):
+            child_session = engine.copy_session(session)
+            engine.submit_answer(child_session, question, answer)
+            pending.append((child_session, history + [(question, answer)], position, choice_position))
+
+    histories = [history for _, history, _, _ in pending]
+    if max_workers == 1:
+        init_worker(engine)
+        branches = [expand_branch(history, max_depth) for history in histories]
+    else:
+        with ProcessPoolExecutor(max_workers, initializer=init_worker, initargs=(engine,)) as executor:
+            branches = list(executor.map(expand_branch, histories, [max_depth] * len(histories)))
+
+    for (_, _, parent, choice_position), branch_nodes in zip(pending, branches):
+        position = add_nodes(nodes, branch_nodes)
+        if parent is not None:
+            nodes[parent][1][choice_position] = position
+    nodes = get_depth_first_nodes(nodes)
+
+    return {
+        "version": POLICY_FORMAT_VERSION,
+        "questions": engine.questions,
+        "code_tables": [
+            [to_json_value(answer) for answer in engine.choices[question]] for question in engine.questions
+        ],
+        "risk_classes": list(engine.encoded.risk_classes),
+        "full_class_counts": engine.full_class_counts.tolist(),
+        "min_sample_threshold": engine.min_sample_threshold,
+        "nodes": nodes,
+    }
@@ -0,0 +1,496 @@
+import struct
+from array import array
+from pprint import pprint
+
+import numpy as np
+
+from answer_index import AnswerIndex
+from encoding import MISSING_CODE, encode_dataset
+from knowledge_index import KnowledgeIndex
+from ranking_cache import get_answers_key
+from risk import get_risk_estimate
+from helper import (
+    load_json_file,
+    get_cleaned_data,
+    get_required_columns,
+    get_column_dtypes,
+    get_child_questions,
+    get_utility_scores_from_counts,
+)
+
+# Defining Threshold values
+MIN_SAMPLE_THRESHOLD = 100
+
+
+# version of the bytes written by QuestionnaireEngine.dump_session
+SESSION_FORMAT_VERSION = 1
+
+# header of a dumped session: format version, number of answers, number of queue bytes
+SESSION_HEADER = struct.Struct("<BHH")
+
+
+def get_bitset_ids(bitset):
+    """
+        bitset: Integer -> bit i is set when id i is in the set
+
+        returns the ids in the bitset, lowest first
+    """
+    ids = []
+    while bitset:
+        lowest_bit = bitset & -bitset
+        ids.append(lowest_bit.bit_length() - 1)
+        bitset ^= lowest_bit
+    return ids
+
+
+def get_ranges_bitset(ids):
+    """
+        ids: iterable of Integer
+
+        returns the bitset of the ids, every run of consecutive ids is set as one range
+        (ids of a subtree are mostly a single run as they follow the pre-order)
+    """
+    bitset = 0
+    run_start = run_stop = None
+    for question_id in sorted(set(ids)):
+        if question_id != run_stop:
+            if run_start is not None:
+                bitset |= ((1 << (run_stop - run_start)) - 1) << run_start
+            run_start = question_id
+        run_stop = question_id + 1
+    if run_start is not None:
+        bitset |= ((1 << (run_stop - run_start)) - 1) << run_start
+    return bitset
+
+
+class QuestionnaireSession:
+    """
+        State of one person going through the adaptive questionnaire
+
+        subset -> packed bitset (see answer_index.AnswerIndex) of the rows matching all the answers so far
+        num_of_rows -> number of rows in subset
+        queue -> Integer bitset of the ids of the questions which can be asked next
+        answer_ids, answer_codes -> array of the answered question ids and of their answer codes
+        counts -> Dictionary with question id as key and the (answer x risk class) counts
+            of that question over the subset as value, only kept for the queued questions.
+            None until the first ranking which is not served by the engine ranking cache
+
+        Slotted so an idle session is only its subset words and a few small fields,
+        see QuestionnaireEngine.dump_session / load_session to checkpoint it.
+    """
+
+    __slots__ = ("subset", "num_of_rows", "queue", "answer_ids", "answer_codes", "counts")
+
+    def __init__(self, subset, num_of_rows, queue, answer_ids=None, answer_codes=None):
+        self.subset = subset
+        self.num_of_rows = num_of_rows
+        self.queue = queue
+        self.answer_ids = answer_ids if answer_ids is not None else array("H")
+        self.answer_codes = answer_codes if answer_codes is not None else array("h")
+        self.counts = None
+
+    @property
+    def answers(self):
+        """
+            list of (question id, answer code) in the order they were answered
+        """
+        return list(zip(self.answer_ids, self.answer_codes))
+
+    @property
+    def queue_ids(self):
+        return get_bitset_ids(self.queue)
+
+
+class QuestionnaireEngine:
+    """
+        Adaptive questionnaire over an encoding.EncodedDataset
+        (same logic as Archive/13 Oct 2023/hto-questionaire.py)
+
+            1. the queued question with the lowest utility score on the current subset is asked
+            2. the subset is narrowed down to the rows with the same answer
+            3. when the answer is not 0 ("No") the child questions are added to the queue
+            4. stops when the queue is empty or the subset has MIN_SAMPLE_THRESHOLD rows or less
+
+        The engine only holds read only data, so one engine can serve many sessions.
+        Every session keeps the counts of its queued questions for its current subset and
+        updates them when an answer narrows the subset (only the smaller of the kept and
+        removed slices is counted) or when child questions join the queue, instead of
+        re-scoring every queued question on the complete dataset after each answer.
+
+        The subset of a session is a bitset of an AnswerIndex (built here unless one is
+        given), narrowing it is an AND of two bitsets and its size is a popcount.
+
+        With a ranking_cache (ranking_cache.RankingCache) the rankings are cached by the
+        set of answers already given and the queue, sessions which share their opening answers
+        get their next question without any counting.
+
+        With prune_subtrees a 0 ("No") answer also drops every descendant of the question
+        from the queue, including the ones queued by another parent question, so they are
+        not scored again. Question ids follow the pre-order of the hierarchy, so the
+        descendants of a question are (mostly) one range of ids and dropping them is one
+        bitset operation. A dropped question joins the queue again when another of its
+        parent questions is answered with something else than 0.
+    """
+
+    def __init__(
+        self,
+        encoded,
+        QUESTION_CHILD_MAPPER,
+        QUESTION_MAPPER,
+        root_questions,
+        min_sample_threshold=MIN_SAMPLE_THRESHOLD,
+        answer_index=None,
+        ranking_cache=None,
+        prune_subtrees=False,
+    ):
+        self.encoded = encoded
+        self.QUESTION_CHILD_MAPPER = QUESTION_CHILD_MAPPER
+        self.QUESTION_MAPPER = QUESTION_MAPPER
+        self.min_sample_threshold = min_sample_threshold
+        self.prune_subtrees = prune_subtrees
+
+        """
+            question ids follow the depth first (pre-order) position of the question in the
+            hierarchy, only questions of QUESTION_MAPPER which have a column in the dataset
+            can be asked
+        """
+        knowledge_index = KnowledgeIndex.from_mapper(QUESTION_CHILD_MAPPER, root_questions)
+        self.question_ids = {}
+        for question in knowledge_index.codes:
+            if question in QUESTION_MAPPER and question in encoded.column_index:
+                self.question_ids.setdefault(question, len(self.question_ids))
+        self.questions = list(self.question_ids)
+
+        # bitset of the ids of all the descendants of every question (see prune_subtrees)
+        self.subtree_masks = [
+            get_ranges_bitset(
+                self.question_ids[descendant]
+                for descendant in knowledge_index.get_subtree_codes(question)[1:]
+                if descendant in self.question_ids
+            )
+            for question in self.questions
+        ]
+
+        self.root_ids = [self.question_ids[question] for question in root_questions if question in self.question_ids]
+        self.root_queue = sum(1 << question_id for question_id in set(self.root_ids))
+        self.child_ids = [
+            [
+                self.question_ids[child]
+                for child in get_child_questions(question, QUESTION_CHILD_MAPPER) or []
+                if child in self.question_ids
+            ]
+            for question in self.questions
+        ]
+
+        # codes of every askable question, one row per question id
+        self.codes = encoded.codes[[encoded.column_index[question] for question in self.questions]]
+        self.target = encoded.target.astype(np.int64)
+        self.num_of_classes = len(encoded.risk_classes)
+        self.num_of_codes = [len(encoded.get_code_table(question)) for question in self.questions]
+
+        # choices (and their number) come from the complete dataset like CHOICES_DATASET
+        self.full_counts = [self.count_rows(question_id, None) for question_id in range(len(self.questions))]
+        self.num_of_choices = np.array([(counts.sum(axis=1) > 0).sum() for counts in self.full_counts])
+        self.choices = {
+            question: [encoded.get_answer(question, code) for code in np.flatnonzero(counts.sum(axis=1))]
+            for question, counts in zip(self.questions, self.full_counts)
+        }
+        self.full_class_counts = np.bincount(self.target[self.target >= 0], minlength=self.num_of_classes)
+
+        self.answer_index = answer_index if answer_index is not None else AnswerIndex(encoded, self.questions)
+        self.ranking_cache = ranking_cache
+
+    def count_rows(self, question_id, rows):
+        """
+            returns the (answer code x risk class) counts of a question over the given rows
+            (all the rows when rows is None)
+        """
+        codes = self.codes[question_id] if rows is None else self.codes[question_id, rows]
+        target = self.target if rows is None else self.target[rows]
+        answered = (codes >= 0) & (target >= 0)
+        flat_indexes = codes[answered].astype(np.int64) * self.num_of_classes + target[answered]
+        counts = np.bincount(flat_indexes, minlength=self.num_of_codes[question_id] * self.num_of_classes)
+        return counts.reshape(-1, self.num_of_classes)
+
+    def start_session(self):
+        return QuestionnaireSession(self.answer_index.all_rows.copy(), self.encoded.num_of_rows, self.root_queue)
+
+    def copy_session(self, session):
+        """
+            returns an independent copy of the session
+        """
+        copied_session = QuestionnaireSession(
+            session.subset.copy(),
+            session.num_of_rows,
+            session.queue,
+            array("H", session.answer_ids),
+            array("h", session.answer_codes),
+        )
+        if session.counts is not None:
+            copied_session.counts = {question_id: counts.copy() for question_id, counts in session.counts.items()}
+        return copied_session
+
+    def get_session_counts(self, session):
+        """
+            returns the counts of the queued questions over the session subset,
+            they are counted from the subset rows the first time they are needed and then
+            kept up to date by submit_answer
+        """
+        if session.counts is None:
+            if session.answer_ids:
+                subset_rows = self.answer_index.get_rows(session.subset)
+                session.counts = {
+                    question_id: self.count_rows(question_id, subset_rows) for question_id in session.queue_ids
+                }
+            else:
+                session.counts = {
+                    question_id: self.full_counts[question_id].copy() for question_id in session.queue_ids
+                }
+        return session.counts
+
+    def is_finished(self, session):
+        return not session.queue or session.num_of_rows <= self.min_sample_threshold
+
+    def get_sorted_scores(self, session):
+        """
+            returns the queued questions with their utility score on the session subset
+            as a list of (question, score), lowest (best) score first
+
+            ties are broken by question id so the order never depends on the queue order
+        """
+        if self.ranking_cache is not None:
+            cache_key = get_answers_key(session.answers, session.queue)
+            ranking = self.ranking_cache.get(cache_key)
+            if ranking is not None:
+                # a new list, so the caller can not change the cached ranking
+                return list(ranking)
+
+        ranking = []
+        queue = [question_id for question_id in session.queue_ids if self.num_of_choices[question_id]]
+        if queue:
+            session_counts = self.get_session_counts(session)
+            max_codes = max(self.num_of_codes[question_id] for question_id in queue)
+            counts = np.zeros((len(queue), max_codes, self.num_of_classes), dtype=np.int64)
+            for position, question_id in enumerate(queue):
+                counts[position, : self.num_of_codes[question_id]] = session_counts[question_id]
+            scores = get_utility_scores_from_counts(counts, self.num_of_choices[queue], session.num_of_rows)
+            ranking = [(self.questions[question_id], float(score)) for score, question_id in sorted(zip(scores, queue))]
+
+        if self.ranking_cache is not None:
+            self.ranking_cache.put(cache_key, tuple(ranking))
+        return ranking
+
+    def next_question(self, session):
+        """
+            returns the best question to ask next (None when the questionnaire is finished)
+        """
+        if self.is_finished(session):
+            return None
+        sorted_scores = self.get_sorted_scores(session)
+        return sorted_scores[0][0] if sorted_scores else None
+
+    def get_answer_code(self, question, answer):
+        code = self.encoded.get_code(question, answer)
+        if code == MISSING_CODE and isinstance(answer, str):
+            # string answers can also be given partially like str.contains in the archived script
+            code_table = self.encoded.get_code_table(question)
+            matches = [position for position, choice in enumerate(code_table) if answer in str(choice)]
+            code = matches[0] if len(matches) == 1 else MISSING_CODE
+        return code
+
+    def submit_answer(self, session, question, answer):
+        """
+            narrows the session subset to the rows with the same answer, updates the counts
+            of the queued questions and adds the child questions when answer is not 0
+
+            the answer is compared with 0 after it is matched to its choice, so a partial
+            string answer works the same as the full choice
+        """
+        question_id = self.question_ids[question]
+        code = self.get_answer_code(question, answer)
+        choice = self.encoded.get_answer(question, code)
+        if session.queue >> question_id & 1:
+            session.queue ^= 1 << question_id
+            if session.counts is not None:
+                del session.counts[question_id]
+        if self.prune_subtrees and choice == 0:
+            # dropping the queued descendants of the question at once, before they are counted
+            pruned_queue = session.queue & self.subtree_masks[question_id]
+            if pruned_queue:
+                session.queue ^= pruned_queue
+                if session.counts is not None:
+                    for pruned_id in get_bitset_ids(pruned_queue):
+                        del session.counts[pruned_id]
+        session.answer_ids.append(question_id)
+        session.answer_codes.append(code)
+
+        # answers which are not in the code table match no rows
+        kept_subset = self.answer_index.narrow(session.subset, question, code)
+        num_of_kept_rows = self.answer_index.count(kept_subset)
+
+        # counting whichever slice is smaller
+        queue_ids = session.queue_ids
+        if session.counts is None:
+            # nothing to update, the counts are only made when a ranking is not cached
+            pass
+        elif num_of_kept_rows <= session.num_of_rows - num_of_kept_rows:
+            kept_rows = self.answer_index.get_rows(kept_subset)
+            for question_id_in_queue in queue_ids:
+                session.counts[question_id_in_queue] = self.count_rows(question_id_in_queue, kept_rows)
+        else:
+            removed_rows = self.answer_index.get_rows(session.subset & ~kept_subset)
+            for question_id_in_queue in queue_ids:
+                session.counts[question_id_in_queue] -= self.count_rows(question_id_in_queue, removed_rows)
+        session.subset = kept_subset
+        session.num_of_rows = num_of_kept_rows
+
+        # this checks if selected question has child(descendent questions) or not
+        if choice != 0:
+            new_child_ids = [
+                child_id
+                for child_id in self.child_ids[question_id]
+                if not session.queue >> child_id & 1 and child_id not in session.answer_ids
+            ]
+            if new_child_ids and session.counts is not None:
+                subset_rows = self.answer_index.get_rows(session.subset)
+                for child_id in new_child_ids:
+                    session.counts[child_id] = self.count_rows(child_id, subset_rows)
+            for child_id in new_child_ids:
+                session.queue |= 1 << child_id
+
+    def dump_session(self, session):
+        """
+            returns the session as a few bytes: the queue bitset and the (question id, answer code)
+            pairs, the subset and the counts are not stored, load_session rebuilds them
+        """
+        queue_bytes = session.queue.to_bytes(-(-len(self.questions) // 8), "little")
+        num_of_answers = len(session.answer_ids)
+        return (
+            SESSION_HEADER.pack(SESSION_FORMAT_VERSION, num_of_answers, len(queue_bytes))
+            + queue_bytes
+            + struct.pack(f"<{num_of_answers}H{num_of_answers}h", *session.answer_ids, *session.answer_codes)
+        )
+
+    def load_session(self, data):
+        """
+            data: bytes written by dump_session with an engine of the same dataset
+
+            returns the restored session, its subset is the AND of the bitsets of its answers
+        """
+        version, num_of_answers, num_of_queue_bytes = SESSION_HEADER.unpack_from(data)
+        if version != SESSION_FORMAT_VERSION:
+            raise ValueError(f"unsupported session format version {version}")
+        queue = int.from_bytes(data[SESSION_HEADER.size : SESSION_HEADER.size + num_of_queue_bytes], "little")
+        values = struct.unpack_from(
+            f"<{num_of_answers}H{num_of_answers}h", data, SESSION_HEADER.size + num_of_queue_bytes
+        )
+        answer_ids, answer_codes = array("H", values[:num_of_answers]), array("h", values[num_of_answers:])
+
+        subset = self.answer_index.get_subset(
+            (self.questions[question_id], code) for question_id, code in zip(answer_ids, answer_codes)
+        )
+        return QuestionnaireSession(subset, self.answer_index.count(subset), queue, answer_ids, answer_codes)
+
+    def warm_ranking_cache(self, histories):
+        """
+            histories: list of past sessions, each one a list of (question, answer)
+                in the order they were answered
+
+            replays the past sessions so the rankings of their answer prefixes are cached
+        """
+        for history in histories:
+            session = self.start_session()
+            for question, answer in history:
+                if self.is_finished(session):
+                    break
+                self.get_sorted_scores(session)
+                self.submit_answer(session, question, answer)
+            if not self.is_finished(session):
+                self.get_sorted_scores(session)
+
+    def get_risk_estimate(self, session):
+        subset_class_counts = self.answer_index.get_class_counts(session.subset)
+        return get_risk_estimate(subset_class_counts, self.full_class_counts, self.encoded.risk_classes)
+
+
+# builds the engine of a risk domain from the json mappers and the csv file
+def load_questionnaire_engine(
+    base_path,
+    dataset_name,
+    target_column,
+    min_sample_threshold=MIN_SAMPLE_THRESHOLD,
+    ranking_cache=None,
+    prune_subtrees=False,
+):
+    """
+        base_path: String -> base path for code and csv files
+        dataset_name: String -> root question of the risk domain, example "suic_mg"
+        target_column: String -> contains the name of the target column in csv dataset
+        prune_subtrees: Boolean -> a 0 answer drops all the descendants of the question from the queue
+    """
+    QUESTION_MAPPER = load_json_file(base_path + "question-data.json")
+    QUESTION_CHILD_MAPPER = load_json_file(base_path + "child_question_mapper.json")
+
+    columns = get_required_columns(dataset_name, QUESTION_CHILD_MAPPER, QUESTION_MAPPER, target_column)
+    dataset = get_cleaned_data(
+        base_path, target_column, columns=columns, dtypes=get_column_dtypes(columns, QUESTION_MAPPER)
+    )
+    encoded = encode_dataset(dataset, QUESTION_MAPPER, target_column)
+
+    root_questions = [question for question in QUESTION_CHILD_MAPPER[dataset_name] if question in QUESTION_MAPPER]
+    return QuestionnaireEngine(
+        encoded,
+        QUESTION_CHILD_MAPPER,
+        QUESTION_MAPPER,
+        root_questions,
+        min_sample_threshold=min_sample_threshold,
+        ranking_cache=ranking_cache,
+        prune_subtrees=prune_subtrees,
+    )
+
+
+def get_question_text(question, QUESTION_MAPPER, BACKUP_QUESTION_MAPPER):
+    """
+        question text from question-data.json records, or from
+        questions_mapping.json records when there is no record found
+    """
+    if QUESTION_MAPPER.get(question):
+        return QUESTION_MAPPER[question]["question"]
+    return BACKUP_QUESTION_MAPPER.get(question, question)
+
+
+# asks the questions with input() like Archive/13 Oct 2023/hto-questionaire.py
+def run_interactive_session(engine, QUESTION_MAPPER, BACKUP_QUESTION_MAPPER):
+    session = engine.start_session()
+
+    # used to maintain the user question and asnwer record
+    QUESTION_ANSWER_RECORD = []
+    while not engine.is_finished(session):
+        selected_question = engine.next_question(session)
+        if selected_question is None:
+            break
+
+        question = get_question_text(selected_question, QUESTION_MAPPER, BACKUP_QUESTION_MAPPER)
+
+        # Asking user the question to get the user response as asnwer
+        answer = input(f"""Please Answer : {question} ?\nChoices are : {engine.choices[selected_question]}\n""")
+        try:
+            # if answer is float then covert to float type
+            answer = float(answer)
+        except ValueError:
+            # if above code throws error means the answer is a string type
+            answer = str(answer)
+        engine.submit_answer(session, selected_question, answer)
+        QUESTION_ANSWER_RECORD.append({"question": question, "answer": answer})
+
+    ## Printing the reason why the questionaire got stopped
+    if not session.queue:
+        print("QUESTIONAIRE ENDS CAUSE QUEUE IS NOW EMPTY")
+    if session.num_of_rows <= engine.min_sample_threshold:
+        print("QUESTIONAIRE ENDS CAUSE SUBSET SAMPLE IS LESS THAN MIN_SAMPLE_THRESHOLD")
+
+    # printing the Recorded Question and answer for the user
+    print("RECORDED QUESTION ANSWERS BELOW:")
+    pprint(QUESTION_ANSWER_RECORD)
+    print("\n\n\nRISK IS PROBABLY :", engine.get_risk_estimate(session)["final_risk"])
+    return session
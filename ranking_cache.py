@@ -0,0 +1,80 @@
+from collections import OrderedDict
+
+# default number of rankings kept in memory
+DEFAULT_CACHE_SIZE = 10_000
+
+
+def get_answers_key(answers, queue=0):
+    """
+        answers: list of (question id, answer code)
+        queue: Integer -> bitset of the queued question ids
+
+        canonical cache key of the answers and the queue, the order in which the
+        questions were answered does not matter. Without subtree pruning the queue follows
+        from the set of answers, with pruning it also depends on their order
+        (see QuestionnaireEngine prune_subtrees), so it is part of the key
+    """
+    return frozenset(answers), queue
+
+
+class RankingCache:
+    """
+        Bounded least recently used cache of question rankings
+
+        key -> canonical set of the (question id, answer code) pairs already given and the
+            queue bitset (get_answers_key)
+        value -> sorted (question, score) pairs returned by QuestionnaireEngine.get_sorted_scores,
+            stored as a tuple so they can not be changed through a returned ranking
+
+        When maxsize rankings are stored the least recently used one is evicted
+    """
+
+    def __init__(self, maxsize=DEFAULT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.rankings = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.rankings)
+
+    def get(self, key):
+        """
+            returns the cached ranking or None, and updates the hit/miss counters
+        """
+        ranking = self.rankings.get(key)
+        if ranking is None:
+            self.misses += 1
+            return None
+        self.rankings.move_to_end(key)
+        self.hits += 1
+        return ranking
+
+    def put(self, key, ranking):
+        self.rankings[key] = ranking
+        self.rankings.move_to_end(key)
+        while len(self.rankings) > self.maxsize:
+            self.rankings.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self.rankings.clear()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_stats(self):
+        """
+            Example Output
+            {"size": 120, "maxsize": 10000, "hits": 950, "misses": 120, "evictions": 0, "hit_rate": 0.89}
+        """
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self.rankings),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0,
+        }
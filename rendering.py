@@ -0,0 +1,188 @@
+import hashlib
+import io
+import os
+import shutil
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import instrumentation
+from instrumentation import timed_stage
+from node import iter_tree_nodes
+
+# folder where the question tree images are written
+OUTPUT_DIRECTORY = "generated_output/"
+
+# folder (inside the output folder) with the DOT content hash of every rendered file
+RENDER_CACHE_DIRECTORY = ".render-cache/"
+
+# formats given to dot, "dot" writes the DOT source itself (no dot binary needed)
+DEFAULT_RENDER_FORMATS = ("png",)
+RENDER_FORMATS = ("png", "svg", "dot")
+
+
+def quote_dot(text):
+    """
+        DOT quoted string
+    """
+    return '"' + str(text).replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def write_tree_dot(root_node, file, max_depth=None, top_k=None):
+    """
+        root_node: NODE -> Root Level Question Node
+        file: text file (or any object with a write method)
+        max_depth, top_k: optional pruning, see node.iter_tree_nodes
+
+        writes the DOT source of the tree line by line while walking it, so the whole graph
+        is never held in memory. Node ids are unique (n0, n1 ....) and the labels
+        (question___best) are kept apart from them, so equal labels are never merged
+    """
+    file.write("digraph {\n")
+    for node_id, parent_id, node, num_of_hidden_children in iter_tree_nodes(root_node, max_depth, top_k):
+        file.write(f"\tn{node_id} [label={quote_dot(node.__repr__())}]\n")
+        if parent_id is not None:
+            file.write(f"\tn{parent_id} -> n{node_id}\n")
+        if num_of_hidden_children:
+            file.write(f'\tn{node_id}_more [label="{num_of_hidden_children} more" shape=plaintext]\n')
+            file.write(f"\tn{node_id} -> n{node_id}_more [style=dashed]\n")
+    file.write("}\n")
+
+
+class HashingWriter:
+    """
+        file wrapper which hashes (sha256) everything written through it
+    """
+
+    def __init__(self, file):
+        self.file = file
+        self.sha256 = hashlib.sha256()
+
+    def write(self, text):
+        self.sha256.update(text.encode())
+        return self.file.write(text)
+
+    def hexdigest(self):
+        return self.sha256.hexdigest()
+
+
+def get_tree_dot(root_node, max_depth=None, top_k=None):
+    """
+        DOT source of the question tree of a root level node as a string
+    """
+    source = io.StringIO()
+    write_tree_dot(root_node, source, max_depth, top_k)
+    return source.getvalue()
+
+
+def get_dot_digest(dot_digest, output_format):
+    """
+        hash of an output, made from the hash of its DOT source and its format
+    """
+    return hashlib.sha256(f"{output_format}\n{dot_digest}".encode()).hexdigest()
+
+
+def is_rendered(output_path, digest_path, digest):
+    """
+        True when output_path exists and was rendered from the same DOT content
+    """
+    if not (os.path.exists(output_path) and os.path.exists(digest_path)):
+        return False
+    with open(digest_path) as file:
+        return file.read() == digest
+
+
+@timed_stage("run_dot")
+def run_dot(dot_path, output_format, output_path):
+    """
+        renders the DOT file into output_path with the graphviz dot binary
+        (written under a temporary name first so a half written image is never kept)
+    """
+    temporary_path = output_path + ".tmp"
+    try:
+        subprocess.run(["dot", f"-T{output_format}", "-o", temporary_path, dot_path], check=True)
+        os.replace(temporary_path, output_path)
+    finally:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+
+
+@timed_stage("render_tree")
+def render_tree(root_node, formats, output_directory, max_depth=None, top_k=None):
+    """
+        streams the DOT source of the tree into the render cache folder and writes the outputs
+        of the formats whose existing file was not rendered from the same DOT content,
+        returns the number of written files
+    """
+    name = root_node.question
+    cache_directory = os.path.join(output_directory, RENDER_CACHE_DIRECTORY)
+    dot_path = os.path.join(cache_directory, f"{name}.gv.tmp-{threading.get_ident()}")
+    num_of_rendered = 0
+    # the temporary DOT file is removed even when writing or rendering fails
+    try:
+        with open(dot_path, "w") as file:
+            writer = HashingWriter(file)
+            write_tree_dot(root_node, writer, max_depth, top_k)
+        dot_digest = writer.hexdigest()
+
+        for output_format in formats:
+            output_path = os.path.join(output_directory, f"{name}.{output_format}")
+            digest_path = os.path.join(cache_directory, f"{name}.{output_format}.sha256")
+            digest = get_dot_digest(dot_digest, output_format)
+            if is_rendered(output_path, digest_path, digest):
+                continue
+
+            if output_format == "dot":
+                shutil.copyfile(dot_path, output_path)
+            else:
+                run_dot(dot_path, output_format, output_path)
+            with open(digest_path, "w") as file:
+                file.write(digest)
+            num_of_rendered += 1
+    finally:
+        if os.path.exists(dot_path):
+            os.remove(dot_path)
+    if instrumentation.ENABLED:
+        instrumentation.count("renders", num_of_rendered)
+    return num_of_rendered
+
+
+# renders the question trees of many root level nodes at once
+@timed_stage("render_trees")
+def render_trees(
+    root_nodes,
+    output_directory=OUTPUT_DIRECTORY,
+    formats=DEFAULT_RENDER_FORMATS,
+    max_workers=None,
+    max_depth=None,
+    top_k=None,
+):
+    """
+        root_nodes: List of NODE -> Root Level Question Nodes
+        output_directory: String -> folder of the images, one file per root question and format
+            (example generated_output/suic_mg_q1.png)
+        formats: List of String -> any of RENDER_FORMATS, svg and dot are much faster than png
+        max_workers: Integer -> largest number of trees (and dot processes) handled at the same time
+            (defaults to the number of cpus)
+        max_depth, top_k: optional pruning of the drawn trees, see node.iter_tree_nodes
+
+        The DOT source of every tree is streamed to a file (see write_tree_dot), a tree is only
+        rendered again when its DOT content hash differs from the hash stored for the existing
+        output, so rendering unchanged trees costs almost nothing. The trees are handled in parallel.
+
+        Output is the number of files which were (re)written
+    """
+    for output_format in formats:
+        if output_format not in RENDER_FORMATS:
+            raise ValueError(f"unsupported render format {output_format}, use one of {RENDER_FORMATS}")
+    if any(output_format != "dot" for output_format in formats) and shutil.which("dot") is None:
+        raise FileNotFoundError("graphviz dot executable was not found, install graphviz or use the dot format")
+    os.makedirs(os.path.join(output_directory, RENDER_CACHE_DIRECTORY), exist_ok=True)
+
+    with ThreadPoolExecutor(max_workers or os.cpu_count() or 1) as executor:
+        # every worker thread waits on its own dot process, so at most max_workers run at once
+        return sum(
+            executor.map(
+                lambda root_node: render_tree(root_node, formats, output_directory, max_depth, top_k), root_nodes
+            )
+        )
@@ -0,0 +1,48 @@
+# NOTE: kept free of numpy/pandas imports so the compiled decision policy (policy.py) can use it
+
+
+# normalised risk of every risk class, used at the end of the questionnaire
+def get_risk_estimate(subset_class_counts, full_class_counts, risk_classes):
+    """
+        subset_class_counts: list -> number of rows per risk class in the subset
+        full_class_counts: list -> number of rows per risk class in the complete dataset
+        risk_classes: List of String -> risk class labels in count order
+
+        inversing the probability for risk_class
+        so that risk_class with less occurance in dataset
+        can be multiplied by higher number
+
+        example Suppose there are 100 rows with "high" risk in complete dataset
+        and there are 10000 rows in complete_dataset
+        so probability_of_high = 100 / 10000 = 0.01
+        risk = subset_counter["high"] * (1 - probability_of_high)
+
+        this is basically done to account for imbalance in risk class
+
+        Output
+        {
+            "risk_data": {"low": 10.5, "medium": 3.2, "high": 0},
+            "final_risk": "medium"
+        }
+    """
+    num_of_rows = sum(full_class_counts)
+    risk_data = {}
+    highest_risk = 0
+    for risk_class, subset_count, full_count in zip(risk_classes, subset_class_counts, full_class_counts):
+        if full_count == 0:
+            continue
+        normalised_risk = round(float(subset_count * (1 - full_count / num_of_rows)), 2) if subset_count else 0
+        risk_data[risk_class] = normalised_risk
+        if normalised_risk > highest_risk:
+            highest_risk = normalised_risk
+
+    low, medium, high = (risk_data.get(risk_class, 0) for risk_class in ("low", "medium", "high"))
+    if low == highest_risk and medium + high > low:
+        final_risk = "medium"
+    elif high == highest_risk:
+        final_risk = "high"
+    elif medium == highest_risk:
+        final_risk = "medium"
+    else:
+        final_risk = "low"
+    return {"risk_data": risk_data, "final_risk": final_risk}
@@ -0,0 +1,254 @@
+import argparse
+import asyncio
+import json
+import secrets
+from collections import OrderedDict
+
+from encoding import MISSING_CODE
+from helper import load_json_file, to_json_value
+from questionnaire import MIN_SAMPLE_THRESHOLD, get_question_text, load_questionnaire_engine
+from ranking_cache import RankingCache
+
+# default number of sessions kept at once, the least recently used ones are dropped first
+MAX_SESSIONS = 10_000
+
+# largest request body accepted (in bytes)
+MAX_BODY_SIZE = 64 * 1024
+
+HTTP_REASONS = {
+    200: "OK",
+    201: "Created",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    500: "Internal Server Error",
+}
+
+
+class ServiceError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class QuestionnaireService:
+    """
+        Many independent questionnaire sessions served over one shared QuestionnaireEngine
+
+        The engine (encoded dataset, answer index, mappers and ranking cache) is loaded once
+        and only read by the sessions, each session only holds its own small state
+        (subset bitset, queue and answers).
+
+        Routes (all bodies and responses are json)
+            POST   /sessions                 -> starts a session, returns its id and first question
+            GET    /sessions/{id}            -> next question of the session
+            POST   /sessions/{id}/answers    -> {"answer": ..., "question": optional} returns the next question
+            GET    /sessions/{id}/risk       -> risk estimate of the session
+            DELETE /sessions/{id}            -> ends the session
+            GET    /stats                    -> number of sessions and ranking cache counters
+    """
+
+    def __init__(self, engine, QUESTION_MAPPER, BACKUP_QUESTION_MAPPER, max_sessions=MAX_SESSIONS):
+        self.engine = engine
+        self.QUESTION_MAPPER = QUESTION_MAPPER
+        self.BACKUP_QUESTION_MAPPER = BACKUP_QUESTION_MAPPER
+        self.max_sessions = max_sessions
+        self.sessions = OrderedDict()
+
+    def get_session(self, session_id):
+        session = self.sessions.get(session_id)
+        if session is None:
+            raise ServiceError(404, f"unknown session {session_id}")
+        self.sessions.move_to_end(session_id)
+        return session
+
+    def describe(self, session_id, session):
+        """
+            json response with the next question of the session (None when finished)
+        """
+        question = self.engine.next_question(session)
+        response = {
+            "session_id": session_id,
+            "finished": question is None,
+            "num_of_answers": len(session.answers),
+            "num_of_rows": session.num_of_rows,
+            "question": None,
+        }
+        if question is not None:
+            response["question"] = {
+                "code": question,
+                "text": get_question_text(question, self.QUESTION_MAPPER, self.BACKUP_QUESTION_MAPPER),
+                "choices": [to_json_value(choice) for choice in self.engine.choices[question]],
+            }
+        return response
+
+    def start_session(self):
+        session_id = secrets.token_hex(8)
+        self.sessions[session_id] = self.engine.start_session()
+        while len(self.sessions) > self.max_sessions:
+            self.sessions.popitem(last=False)
+        return self.describe(session_id, self.sessions[session_id])
+
+    def submit_answer(self, session_id, body):
+        session = self.get_session(session_id)
+        if "answer" not in body:
+            raise ServiceError(400, "answer is required")
+        # answers are json strings or numbers (true and false are not numbers here)
+        if isinstance(body["answer"], bool) or not isinstance(body["answer"], (str, int, float)):
+            raise ServiceError(400, "answer must be a string or a number")
+        if self.engine.is_finished(session):
+            raise ServiceError(400, "the questionnaire has ended")
+        question = body.get("question") or self.engine.next_question(session)
+        if question not in self.engine.question_ids:
+            raise ServiceError(400, f"unknown question {question}")
+        # only queued questions can be answered (not the answered ones or the ones not reached yet)
+        if not session.queue >> self.engine.question_ids[question] & 1:
+            raise ServiceError(400, f"question {question} is not waiting for an answer")
+
+        choices = self.engine.choices[question]
+        code = self.engine.get_answer_code(question, body["answer"])
+        if code == MISSING_CODE or self.engine.encoded.get_answer(question, code) not in choices:
+            raise ServiceError(
+                400, f"{body['answer']} is not one of {[to_json_value(choice) for choice in choices]}"
+            )
+        self.engine.submit_answer(session, question, body["answer"])
+        return self.describe(session_id, session)
+
+    def get_risk(self, session_id):
+        session = self.get_session(session_id)
+        return dict(self.engine.get_risk_estimate(session), session_id=session_id)
+
+    def end_session(self, session_id):
+        self.get_session(session_id)
+        del self.sessions[session_id]
+        return {"session_id": session_id, "ended": True}
+
+    def get_stats(self):
+        stats = {"sessions": len(self.sessions)}
+        if self.engine.ranking_cache is not None:
+            stats["ranking_cache"] = self.engine.ranking_cache.get_stats()
+        return stats
+
+    def route(self, method, path, body):
+        """
+            returns (status, response) for a request
+        """
+        parts = [part for part in path.split("?")[0].split("/") if part]
+        if parts == ["sessions"] and method == "POST":
+            return 201, self.start_session()
+        if parts == ["stats"] and method == "GET":
+            return 200, self.get_stats()
+        if len(parts) == 2 and parts[0] == "sessions":
+            if method == "GET":
+                return 200, self.describe(parts[1], self.get_session(parts[1]))
+            if method == "DELETE":
+                return 200, self.end_session(parts[1])
+            raise ServiceError(405, f"{method} is not allowed on {path}")
+        if len(parts) == 3 and parts[0] == "sessions" and parts[2] == "answers":
+            if method != "POST":
+                raise ServiceError(405, f"{method} is not allowed on {path}")
+            return 200, self.submit_answer(parts[1], body)
+        if len(parts) == 3 and parts[0] == "sessions" and parts[2] == "risk":
+            if method != "GET":
+                raise ServiceError(405, f"{method} is not allowed on {path}")
+            return 200, self.get_risk(parts[1])
+        raise ServiceError(404, f"no route for {method} {path}")
+
+    async def handle_connection(self, reader, writer):
+        """
+            minimal HTTP/1.1 handling with keep-alive, one request at a time per connection
+        """
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, version = request_line.decode("latin-1").split()
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                content_length = int(headers.get("content-length", 0))
+                try:
+                    if content_length > MAX_BODY_SIZE:
+                        raise ServiceError(400, "request body is too large")
+                    raw_body = await reader.readexactly(content_length) if content_length else b""
+                    try:
+                        body = json.loads(raw_body) if raw_body else {}
+                    except ValueError:
+                        raise ServiceError(400, "request body is not valid json")
+                    if not isinstance(body, dict):
+                        raise ServiceError(400, "request body must be a json object")
+                    status, response = self.route(method, path, body)
+                except ServiceError as error:
+                    status, response = error.status, {"error": error.message}
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    raise
+                except Exception:
+                    # the client still gets an answer, the connection is kept
+                    status, response = 500, {"error": "internal server error"}
+
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                payload = json.dumps(response).encode()
+                writer.write(
+                    (
+                        f"HTTP/1.1 {status} {HTTP_REASONS.get(status, '')}\r\n"
+                        "Content-Type: application/json\r\n"
+                        f"Content-Length: {len(payload)}\r\n"
+                        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+                    ).encode("latin-1")
+                    + payload
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ValueError, ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host, port):
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        print(f"QUESTIONNAIRE SERVICE IS LISTENING ON http://{host}:{port}")
+        async with server:
+            await server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Adaptive questionnaire HTTP/JSON service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--base-path", default="")
+    parser.add_argument("--dataset-name", default="suic_mg")
+    parser.add_argument("--target-column", default="suic_mg")
+    parser.add_argument("--min-sample-threshold", type=int, default=MIN_SAMPLE_THRESHOLD)
+    parser.add_argument("--prune-subtrees", action="store_true", help="a 0 answer drops all the descendants")
+    parser.add_argument("--max-sessions", type=int, default=MAX_SESSIONS)
+    parser.add_argument("--ranking-cache-size", type=int, default=10_000)
+    args = parser.parse_args(argv)
+
+    engine = load_questionnaire_engine(
+        args.base_path,
+        args.dataset_name,
+        args.target_column,
+        min_sample_threshold=args.min_sample_threshold,
+        prune_subtrees=args.prune_subtrees,
+        ranking_cache=RankingCache(args.ranking_cache_size) if args.ranking_cache_size else None,
+    )
+    service = QuestionnaireService(
+        engine,
+        load_json_file(args.base_path + "question-data.json"),
+        load_json_file(args.base_path + "questions_mapping.json"),
+        max_sessions=args.max_sessions,
+    )
+    asyncio.run(service.serve(args.host, args.port))
+
+
+if __name__ == "__main__":
+    main()
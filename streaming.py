@@ -0,0 +1,148 @@
+import numpy as np
+
+from instrumentation import timed_stage
+from helper import (
+    COLUMN_RENAMES,
+    SCALE_CUT_POINTS,
+    SCALE_LABELS,
+    clean_data,
+    convert_scale_columns_to_classes,
+    get_csv_read_options,
+    get_utility_scores_from_counts,
+    read_csv_chunks,
+)
+
+# number of csv rows read at once in streaming mode
+DEFAULT_CHUNK_SIZE = 100_000
+
+
+class ContingencyCounts:
+    """
+        Running (question x answer x risk class) counts
+
+        answer_counts -> Dictionary with question as key and a Dictionary as value
+            which maps every answer (in order of first appearance) to a numpy
+            array with the number of rows per risk class
+        num_of_rows -> number of rows counted so far
+
+        Only the counts are kept, so a dataset can be folded in chunk by chunk
+        and scored without ever holding all of its rows in memory
+    """
+
+    def __init__(self, questions, risk_classes=SCALE_LABELS):
+        self.questions = list(questions)
+        self.risk_classes = list(risk_classes)
+        self.answer_counts = {question: {} for question in self.questions}
+        self.num_of_rows = 0
+
+        # requested columns which were not found in the csv file
+        self.missing_columns = []
+
+        # columns with answers which do not fit their dtype (see helper.read_csv_chunks)
+        self.mistyped_columns = []
+
+    def add_chunk(self, chunk, target_column):
+        """
+            chunk: DataFrame -> cleaned rows with the scale columns already converted to classes
+
+            adds the answer/risk class counts of the chunk to the running counts
+        """
+        import pandas as pd
+
+        num_of_classes = len(self.risk_classes)
+        target_codes = pd.Categorical(chunk[target_column], categories=self.risk_classes).codes.astype(np.int64)
+        labelled = target_codes >= 0
+        self.num_of_rows += chunk.shape[0]
+
+        for question in self.questions:
+            if question not in chunk.columns:
+                continue
+            answer_codes, unique_answers = pd.factorize(chunk[question])
+            chunk_counts = np.bincount(
+                answer_codes[labelled] * num_of_classes + target_codes[labelled],
+                minlength=len(unique_answers) * num_of_classes,
+            ).reshape(-1, num_of_classes)
+
+            question_counts = self.answer_counts[question]
+            for answer, counts in zip(unique_answers, chunk_counts):
+                if answer in question_counts:
+                    question_counts[answer] += counts
+                else:
+                    question_counts[answer] = counts.copy()
+
+    def get_question_choices_data(self):
+        """
+            same output as helper.get_question_choices_data, built from the counts
+        """
+        return {
+            question: [answer for answer in question_counts if answer != -1]
+            for question, question_counts in self.answer_counts.items()
+        }
+
+    def get_utility_scores(self, questions=None):
+        """
+            questions: List of String -> optional, defaults to all counted questions
+
+            same scores as helper.get_all_utility_scores on the complete dataset,
+            questions without choices are skipped
+        """
+        question_choices = self.get_question_choices_data()
+        questions = [question for question in (questions or self.questions) if question_choices.get(question)]
+        if not questions:
+            return {}
+
+        max_choices = max(len(question_choices[question]) for question in questions)
+        counts = np.zeros((len(questions), max_choices, len(self.risk_classes)), dtype=np.int64)
+        for position, question in enumerate(questions):
+            for answer_position, answer in enumerate(question_choices[question]):
+                counts[position, answer_position] = self.answer_counts[question][answer]
+
+        num_of_choices = [len(question_choices[question]) for question in questions]
+        scores = get_utility_scores_from_counts(counts, num_of_choices, self.num_of_rows)
+        return {question: float(score) for question, score in zip(questions, scores)}
+
+
+# reads the csv file chunk by chunk and folds every chunk into ContingencyCounts
+@timed_stage("stream_csv")
+def stream_contingency_counts(
+    file_path,
+    target_column,
+    columns,
+    QUESTION_MAPPER,
+    dtypes=None,
+    chunksize=DEFAULT_CHUNK_SIZE,
+    cut_points=SCALE_CUT_POINTS,
+):
+    """
+        file_path: String -> path of the csv file
+        target_column: String -> contains the name of the target column in csv dataset
+        columns: List of String -> columns to read (see helper.get_required_columns)
+        dtypes: Dictionary -> optional dtype for each of the columns
+        chunksize: Integer -> number of csv rows read at once
+
+        Every chunk is read (helper.read_csv_chunks) and goes through the same cleaning
+        (helper.clean_data) and scale binning (helper.convert_scale_columns_to_classes) as
+        the in memory pipeline, then only its counts are kept. Peak memory is bounded by chunksize.
+
+        Columns which are not in the csv file are listed in counts.missing_columns and the
+        columns with answers which do not fit their dtype in counts.mistyped_columns
+    """
+    usecols, csv_dtypes, missing_columns = get_csv_read_options(file_path, columns, dtypes)
+    questions = [column for column in columns if column != target_column and column not in missing_columns]
+    counts = ContingencyCounts(questions)
+    counts.missing_columns = missing_columns
+    if missing_columns:
+        print(f"{len(missing_columns)} requested columns are missing from {file_path}:")
+        print(", ".join(missing_columns))
+
+    mistyped_columns = []
+    for chunk in read_csv_chunks(file_path, usecols, csv_dtypes, chunksize, mistyped_columns):
+        chunk = clean_data(chunk, target_column, columns)
+        chunk = convert_scale_columns_to_classes(chunk, QUESTION_MAPPER, cut_points)
+        counts.add_chunk(chunk, target_column)
+
+    counts.mistyped_columns = [COLUMN_RENAMES.get(column, column) for column in mistyped_columns]
+    if counts.mistyped_columns:
+        print(f"{len(counts.mistyped_columns)} columns of {file_path} have answers which are not numbers:")
+        print(", ".join(counts.mistyped_columns))
+    return counts
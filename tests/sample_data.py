@@ -0,0 +1,73 @@
+"""
+    Small random datasets shaped like the cleaned assessment data (Child/*.csv after
+    helper.get_cleaned_data), with their own question-data.json and child_question_mapper.json
+"""
+
+import numpy as np
+import pandas as pd
+
+DATASET_NAME = "risk_mg"
+TARGET_COLUMN = "risk_mg"
+
+QUESTION_MAPPER = {
+    "risk_mg": {"question": "Risk", "values": "scale"},
+    "a_mg": {"question": "Question A", "values": "filter-q"},
+    "a1_mg": {"question": "Question A1", "values": "filter-q"},
+    "a2_mg": {"question": "Question A2", "values": "nominal"},
+    "b_mg": {"question": "Question B", "values": "filter-q"},
+    "b1_mg": {"question": "Question B1", "values": "scale"},
+    "c_mg": {"question": "Question C", "values": "nominal"},
+}
+
+# a2_mg has two parent questions and group_mg is a grouping node without a column
+QUESTION_CHILD_MAPPER = {
+    "root_mg": ["risk_mg"],
+    "risk_mg": ["a_mg", "b_mg", "group_mg"],
+    "a_mg": ["a1_mg", "a2_mg"],
+    "a1_mg": None,
+    "a2_mg": None,
+    "b_mg": ["b1_mg", "a2_mg"],
+    "b1_mg": None,
+    "group_mg": ["c_mg"],
+    "c_mg": None,
+}
+ROOT_QUESTIONS = ["a_mg", "b_mg"]
+QUESTIONS = [question for question in QUESTION_MAPPER if question != TARGET_COLUMN]
+
+# possible answers of every value type
+VALUE_TYPE_ANSWERS = {
+    "filter-q": np.array([0.0, 1.0]),
+    "nominal": np.array([0.0, 0.5, 1.0]),
+    "scale": np.round(np.arange(0, 1.01, 0.1), 1),
+}
+
+# non question columns at the start of the csv files (dropped by helper.clean_data)
+ID_COLUMNS = ["assessment_id", "patient_id", "assessor_id", "assessment_date"]
+
+
+def get_dataset(num_of_rows=2000, seed=0, missing_rate=0.2):
+    """
+        cleaned dataset, unanswered questions are -1 and the target is a raw scale value
+    """
+    random = np.random.default_rng(seed)
+    data = {}
+    for question in QUESTIONS:
+        answers = VALUE_TYPE_ANSWERS[QUESTION_MAPPER[question]["values"]]
+        values = answers[random.integers(0, len(answers), num_of_rows)]
+        values[random.random(num_of_rows) < missing_rate] = -1
+        data[question] = values
+
+    # the risk depends on a few of the answers, so the questions get different scores
+    risk = 0.2 + 0.3 * (data["a_mg"] == 1) + 0.3 * (data["c_mg"] == 1) + random.normal(0, 0.15, num_of_rows)
+    return pd.DataFrame(dict({TARGET_COLUMN: np.round(np.clip(risk, 0, 1), 1)}, **data))
+
+
+def write_csv(dataset, file_path):
+    """
+        writes the dataset like the csv exports: id columns first and "\\N" for the missing answers
+    """
+    data = dataset.replace(-1, np.nan)
+    for position, column in enumerate(ID_COLUMNS):
+        data.insert(position, column, np.arange(dataset.shape[0]))
+    data.to_csv(file_path, index=False, na_rep="\\N")
+    return file_path
@@ -0,0 +1,62 @@
+import importlib.util
+import json
+import os
+
+import pytest
+
+ARCHIVE_DIRECTORY = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Archive", "13 Oct 2023")
+
+
+@pytest.fixture(scope="module")
+def utils():
+    # the archive folder is not a package and its name has spaces, utils.py is loaded from its path
+    spec = importlib.util.spec_from_file_location("archive_utils", os.path.join(ARCHIVE_DIRECTORY, "utils.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def get_archive_path(filename):
+    return os.path.join(ARCHIVE_DIRECTORY, filename)
+
+
+def load_archive_json(filename):
+    with open(get_archive_path(filename)) as file:
+        return json.load(file)
+
+
+def test_streamed_mappers_match_the_old_converter(utils):
+    knowledge_file = get_archive_path(utils.KNOWLEDGE_FILE)
+    with open(knowledge_file) as file:
+        expected = utils.get_child_question_mapper(utils.xml_to_dict(file.read()), "root")
+    child_question_mapper = utils.stream_child_question_mapper(knowledge_file)
+    assert list(child_question_mapper.items()) == list(expected.items())
+
+    # the JSON files next to the XML files were written by the old converter
+    assert list(child_question_mapper.items()) == list(load_archive_json(utils.CHILD_QUESTION_MAPPER_FILE).items())
+    question_mapper = utils.stream_question_mapper(get_archive_path(utils.QUESTION_DATA_FILE))
+    assert list(question_mapper.items()) == list(load_archive_json(utils.QUESTION_MAPPER_FILE).items())
+
+
+def test_questions_in_many_places(utils, tmp_path):
+    knowledge_file = str(tmp_path / "load-knowledge.xml")
+    with open(knowledge_file, "w") as file:
+        file.write(
+            '<root code="root"><node code="a-1"><node code="shared"><node code="x"/></node></node>'
+            '<node code="b"/><node code="shared"><node code="y"/><node code="z"/></node></root>'
+        )
+    with open(knowledge_file) as file:
+        expected = utils.get_child_question_mapper(utils.xml_to_dict(file.read()), "root")
+    child_question_mapper = utils.stream_child_question_mapper(knowledge_file)
+    assert list(child_question_mapper.items()) == list(expected.items())
+    assert child_question_mapper["shared_mg"] == ["y_mg", "z_mg"]
+
+
+def test_json_files_are_only_built_when_the_xml_changes(utils, tmp_path):
+    xml_files = [get_archive_path(utils.KNOWLEDGE_FILE), get_archive_path(utils.QUESTION_DATA_FILE)]
+    output_directory = str(tmp_path)
+    assert utils.build_json_files(*xml_files, output_directory=output_directory)
+    assert not utils.build_json_files(*xml_files, output_directory=output_directory)
+    assert utils.build_json_files(*xml_files, output_directory=output_directory, force=True)
+    with open(os.path.join(output_directory, utils.QUESTION_MAPPER_FILE)) as file:
+        assert json.load(file) == load_archive_json(utils.QUESTION_MAPPER_FILE)
@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from encoding import MISSING_CODE, encode_dataset, get_code_dtype, get_encoded_utility_scores
+from helper import convert_scale_columns_to_classes, get_question_choices_data, get_utility_score
+from sample_data import QUESTION_MAPPER, QUESTIONS, TARGET_COLUMN, get_dataset
+
+
+def test_encoded_utility_scores_match_get_utility_score():
+    dataset = get_dataset()
+    converted = convert_scale_columns_to_classes(dataset, QUESTION_MAPPER)
+    question_choices = get_question_choices_data(converted)
+    scores = get_encoded_utility_scores(encode_dataset(dataset, QUESTION_MAPPER, TARGET_COLUMN), QUESTIONS)
+
+    assert list(scores) == QUESTIONS
+    for question in QUESTIONS:
+        expected = get_utility_score(converted, question, question_choices[question], TARGET_COLUMN)
+        assert scores[question] == pytest.approx(expected, abs=1e-12)
+
+
+def test_encoded_dataset_keeps_the_answers():
+    dataset = get_dataset(num_of_rows=500)
+    converted = convert_scale_columns_to_classes(dataset, QUESTION_MAPPER)
+    encoded = encode_dataset(dataset, QUESTION_MAPPER, TARGET_COLUMN)
+
+    assert encoded.codes.dtype == np.int8
+    for question in QUESTIONS:
+        answers = [encoded.get_answer(question, code) for code in encoded.get_column_codes(question)]
+        assert answers == list(converted[question])
+        assert encoded.get_code(question, "not an answer") == MISSING_CODE
+    assert [encoded.risk_classes[code] for code in encoded.target] == list(converted[TARGET_COLUMN])
+
+
+def test_code_dtype_holds_every_code():
+    assert get_code_dtype({"filter-q": [0.0, 1.0]}) == np.int8
+    assert get_code_dtype({"integer": list(range(200))}) == np.int16
+    assert get_code_dtype({"nominal": list(range(np.iinfo(np.int16).max + 1))}) == np.int32
+
+
+def test_large_code_tables_are_not_wrapped():
+    num_of_rows = np.iinfo(np.int16).max + 10
+    dataset = get_dataset(num_of_rows=num_of_rows)
+    dataset["c_mg"] = np.arange(num_of_rows, dtype=np.float64)
+    encoded = encode_dataset(dataset[[TARGET_COLUMN, "c_mg"]], QUESTION_MAPPER, TARGET_COLUMN)
+
+    assert encoded.codes.dtype == np.int32
+    assert encoded.get_answer("c_mg", encoded.get_column_codes("c_mg")[-1]) == num_of_rows - 1
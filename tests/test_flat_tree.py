@@ -0,0 +1,128 @@
+import numpy as np
+import pytest
+
+from flat_tree import WORST_SCORE, FlatQuestionTree, get_question_scores
+from helper import get_all_utility_scores, get_child_questions, get_question_choices_data, has_child
+from node import NODE, iter_tree_nodes
+from sample_data import QUESTION_CHILD_MAPPER, QUESTIONS, ROOT_QUESTIONS, TARGET_COLUMN
+from test_helper import get_converted_dataset
+
+
+def question_tree(question_queue, QUESTION_CHILD_MAPPER, scores):
+    """
+        recursive NODE tree of suic-questionaire.py question_tree, with the scores given
+    """
+    output = []
+    for question in question_queue:
+        parent_node = NODE(question=question, score=scores.get(question, WORST_SCORE))
+        if has_child(question, QUESTION_CHILD_MAPPER):
+            child_questions = get_child_questions(question, QUESTION_CHILD_MAPPER)
+            parent_node.add_child_node(question_tree(child_questions, QUESTION_CHILD_MAPPER, scores))
+        parent_node.update_best_scores()
+        output.append(parent_node)
+    return output
+
+
+def get_random_mapper(num_of_questions=150, seed=0):
+    """
+        mapper where some questions have more than one parent, and random scores
+    """
+    random = np.random.default_rng(seed)
+    questions = [f"q{position}_mg" for position in range(num_of_questions)]
+    QUESTION_CHILD_MAPPER = {}
+    for position, question in enumerate(questions):
+        later_questions = questions[position + 1 : position + 25]
+        num_of_children = min(int(random.integers(0, 4)), len(later_questions))
+        children = list(random.choice(later_questions, num_of_children, replace=False)) if num_of_children else None
+        QUESTION_CHILD_MAPPER[question] = children
+    scores = {question: round(float(random.random()), 3) for question in questions if random.random() < 0.9}
+    return questions[:5], QUESTION_CHILD_MAPPER, scores
+
+
+def get_tree_rows(root_nodes):
+    return [
+        (node_id, parent_id, node.question, node.score, node.best)
+        for root_node in root_nodes
+        for node_id, parent_id, node, _ in iter_tree_nodes(root_node)
+    ]
+
+
+def get_sample_scores():
+    dataset = get_converted_dataset()
+    question_choices = get_question_choices_data(dataset[QUESTIONS])
+    return get_question_scores(
+        [question for question in QUESTION_CHILD_MAPPER if question != TARGET_COLUMN],
+        question_choices,
+        get_all_utility_scores(dataset, question_choices, TARGET_COLUMN),
+    )
+
+
+@pytest.mark.parametrize("seed", [0, 1])
+def test_flat_tree_matches_the_node_tree(seed):
+    root_questions, QUESTION_CHILD_MAPPER, scores = get_random_mapper(seed=seed)
+    tree = FlatQuestionTree.build(root_questions, QUESTION_CHILD_MAPPER, scores)
+    expected = get_tree_rows(question_tree(root_questions, QUESTION_CHILD_MAPPER, scores))
+    assert get_tree_rows(tree.get_root_nodes()) == expected
+    assert tree.num_of_nodes == len(expected)
+
+    # the subtree of a node is the node range up to its subtree end
+    for node in range(tree.num_of_nodes):
+        descendants = {int(child) for child in tree.get_children(node)}
+        for child in list(descendants):
+            descendants.update(range(child, tree.subtree_ends[child]))
+        assert descendants == set(range(node + 1, tree.subtree_ends[node]))
+
+
+def test_flat_tree_of_the_sample_data():
+    scores = get_sample_scores()
+    # group_mg has no column, so it gets the worst score
+    assert scores["group_mg"] == WORST_SCORE
+    tree = FlatQuestionTree.build(ROOT_QUESTIONS + ["group_mg"], QUESTION_CHILD_MAPPER, scores)
+    expected = question_tree(ROOT_QUESTIONS + ["group_mg"], QUESTION_CHILD_MAPPER, scores)
+    assert get_tree_rows(tree.get_root_nodes()) == get_tree_rows(expected)
+    assert [repr(node) for node in tree.get_root_nodes()] == [repr(node) for node in expected]
+    # a2_mg is a child of a_mg and b_mg
+    assert len(tree.question_nodes["a2_mg"]) == 2
+
+
+def test_dirty_best_scores_match_a_full_update():
+    root_questions, QUESTION_CHILD_MAPPER, scores = get_random_mapper(seed=2)
+    tree = FlatQuestionTree.build(root_questions, QUESTION_CHILD_MAPPER, scores)
+    random = np.random.default_rng(0)
+    for _ in range(10):
+        # some questions rescored, like on a narrowed subset
+        new_scores = {
+            question: round(float(random.random()), 3)
+            for question in random.choice(list(QUESTION_CHILD_MAPPER), 15, replace=False)
+        }
+        scores.update(new_scores)
+        tree.set_scores(new_scores)
+        assert tree.update_dirty_best_scores() <= tree.num_of_nodes
+        assert not tree.dirty.any()
+
+        expected = question_tree(root_questions, QUESTION_CHILD_MAPPER, scores)
+        assert get_tree_rows(tree.get_root_nodes()) == get_tree_rows(expected)
+        np.testing.assert_array_equal(
+            tree.best, FlatQuestionTree.build(root_questions, QUESTION_CHILD_MAPPER, scores).best
+        )
+
+
+def test_only_the_changed_nodes_are_updated():
+    root_questions, QUESTION_CHILD_MAPPER, scores = get_random_mapper(seed=2)
+    tree = FlatQuestionTree.build(root_questions, QUESTION_CHILD_MAPPER, scores)
+    assert tree.update_dirty_best_scores() == 0
+
+    # a worse score of a leaf which is not the best of its parent stops at the parent
+    leaf = next(
+        node
+        for node in range(tree.num_of_nodes)
+        if not len(tree.get_children(node)) and tree.best[tree.parents[node]] < tree.scores[node] < WORST_SCORE
+    )
+    tree.set_score(leaf, WORST_SCORE)
+    assert tree.update_dirty_best_scores() == 2
+    assert tree.best[leaf] == WORST_SCORE
+
+    # NodeView.update_best_scores only updates the changed nodes as well
+    root_node = tree.get_root_nodes()[0]
+    root_node.score = 0
+    assert root_node.update_best_scores() == 0 and tree.best[root_node.node] == 0
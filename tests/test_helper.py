@@ -0,0 +1,160 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import helper
+from helper import (
+    CACHE_DIRECTORY,
+    convert_scale_columns_to_classes,
+    convert_to_low_medium_and_high_risk,
+    get_all_utility_scores,
+    get_cleaned_data,
+    get_column_dtypes,
+    get_question_choices_data,
+    get_required_columns,
+    get_scale_codes,
+    get_utility_score,
+    load_cached_data,
+    save_cached_data,
+)
+from sample_data import (
+    DATASET_NAME,
+    QUESTION_CHILD_MAPPER,
+    QUESTION_MAPPER,
+    QUESTIONS,
+    TARGET_COLUMN,
+    get_dataset,
+    write_csv,
+)
+
+DATASET_FILE_PATH = "Child/child-adolescent-risk.csv"
+
+
+def get_converted_dataset(**kwargs):
+    return convert_scale_columns_to_classes(get_dataset(**kwargs), QUESTION_MAPPER)
+
+
+def test_all_utility_scores_match_get_utility_score():
+    dataset = get_converted_dataset()
+    question_choices = {question: get_question_choices_data(dataset)[question] for question in QUESTIONS}
+    scores = get_all_utility_scores(dataset, question_choices, TARGET_COLUMN)
+
+    assert list(scores) == QUESTIONS
+    for question in QUESTIONS:
+        expected = get_utility_score(dataset, question, question_choices[question], TARGET_COLUMN)
+        assert scores[question] == pytest.approx(expected, abs=1e-12)
+
+
+def test_all_utility_scores_skip_questions_without_choices():
+    dataset = get_converted_dataset(num_of_rows=200)
+    dataset["a1_mg"] = -1
+    question_choices = get_question_choices_data(dataset[QUESTIONS])
+    assert question_choices["a1_mg"] == []
+    assert "a1_mg" not in get_all_utility_scores(dataset, question_choices, TARGET_COLUMN)
+
+
+def test_scale_codes_at_the_cut_points():
+    # -1 is the missing value of the cleaned data
+    values = np.array([-1.0, 0.0, 0.3, 0.39999, 0.4, 0.6, 0.69999, 0.7, 1.0])
+    expected = [convert_to_low_medium_and_high_risk(value) for value in values]
+    assert [["low", "medium", "high"][code] for code in get_scale_codes(values)] == expected
+    assert list(get_scale_codes(np.array([0.1, 0.5, 0.9]), cut_points=(0.2, 0.6))) == [0, 1, 2]
+
+
+def test_convert_scale_columns_to_classes():
+    dataset = get_dataset(num_of_rows=500)
+    converted = convert_scale_columns_to_classes(dataset, QUESTION_MAPPER)
+    for column in [TARGET_COLUMN, "b1_mg"]:
+        assert list(converted[column]) == [convert_to_low_medium_and_high_risk(value) for value in dataset[column]]
+    assert converted["a_mg"].equals(dataset["a_mg"])
+    # the given DataFrame is not modified
+    assert dataset[TARGET_COLUMN].dtype == np.float64
+
+    with pytest.raises(ValueError):
+        convert_scale_columns_to_classes(dataset, QUESTION_MAPPER, cut_points=(0.5,))
+
+
+def load_sample_csv(base_path, **kwargs):
+    columns = get_required_columns(DATASET_NAME, QUESTION_CHILD_MAPPER, QUESTION_MAPPER, TARGET_COLUMN)
+    return get_cleaned_data(
+        base_path,
+        TARGET_COLUMN,
+        columns=columns,
+        dtypes=get_column_dtypes(columns, QUESTION_MAPPER),
+        dataset_file_path=DATASET_FILE_PATH,
+        **kwargs,
+    )
+
+
+def get_cached_datasets(base_path):
+    return [name for name in os.listdir(base_path + CACHE_DIRECTORY) if name != "digests.json"]
+
+
+def test_cleaned_data_cache(tmp_path, monkeypatch):
+    base_path = str(tmp_path) + "/"
+    os.makedirs(base_path + "Child")
+    write_csv(get_dataset(num_of_rows=300), base_path + DATASET_FILE_PATH)
+    expected = load_sample_csv(base_path, use_cache=False)
+    pd.testing.assert_frame_equal(load_sample_csv(base_path), expected)
+
+    # warm loads do not read the csv file
+    with monkeypatch.context() as patch:
+        patch.setattr(helper, "read_cleaned_csv", None)
+        pd.testing.assert_frame_equal(load_sample_csv(base_path), expected)
+
+    # a changed csv file is read again and the cache of the old one is deleted
+    write_csv(get_dataset(num_of_rows=400, seed=1), base_path + DATASET_FILE_PATH)
+    pd.testing.assert_frame_equal(load_sample_csv(base_path), load_sample_csv(base_path, use_cache=False))
+    assert len(get_cached_datasets(base_path)) == 1
+
+    # so is a new version of the cleaning
+    old_cache = get_cached_datasets(base_path)
+    monkeypatch.setattr(helper, "CLEANED_DATA_FORMAT_VERSION", helper.CLEANED_DATA_FORMAT_VERSION + 1)
+    load_sample_csv(base_path)
+    assert len(get_cached_datasets(base_path)) == 1 and get_cached_datasets(base_path) != old_cache
+
+
+def test_cached_data_is_only_unpickled_for_object_columns(tmp_path):
+    cache_path = str(tmp_path / "cache")
+    data = pd.DataFrame({"a_mg": [1.0, 0.0], "c_mg": ["text answer", 1.0]})
+    save_cached_data(data, cache_path, {})
+    pd.testing.assert_frame_equal(load_cached_data(cache_path), data)
+
+    # a pickled file in place of a numeric column is refused
+    np.save(os.path.join(cache_path, "0.npy"), np.array([1.0, "text answer"], dtype=object), allow_pickle=True)
+    with pytest.raises(ValueError):
+        load_cached_data(cache_path)
+
+
+def test_only_the_required_columns_are_read(tmp_path, capsys):
+    base_path = str(tmp_path) + "/"
+    os.makedirs(base_path + "Child")
+    dataset = get_dataset(num_of_rows=300)
+    dataset["unused_mg"] = 1.0
+    write_csv(dataset.drop(columns=["a1_mg"]), base_path + DATASET_FILE_PATH)
+
+    data = load_sample_csv(base_path, use_cache=False)
+    assert list(data.columns) == [column for column in dataset.columns if column not in ("a1_mg", "unused_mg")]
+    assert data.attrs["missing_columns"] == ["a1_mg"]
+    assert "a1_mg" in capsys.readouterr().out
+    assert set(data.dtypes) == {np.dtype(np.float64)}
+    pd.testing.assert_frame_equal(data, dataset[data.columns], check_dtype=False)
+
+
+def test_columns_with_text_answers(tmp_path, capsys):
+    base_path = str(tmp_path) + "/"
+    os.makedirs(base_path + "Child")
+    dataset = get_dataset(num_of_rows=300)
+    dataset["c_mg"] = dataset["c_mg"].astype(object)
+    dataset.loc[250, "c_mg"] = "text answer"
+    write_csv(dataset, base_path + DATASET_FILE_PATH)
+
+    data = load_sample_csv(base_path)
+    assert data.attrs["mistyped_columns"] == ["c_mg"]
+    assert "c_mg" in capsys.readouterr().out
+    # only the column with the text answer is read with other dtypes
+    assert data["c_mg"].dtype == object and data["a_mg"].dtype == np.float64
+    assert list(data["c_mg"]) == list(dataset["c_mg"])
+    pd.testing.assert_frame_equal(load_sample_csv(base_path), data)
@@ -0,0 +1,39 @@
+import pytest
+
+import instrumentation
+from encoding import encode_dataset
+from helper import get_all_utility_scores, get_question_choices_data
+from questionnaire import QuestionnaireEngine
+from sample_data import QUESTION_CHILD_MAPPER, QUESTION_MAPPER, QUESTIONS, ROOT_QUESTIONS, TARGET_COLUMN, get_dataset
+from test_helper import get_converted_dataset
+
+
+@pytest.fixture
+def counters():
+    instrumentation.reset()
+    instrumentation.enable()
+    yield instrumentation.COUNTERS
+    instrumentation.disable()
+    instrumentation.reset()
+
+
+def test_contingency_scoring_is_counted(counters):
+    dataset = get_converted_dataset()
+    question_choices = get_question_choices_data(dataset[QUESTIONS])
+    get_all_utility_scores(dataset, question_choices, TARGET_COLUMN)
+    assert counters["utility_scores"] == len(QUESTIONS)
+    assert counters["gini_evaluations"] == sum(len(choices) for choices in question_choices.values())
+
+
+def test_answer_index_narrowing_is_counted(counters):
+    encoded = encode_dataset(get_dataset(), QUESTION_MAPPER, TARGET_COLUMN)
+    engine = QuestionnaireEngine(encoded, QUESTION_CHILD_MAPPER, QUESTION_MAPPER, ROOT_QUESTIONS)
+    session = engine.start_session()
+    engine.submit_answer(session, "a_mg", 1.0)
+    engine.submit_answer(session, "a1_mg", 0.0)
+    engine.load_session(engine.dump_session(session))
+    assert counters["dataframe_filters"] == 4
+
+    counters.clear()
+    engine.get_sorted_scores(session)
+    assert counters["utility_scores"] == len(session.queue_ids)
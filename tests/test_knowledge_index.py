@@ -0,0 +1,76 @@
+import importlib.util
+import os
+import xml.etree.ElementTree as ET
+
+import pytest
+
+from helper import get_child_questions, get_descendant_questions, load_json_file
+from knowledge_index import KnowledgeIndex
+
+REPOSITORY_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+KNOWLEDGE_FILE = os.path.join(REPOSITORY_DIRECTORY, "Archive", "13 Oct 2023", "load-knowledge.xml")
+
+
+@pytest.fixture(scope="module")
+def tree_functions():
+    # the archive folder is not a package and its name has spaces, tree_functions.py is loaded from its path
+    spec = importlib.util.spec_from_file_location(
+        "tree_functions", os.path.join(REPOSITORY_DIRECTORY, "Archive", "14 Aug 2023", "tree_functions.py")
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture(scope="module")
+def knowledge_tree():
+    """
+        load-knowledge.xml as the dictionary tree used by tree_functions.py ("code" and "elements" keys)
+    """
+    root = {}
+    stack = [(ET.parse(KNOWLEDGE_FILE).getroot(), root)]
+    while stack:
+        element, node = stack.pop()
+        node["code"] = element.attrib["code"]
+        node["elements"] = [{} for _ in element]
+        stack.extend(zip(element, node["elements"]))
+    return root
+
+
+def test_index_matches_the_recursive_tree_functions(tree_functions, knowledge_tree):
+    index = KnowledgeIndex.from_tree(knowledge_tree)
+    codes = tree_functions.getallnodecodes(knowledge_tree)
+    assert index.codes == codes
+
+    # getdescendantsallconcepts is built on the index, the reference walks the tree of every concept
+    expected = {
+        concept: tree_functions.getdescendants(tree_functions.getnode(knowledge_tree, concept))
+        for concept in tree_functions.getconcepts(knowledge_tree)[1:]
+    }
+    assert tree_functions.getdescendantsallconcepts(knowledge_tree) == expected
+
+    for code in set(codes):
+        node = tree_functions.getnode(knowledge_tree, code)
+        assert tree_functions.getnode(knowledge_tree, code, index) is node
+        assert index.get_descendants(code) == tree_functions.getdescendants(node)
+        assert index.get_children(code) == [child["code"] for child in node["elements"]]
+    for ancestor in expected:
+        for code in set(codes):
+            assert tree_functions.isdescendant(ancestor, code, index) == tree_functions.isdescendant(
+                ancestor, code, expected
+            )
+    assert index.get_node("not-a-code") is None and not index.is_descendant("not-a-code", codes[1])
+
+
+def test_index_matches_the_child_question_mapper():
+    QUESTION_CHILD_MAPPER = load_json_file(os.path.join(REPOSITORY_DIRECTORY, "child_question_mapper.json"))
+    index = KnowledgeIndex.from_mapper(QUESTION_CHILD_MAPPER)
+    assert index.codes[0] == "root_mg"
+
+    for question in QUESTION_CHILD_MAPPER:
+        assert index.get_descendant_questions([question]) == get_descendant_questions([question], QUESTION_CHILD_MAPPER)
+        assert index.get_children(question) == (get_child_questions(question, QUESTION_CHILD_MAPPER) or [])
+    root_questions = QUESTION_CHILD_MAPPER["root_mg"][:3] + ["not_a_question_mg"]
+    assert index.get_descendant_questions(root_questions) == get_descendant_questions(
+        root_questions, QUESTION_CHILD_MAPPER
+    )
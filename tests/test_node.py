@@ -0,0 +1,38 @@
+import pytest
+
+from flat_tree import FlatQuestionTree
+from node import iter_ordered_questions, top_k
+from test_flat_tree import get_random_mapper, question_tree
+
+
+def get_ordered_questions(root_nodes):
+    """
+        linear scan ordering of suic-questionaire.py, the first queued node with the
+        strictly lowest best score is taken
+    """
+    question_queue = list(root_nodes)
+    ordered_questions = []
+    while question_queue:
+        best_question_node = None
+        for question_node in question_queue:
+            if best_question_node is None or question_node.best < best_question_node.best:
+                best_question_node = question_node
+        ordered_questions.append(best_question_node.question)
+        question_queue.extend(best_question_node.children)
+        question_queue.remove(best_question_node)
+    return ordered_questions
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_ordered_questions_match_the_linear_scan(seed):
+    root_questions, QUESTION_CHILD_MAPPER, scores = get_random_mapper(seed=seed)
+    # one decimal scores, so many nodes tie on their best score
+    scores = {question: round(score, 1) for question, score in scores.items()}
+    root_nodes = question_tree(root_questions, QUESTION_CHILD_MAPPER, scores)
+    expected = get_ordered_questions(root_nodes)
+
+    assert list(iter_ordered_questions(root_nodes)) == expected
+    flat_root_nodes = FlatQuestionTree.build(root_questions, QUESTION_CHILD_MAPPER, scores).get_root_nodes()
+    assert list(iter_ordered_questions(flat_root_nodes)) == expected
+    assert top_k(root_nodes, 15) == expected[:15]
+    assert top_k(root_nodes, len(expected) + 10) == expected
@@ -0,0 +1,37 @@
+import numpy as np
+
+from encoding import encode_dataset, get_encoded_utility_scores
+from parallel_scoring import SharedEncodedDataset, attach_encoded_dataset, get_parallel_utility_scores
+from sample_data import QUESTION_MAPPER, QUESTIONS, TARGET_COLUMN, get_dataset
+
+
+def get_encoded():
+    dataset = get_dataset()
+    # a question without choices is not scored
+    dataset["a1_mg"] = -1.0
+    return encode_dataset(dataset, QUESTION_MAPPER, TARGET_COLUMN)
+
+
+def test_parallel_scores_match_the_serial_scores():
+    encoded = get_encoded()
+    questions = QUESTIONS + ["not_in_the_dataset_mg"]
+    expected = get_encoded_utility_scores(encoded, questions)
+    assert "a1_mg" not in expected and len(expected) == len(QUESTIONS) - 1
+
+    assert get_parallel_utility_scores(encoded, questions, max_workers=1) == expected
+    for max_workers in (2, 3):
+        scores = get_parallel_utility_scores(encoded, questions, max_workers=max_workers)
+        assert list(scores) == list(expected) and scores == expected
+
+
+def test_attached_dataset_matches_the_encoded_dataset():
+    encoded = get_encoded()
+    with SharedEncodedDataset(encoded) as shared:
+        attached, blocks = attach_encoded_dataset(shared.description)
+        np.testing.assert_array_equal(attached.codes, encoded.codes)
+        np.testing.assert_array_equal(attached.target, encoded.target)
+        assert attached.code_tables == encoded.code_tables
+        assert get_encoded_utility_scores(attached, QUESTIONS) == get_encoded_utility_scores(encoded, QUESTIONS)
+        del attached
+        for block in blocks:
+            block.close()
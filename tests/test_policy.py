@@ -0,0 +1,45 @@
+import random
+
+from encoding import encode_dataset
+from policy import LEAF, ROOT_NODE, DecisionPolicy, save_policy
+from policy_compiler import compile_policy
+from questionnaire import QuestionnaireEngine
+from sample_data import QUESTION_CHILD_MAPPER, QUESTION_MAPPER, ROOT_QUESTIONS, TARGET_COLUMN, get_dataset
+
+
+def get_engine(min_sample_threshold=50):
+    encoded = encode_dataset(get_dataset(), QUESTION_MAPPER, TARGET_COLUMN)
+    return QuestionnaireEngine(
+        encoded, QUESTION_CHILD_MAPPER, QUESTION_MAPPER, ROOT_QUESTIONS, min_sample_threshold=min_sample_threshold
+    )
+
+
+def test_compiled_policy_replays_the_engine(tmp_path):
+    engine = get_engine()
+    save_policy(compile_policy(engine, max_workers=1), str(tmp_path / "policy.json.gz"))
+    policy = DecisionPolicy.load(str(tmp_path / "policy.json.gz"))
+
+    random.seed(0)
+    for _ in range(100):
+        session, node = engine.start_session(), ROOT_NODE
+        while True:
+            question = engine.next_question(session)
+            assert policy.get_question(node) == question
+            if question is None:
+                break
+            answer = random.choice(policy.get_choices(node))
+            engine.submit_answer(session, question, answer)
+            node = policy.next_node(node, answer)
+        assert policy.get_risk_estimate(node) == engine.get_risk_estimate(session)
+
+
+def test_compiled_policy_does_not_depend_on_the_workers():
+    engine = get_engine(min_sample_threshold=20)
+    policy = compile_policy(engine, max_workers=1)
+    assert compile_policy(engine, max_workers=2) == policy
+    assert compile_policy(engine, max_workers=1, max_depth=2) == compile_policy(engine, max_workers=3, max_depth=2)
+
+    # depth first node order, every child comes after its parent
+    for node, (question_position, children, _) in enumerate(policy["nodes"]):
+        assert (question_position == LEAF) == (not children)
+        assert all(child > node for child in children)
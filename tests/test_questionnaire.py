@@ -0,0 +1,126 @@
+import random
+
+import numpy as np
+import pandas as pd
+
+from encoding import encode_dataset
+from helper import get_descendant_questions, get_utility_score
+from questionnaire import QuestionnaireEngine
+from ranking_cache import RankingCache
+
+QUESTIONS = ["p1_mg", "p2_mg", "c_mg", "d_mg", "e_mg"]
+TARGET_COLUMN = "risk_mg"
+
+# c_mg has two parents, so it can be queued by p1_mg and pruned by p2_mg
+QUESTION_CHILD_MAPPER = {"p1_mg": ["c_mg"], "p2_mg": ["c_mg", "e_mg"], "c_mg": ["e_mg"]}
+ROOT_QUESTIONS = ["p1_mg", "p2_mg", "d_mg"]
+
+
+def get_dataset(num_of_rows=4000, seed=0):
+    random_state = np.random.default_rng(seed)
+    data = {question: random_state.integers(0, 2, num_of_rows).astype(float) for question in QUESTIONS}
+    data[TARGET_COLUMN] = random_state.choice([0.1, 0.5, 0.9], num_of_rows)
+    return pd.DataFrame(data)
+
+
+def get_engine(dataset, **kwargs):
+    QUESTION_MAPPER = {question: {"values": "filter-q"} for question in QUESTIONS}
+    QUESTION_MAPPER[TARGET_COLUMN] = {"values": "scale"}
+    encoded = encode_dataset(dataset, QUESTION_MAPPER, TARGET_COLUMN)
+    return QuestionnaireEngine(
+        encoded, QUESTION_CHILD_MAPPER, QUESTION_MAPPER, ROOT_QUESTIONS, min_sample_threshold=10, **kwargs
+    )
+
+
+def get_queue(engine, session):
+    return sorted(engine.questions[question_id] for question_id in session.queue_ids)
+
+
+def test_pruned_queue_depends_on_the_answer_order():
+    engine = get_engine(get_dataset(), prune_subtrees=True)
+
+    session = engine.start_session()
+    engine.submit_answer(session, "p1_mg", 1.0)
+    engine.submit_answer(session, "p2_mg", 0.0)
+    assert get_queue(engine, session) == ["d_mg"]
+
+    session = engine.start_session()
+    engine.submit_answer(session, "p2_mg", 0.0)
+    engine.submit_answer(session, "p1_mg", 1.0)
+    assert get_queue(engine, session) == ["c_mg", "d_mg"]
+
+
+def test_ranking_cache_with_pruning():
+    engine = get_engine(get_dataset(), prune_subtrees=True, ranking_cache=RankingCache())
+
+    session = engine.start_session()
+    for question, answer in [("p1_mg", 1.0), ("p2_mg", 0.0)]:
+        engine.get_sorted_scores(session)
+        engine.submit_answer(session, question, answer)
+    assert [question for question, _ in engine.get_sorted_scores(session)] == ["d_mg"]
+
+    # same answers in the other order, c_mg is queued again by p1_mg
+    session = engine.start_session()
+    for question, answer in [("p2_mg", 0.0), ("p1_mg", 1.0)]:
+        engine.get_sorted_scores(session)
+        engine.submit_answer(session, question, answer)
+    assert sorted(question for question, _ in engine.get_sorted_scores(session)) == ["c_mg", "d_mg"]
+
+
+def test_pruning_matches_a_list_queue():
+    dataset = get_dataset(seed=1)
+    converted = dataset.copy()
+    converted[TARGET_COLUMN] = pd.cut(
+        converted[TARGET_COLUMN], [-1, 0.3, 0.6, 2], labels=["low", "medium", "high"]
+    ).astype(str)
+    engine = get_engine(dataset, prune_subtrees=True)
+    choices = {question: [0.0, 1.0] for question in QUESTIONS}
+
+    random.seed(0)
+    for _ in range(20):
+        session = engine.start_session()
+        queue, answered, subset = set(ROOT_QUESTIONS), set(), converted
+        while not engine.is_finished(session):
+            assert get_queue(engine, session) == sorted(queue)
+            ranking = engine.get_sorted_scores(session)
+            for question, score in ranking:
+                assert abs(score - get_utility_score(subset, question, choices[question], TARGET_COLUMN)) < 1e-12
+
+            question = ranking[0][0]
+            answer = random.choice(choices[question])
+            engine.submit_answer(session, question, answer)
+            subset = subset[subset[question] == answer]
+            queue.discard(question)
+            answered.add(question)
+            if answer == 0:
+                queue -= set(get_descendant_questions([question], QUESTION_CHILD_MAPPER)[1:])
+            else:
+                queue |= {child for child in QUESTION_CHILD_MAPPER.get(question, []) if child not in answered}
+            assert session.num_of_rows == len(subset)
+
+
+def test_cached_rankings_are_not_changed_by_the_caller():
+    engine = get_engine(get_dataset(), ranking_cache=RankingCache())
+    session = engine.start_session()
+    expected = engine.get_sorted_scores(session)
+    assert engine.ranking_cache.get_stats()["size"] == 1
+
+    for _ in range(2):
+        ranking = engine.get_sorted_scores(session)
+        assert ranking == expected
+        ranking.pop(0)
+        ranking.append(("p1_mg", 0.0))
+    assert engine.ranking_cache.get_stats()["hits"] == 2
+
+
+def test_partial_answers_are_compared_as_their_choice():
+    engine = get_engine(get_dataset(), prune_subtrees=True)
+    for answer in [0.0, "0."]:
+        session = engine.start_session()
+        engine.submit_answer(session, "p2_mg", answer)
+        assert get_queue(engine, session) == ["d_mg", "p1_mg"]
+
+    # "1." is the 1.0 choice, so the children are queued
+    session = engine.start_session()
+    engine.submit_answer(session, "p2_mg", "1.")
+    assert get_queue(engine, session) == ["c_mg", "d_mg", "e_mg", "p1_mg"]
@@ -0,0 +1,60 @@
+import os
+import re
+
+from node import NODE
+from rendering import get_tree_dot, render_trees
+
+
+def get_tree():
+    """
+        root_mg with the same question (and best score) below two of its children
+    """
+    root_node = NODE("root_mg", 0.9)
+    for question, score in [("a_mg", 0.5), ("b_mg", 0.5), ("c_mg", 0.2)]:
+        child_node = NODE(question, score)
+        child_node.add_child_node([NODE("shared_mg", 0.4), NODE("leaf_mg", 0.6)])
+        root_node.add_child_node(child_node)
+    root_node.update_best_scores()
+    return root_node
+
+
+def parse_dot(dot):
+    nodes = re.findall(r"^\t(\w+) \[label=\"([^\"]*)\"", dot, re.MULTILINE)
+    edges = re.findall(r"^\t(\w+) -> (\w+)", dot, re.MULTILINE)
+    return nodes, edges
+
+
+def test_repeated_labels_get_their_own_node_ids():
+    nodes, edges = parse_dot(get_tree_dot(get_tree()))
+    node_ids = [node_id for node_id, _ in nodes]
+    labels = [label for _, label in nodes]
+
+    assert len(nodes) == 10 and len(set(node_ids)) == len(node_ids)
+    assert labels.count("shared_mg___0.4") == 3 and labels.count("leaf_mg___0.6") == 3
+    # a tree: every node except the root has one parent, and every edge joins known nodes
+    assert len(edges) == len(nodes) - 1
+    assert sorted(child for _, child in edges) == sorted(node_ids[1:])
+    assert {parent for parent, _ in edges} <= set(node_ids)
+
+
+def test_pruned_trees_count_the_left_out_children():
+    nodes, edges = parse_dot(get_tree_dot(get_tree(), max_depth=1, top_k=2))
+    labels = [label for _, label in nodes]
+    # c_mg and a_mg (first of the tie with b_mg) are kept, the depth 2 children are left out
+    assert labels == ["root_mg___0.2", "1 more", "a_mg___0.4", "2 more", "c_mg___0.2", "2 more"]
+    assert len({node_id for node_id, _ in nodes}) == len(nodes) == len(edges) + 1
+
+
+def test_unchanged_trees_are_not_rendered_again(tmp_path):
+    output_directory = str(tmp_path)
+    root_node = get_tree()
+    assert render_trees([root_node], output_directory, formats=["dot"]) == 1
+    with open(os.path.join(output_directory, "root_mg.dot")) as file:
+        assert file.read() == get_tree_dot(root_node)
+
+    assert render_trees([root_node], output_directory, formats=["dot"]) == 0
+    root_node.children[0].score = 0.1
+    root_node.update_best_scores()
+    assert render_trees([root_node], output_directory, formats=["dot"]) == 1
+    # only the hashes are left in the render cache
+    assert sorted(os.listdir(os.path.join(output_directory, ".render-cache"))) == ["root_mg.dot.sha256"]
@@ -0,0 +1,127 @@
+import asyncio
+import json
+
+import pytest
+
+from encoding import encode_dataset
+from questionnaire import QuestionnaireEngine
+from service import QuestionnaireService, ServiceError
+from sample_data import QUESTION_CHILD_MAPPER, QUESTION_MAPPER, ROOT_QUESTIONS, TARGET_COLUMN, get_dataset
+
+
+def get_service():
+    encoded = encode_dataset(get_dataset(), QUESTION_MAPPER, TARGET_COLUMN)
+    engine = QuestionnaireEngine(
+        encoded, QUESTION_CHILD_MAPPER, QUESTION_MAPPER, ROOT_QUESTIONS, min_sample_threshold=50
+    )
+    return QuestionnaireService(engine, QUESTION_MAPPER, {})
+
+
+def test_session_routes():
+    service = get_service()
+    status, response = service.route("POST", "/sessions", {})
+    assert status == 201 and not response["finished"]
+    session_id, question = response["session_id"], response["question"]
+    assert question["code"] in ROOT_QUESTIONS
+    assert question["text"] == QUESTION_MAPPER[question["code"]]["question"]
+    assert service.route("GET", f"/sessions/{session_id}", {}) == (200, response)
+
+    status, response = service.route("POST", f"/sessions/{session_id}/answers", {"answer": question["choices"][-1]})
+    assert status == 200 and response["num_of_answers"] == 1
+    status, risk = service.route("GET", f"/sessions/{session_id}/risk", {})
+    assert status == 200 and risk["session_id"] == session_id
+    assert service.route("GET", "/stats", {}) == (200, {"sessions": 1})
+
+    assert service.route("DELETE", f"/sessions/{session_id}", {}) == (200, {"session_id": session_id, "ended": True})
+    for method, path, status in [
+        ("GET", f"/sessions/{session_id}", 404),
+        ("GET", "/unknown", 404),
+        ("PUT", "/sessions/abc", 405),
+        ("GET", "/sessions/abc/answers", 405),
+    ]:
+        with pytest.raises(ServiceError) as error:
+            service.route(method, path, {})
+        assert error.value.status == status
+
+
+@pytest.mark.parametrize("answer", ["banana", [0], True, {"answer": 0}, None, 7])
+def test_answers_which_are_not_a_choice_are_rejected(answer):
+    service = get_service()
+    session_id = service.route("POST", "/sessions", {})[1]["session_id"]
+    with pytest.raises(ServiceError) as error:
+        service.route("POST", f"/sessions/{session_id}/answers", {"answer": answer})
+    assert error.value.status == 400
+    assert service.sessions[session_id].answers == []
+
+
+def test_only_queued_questions_can_be_answered():
+    service = get_service()
+    session_id = service.route("POST", "/sessions", {})[1]["session_id"]
+    # a1_mg is queued by a 1 answer of a_mg
+    for question in ["a1_mg", "unknown_mg"]:
+        with pytest.raises(ServiceError) as error:
+            service.route("POST", f"/sessions/{session_id}/answers", {"question": question, "answer": 1.0})
+        assert error.value.status == 400
+
+    service.route("POST", f"/sessions/{session_id}/answers", {"question": "a_mg", "answer": 1.0})
+    with pytest.raises(ServiceError) as error:
+        service.route("POST", f"/sessions/{session_id}/answers", {"question": "a_mg", "answer": 1.0})
+    assert error.value.status == 400
+    service.route("POST", f"/sessions/{session_id}/answers", {"question": "a1_mg", "answer": 0.0})
+    engine = service.engine
+    assert [(engine.questions[question_id], code) for question_id, code in service.sessions[session_id].answers] == [
+        ("a_mg", engine.get_answer_code("a_mg", 1.0)),
+        ("a1_mg", engine.get_answer_code("a1_mg", 0.0)),
+    ]
+
+
+def send_requests(service, requests):
+    """
+        sends the (method, path, raw body) requests over one keep-alive connection,
+        returns the (status, response) of each of them
+    """
+
+    async def run():
+        server = await asyncio.start_server(service.handle_connection, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        responses = []
+        for method, path, body in requests:
+            writer.write(
+                f"{method} {path} HTTP/1.1\r\nContent-Length: {len(body)}\r\n\r\n".encode("latin-1") + body
+            )
+            status = int((await reader.readline()).split()[1])
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line == b"\r\n":
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+            responses.append((status, json.loads(await reader.readexactly(int(headers["content-length"])))))
+        writer.close()
+        server.close()
+        await server.wait_closed()
+        return responses
+
+    return asyncio.run(run())
+
+
+def test_bad_bodies_and_errors_are_answered(monkeypatch):
+    service = get_service()
+    session_id = service.route("POST", "/sessions", {})[1]["session_id"]
+    monkeypatch.setattr(service, "get_stats", lambda: 1 / 0)
+
+    responses = send_requests(
+        service,
+        [
+            ("POST", f"/sessions/{session_id}/answers", b"[1.0]"),
+            ("POST", f"/sessions/{session_id}/answers", b"not json"),
+            ("GET", "/stats", b""),
+            ("GET", f"/sessions/{session_id}", b""),
+        ],
+    )
+    assert [status for status, _ in responses] == [400, 400, 500, 200]
+    assert responses[0][1] == {"error": "request body must be a json object"}
+    assert responses[2][1] == {"error": "internal server error"}
+    assert responses[3][1]["num_of_answers"] == 0
@@ -0,0 +1,52 @@
+import pytest
+
+from helper import convert_scale_columns_to_classes, get_all_utility_scores, get_column_dtypes, read_cleaned_csv
+from sample_data import QUESTION_MAPPER, QUESTIONS, TARGET_COLUMN, get_dataset, write_csv
+from streaming import stream_contingency_counts
+
+COLUMNS = [TARGET_COLUMN] + QUESTIONS
+
+
+def assert_same_as_in_memory(file_path, counts):
+    dataset = convert_scale_columns_to_classes(
+        read_cleaned_csv(file_path, TARGET_COLUMN, COLUMNS, get_column_dtypes(COLUMNS, QUESTION_MAPPER)),
+        QUESTION_MAPPER,
+    )
+    question_choices = {question: list(dataset[question][dataset[question] != -1].unique()) for question in QUESTIONS}
+    assert counts.get_question_choices_data() == question_choices
+    assert counts.num_of_rows == dataset.shape[0]
+
+    scores = counts.get_utility_scores()
+    expected = get_all_utility_scores(dataset, question_choices, TARGET_COLUMN)
+    assert list(scores) == list(expected)
+    for question in expected:
+        assert scores[question] == pytest.approx(expected[question], abs=1e-12)
+
+
+@pytest.mark.parametrize("chunksize", [97, 5000])
+def test_streaming_matches_in_memory(tmp_path, chunksize):
+    file_path = write_csv(get_dataset(), str(tmp_path / "risk.csv"))
+    counts = stream_contingency_counts(
+        file_path,
+        TARGET_COLUMN,
+        COLUMNS + ["not_in_the_file_mg"],
+        QUESTION_MAPPER,
+        dtypes=get_column_dtypes(COLUMNS, QUESTION_MAPPER),
+        chunksize=chunksize,
+    )
+    assert counts.missing_columns == ["not_in_the_file_mg"]
+    assert_same_as_in_memory(file_path, counts)
+
+
+def test_streaming_columns_with_text_answers(tmp_path):
+    dataset = get_dataset()
+    dataset["c_mg"] = dataset["c_mg"].astype(object)
+    # after the first chunks were read with the numeric dtype
+    dataset.loc[1500, "c_mg"] = "text answer"
+    file_path = write_csv(dataset, str(tmp_path / "risk.csv"))
+    counts = stream_contingency_counts(
+        file_path, TARGET_COLUMN, COLUMNS, QUESTION_MAPPER, get_column_dtypes(COLUMNS, QUESTION_MAPPER), chunksize=500
+    )
+    assert counts.mistyped_columns == ["c_mg"]
+    assert "text answer" in counts.get_question_choices_data()["c_mg"]
+    assert_same_as_in_memory(file_path, counts)